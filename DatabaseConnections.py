@@ -650,6 +650,7 @@ class DatabaseConnection(object):
 					
 			return connectionEngineSuccess				
 		
+	@DateFunc.Profiled('DatabaseConnection.GetResultsInDataFrame')
 	def GetResultsInDataFrame(self, SQL):
 		"""This accepts a SQL query and returns the result as a Pandas DataFrame."""
 		
@@ -665,6 +666,7 @@ class DatabaseConnection(object):
 						
 		return retVal 
 			
+	@DateFunc.Profiled('DatabaseConnection.AttemptChangeQuery')
 	def AttemptChangeQuery(self, SQL_Statement, SQL_Data=None, seqNum = None):
 		
 		"""
@@ -744,6 +746,7 @@ class DatabaseConnection(object):
 		cursor.close()
 		return arudReturn
 	
+	@DateFunc.Profiled('DatabaseConnection.AttemptDataFrameUpload')
 	def AttemptDataFrameUpload(self, uploadingDataFrame, tableName, schemaName = "TEMP", rowCountChunkSize = 5000, ifTableExists = 'append', connectionEngine = None, seqNum = None):
 		"""
 		The purpose of this function is to act very similarly to the AttemptChangeQuery function (above, the main focus being avoiding deadlocks in MySQL),
@@ -901,6 +904,7 @@ class DatabaseConnection(object):
 		else:
 			return True
 		
+	@DateFunc.Profiled('DatabaseConnection.GetMaxDateInTable')
 	def GetMaxDateInTable(self, nameOfSchemaDotTableName, nameOfDateColumn, searchUsingPrevDays = 3, minRowCount = 1, truncateToDateOnly = 1, forcedDate = None):
 		"""
 		The main goal of this function is to find the max date available in a given table.
@@ -1078,6 +1082,7 @@ class DatabaseConnection(object):
 				self.SendEmail(ADMIN_EMAIL_ADDRS,"Query Failure", Body, 1)
 				self.SendEmail(ADMIN_TEXT_ADDRS,"Query Failure", TxtBody, 1)
 				
+	@DateFunc.Profiled('DatabaseConnection.MultishotQuery')
 	def MultishotQuery(self, QueriesToRun, Descriptions = None, TurnOnDescriptions = False):
 		"""
 		This function is built to handle a list of queries to be run in succession. Note it can NOT handle SELECT queries. 
@@ -1,75 +1,466 @@
+import os
+import sys
+import json
+import atexit
 import datetime
 import time
+import math
 import string
+import functools
+import threading
+import collections
+import multiprocessing
+import ctypes
+import ctypes.util
 import pytz
 
+import numpy as np
+import pandas as pd
+
 """
 This file is a collection of helpful (and common) date functions.
 
 """
 
+class MonotonicTimeSpec(ctypes.Structure):
+	#struct timespec, for calling clock_gettime through ctypes (see PickClockNanoseconds)
+	_fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+def PickClockNanoseconds():
+	"""
+	Returns the clock every timer in this file reads: a function that takes no arguments and returns the time in integer nanoseconds.  It is the first of these that 
+	works, all of which are monotonic (they never jump when the system time is changed) unless noted:
+	1. time.perf_counter_ns (Python 3.7+), which has the best resolution
+	2. time.perf_counter (Python 3.3+), the same clock as a float
+	3. the 'monotonic' package (pip install monotonic), for Python 2
+	4. clock_gettime(CLOCK_MONOTONIC) from the C library (through ctypes), for Python 2 on Linux or macOS without that package
+	5. time.time() - NOT monotonic, so a timing can come out negative (or too long) if the system time is changed while it runs
+	"""
+	try:
+		return time.perf_counter_ns
+	except AttributeError:
+		pass
+	
+	try:
+		myPerfCounter = time.perf_counter
+		return lambda: int(myPerfCounter() * 1000000000)
+	except AttributeError:
+		pass
+	
+	try:
+		#the package raises a RuntimeError on import if it cannot find a monotonic clock on this system
+		from monotonic import monotonic as myMonotonic
+		return lambda: int(myMonotonic() * 1000000000)
+	except (ImportError, RuntimeError):
+		pass
+	
+	#CLOCK_MONOTONIC is 1 on Linux and 6 on macOS; clock_gettime is in librt on older Linux systems and the C library everywhere else
+	myClockID = {'linux': 1, 'darwin': 6}.get(sys.platform.rstrip('0123456789'))
+	if (myClockID is not None):
+		for myLibraryName in ['rt', 'c']:
+			try:
+				myClockGettime = ctypes.CDLL(ctypes.util.find_library(myLibraryName), use_errno = True).clock_gettime
+				myClockGettime.argtypes = [ctypes.c_int, ctypes.POINTER(MonotonicTimeSpec)]
+				myClockGettime.restype = ctypes.c_int
+				if (myClockGettime(myClockID, ctypes.byref(MonotonicTimeSpec())) != 0): continue
+			except (OSError, AttributeError, TypeError):
+				continue
+			
+			def ClockGettimeNanoseconds():
+				#a new struct per call, so the clock can be read from several threads at once
+				myTime = MonotonicTimeSpec()
+				myClockGettime(myClockID, ctypes.byref(myTime))
+				return myTime.tv_sec * 1000000000 + myTime.tv_nsec
+			
+			return ClockGettimeNanoseconds
+	
+	return lambda: int(time.time() * 1000000000)
+
+#The clock every timer in this file reads, in integer nanoseconds
+ClockNanoseconds = PickClockNanoseconds()
+
+class LatencyHistogram(object):
+	"""
+	A fixed size histogram of durations (in nanoseconds) that can report percentiles - no matter how many durations are recorded, it holds the same 2,048 counts.
+
+	Each power of two (1-2ns, 2-4ns, ... up to about 290 years) is split into 32 equal buckets, so a reported percentile is within about 1.6% of the true value;
+		the count, total (so the mean), minimum and maximum are kept exactly.
+	Histograms from different threads or processes (they pickle, so they can be returned from a multiprocessing Pool) are combined with Merge(), which just adds
+		up the counts - give each thread its own timer and merge them at the end, rather than sharing one.
+	"""
+	subBuckets = 32
+
+	def __init__(self):
+		self.Reset()
+
+	def Reset(self):
+		#Forgets every duration recorded so far
+		self.counts = [0] * (64 * self.subBuckets)
+		self.count = 0
+		self.total = 0
+		self.minimum = None
+		self.maximum = None
+
+	def Record(self, nanoseconds):
+		#Records one duration (in nanoseconds)
+		if (nanoseconds < 1):
+			#the clock did not tick (or went backwards under time.time()); these go in the first bucket
+			nanoseconds = 0
+			myBucket = 0
+		else:
+			#frexp splits the duration into a fraction in [0.5, 1) and a power of two; the power picks the range and the fraction the bucket within it
+			myFraction, myPower = math.frexp(nanoseconds)
+			myBucket = min(myPower * self.subBuckets + int((myFraction - .5) * 2 * self.subBuckets), len(self.counts) - 1)
+
+		self.counts[myBucket] += 1
+		self.count += 1
+		self.total += nanoseconds
+		if (self.maximum is None or nanoseconds > self.maximum): self.maximum = nanoseconds
+		if (self.minimum is None or nanoseconds < self.minimum): self.minimum = nanoseconds
+
+	def Merge(self, otherHistogram):
+		#Adds the durations recorded by otherHistogram into this one
+		self.counts = [y + z for y, z in zip(self.counts, otherHistogram.counts)]
+		self.count += otherHistogram.count
+		self.total += otherHistogram.total
+		if (otherHistogram.maximum is not None and (self.maximum is None or otherHistogram.maximum > self.maximum)): self.maximum = otherHistogram.maximum
+		if (otherHistogram.minimum is not None and (self.minimum is None or otherHistogram.minimum < self.minimum)): self.minimum = otherHistogram.minimum
+
+	def Percentile(self, percent):
+		#Returns the duration (in nanoseconds) that 'percent' (0 to 100) of the recorded durations are at or below, or None if nothing was recorded
+		if (self.count == 0): return None
+
+		myRank = max(1, int(math.ceil(self.count * min(max(percent, 0), 100) / 100.0)))
+		mySeen = 0
+		for myBucket, myCount in enumerate(self.counts):
+			mySeen += myCount
+			if (mySeen >= myRank): break
+
+		if (myBucket == 0): return 0
+
+		#report the middle of the bucket, but never outside of the exact minimum / maximum
+		myPower = myBucket // self.subBuckets
+		myWidth = 2.0 ** (myPower - 1) / self.subBuckets
+		myMiddle = 2.0 ** (myPower - 1) + (myBucket % self.subBuckets + .5) * myWidth
+		return min(max(myMiddle, self.minimum), self.maximum)
+
+	def Summary(self):
+		#Returns a dictionary of count, mean, p50, p95, p99 and max, with the durations in seconds (None if nothing was recorded)
+		if (self.count == 0): return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+		return {'count': self.count, 'mean': self.total / 1e9 / self.count, 'p50': self.Percentile(50) / 1e9, 'p95': self.Percentile(95) / 1e9,
+			'p99': self.Percentile(99) / 1e9, 'max': self.maximum / 1e9}
+
 class TimeIt(object):
 	"""
 	This is a simple class I wrote to help me wall clock times for segments of code.
-	
-	This class has two modes: traditional start/stop time captures and a stopwatch (that can capture multiple end times and then average the times). For the traditional, 
+
+	This class has two modes: traditional start/stop time captures and a stopwatch (that can capture multiple end times and then average the times). For the traditional,
 		the actions are as follows:
 	1. Simply defining a variable as this class will initialize it, starting the timer - OR - you can call the 'Start()' method to (re)start the timer.
 	2. Stop the timer (by calling the 'Stop()' method).
 	3. Get the results in seconds (by calling the 'GetTimeDeltaInSeconds()' method)
-	
+
 	To use the stopwatch mode:
 	1. Simply defining a variable as this class will initialize it, starting the timer - OR - you can call the 'Start()' method to (re)start the timer.
 	2. To stop the timer, save the results, and then re-start the timer, call 'ClickIt()'
 	3. Finding Results
 		A. To get the average runtime, call 'AverageRuntime()'
-		A. To get all of the individual runtimes, call 'ReturnAllTimes()'
-		
-	Outside of the Start() method, do _not_ mix and match methods (so only call Stop() / GetTimeDeltaInSeconds() **OR** ClickIt() / AverageRuntime() / ReturnAllTimes(), 
+		B. To get the percentiles, call 'Percentile(percent)' or 'Summary()' (count, mean, p50, p95, p99 and max)
+		C. To get the most recent individual runtimes, call 'ReturnAllTimes()'
+
+	The stopwatch does not keep every time - it keeps a LatencyHistogram (a fixed size, however many times ClickIt() is called) plus the last 'keepLastTimes'
+		times for ReturnAllTimes(), so it can run for millions of clicks in a long-running loader.
+
+	Outside of the Start() method, do _not_ mix and match methods (so only call Stop() / GetTimeDeltaInSeconds() **OR** ClickIt() / AverageRuntime() / ReturnAllTimes(),
 		but **NOT** a combination of both groups)
+
+	There are two more ways to use the stopwatch, both of which record a time each time they are used:
+	- As a context manager: 'with myTimer:' times the block (and GetTimeDeltaInSeconds() then returns the time of the last block)
+	- As a decorator: '@myTimer' above a function times every call to it
+	Timers from different threads or processes can be combined with Merge().
 	"""
-	def __init__(self):
+	def __init__(self, keepLastTimes = 1000):
 		#Initialize the instance of the object
-		
-		self.startTime = time.time() 
-		self.endTime = None
-		self.times = []
-	
+
+		if (isinstance(keepLastTimes, (int, long)) and keepLastTimes >= 0):
+			self.keepLastTimes = keepLastTimes
+		else:
+			#'keepLastTimes' must be a non-negative integer; setting to 1000
+			self.keepLastTimes = 1000
+
+		self.Start()
+
 	def Start(self):
-		#Start the timer and initialize the 'endTime' and 'times' variables
-		
-		self.startTime = time.time()
+		#Start the timer and initialize the 'endTime' and 'times' variables (the stopwatch storage is only made on the first recorded time, so plain start/stop
+		#	timers stay cheap)
+
+		self.startTime = ClockNanoseconds()
 		self.endTime = None
-		self.times = []
-		
+		self.times = None
+		self.histogram = None
+
 	def Stop(self):
 		#Stop the timer by setting the endTime variable
-		
-		self.endTime = time.time()
-		
+
+		self.endTime = ClockNanoseconds()
+
 	def GetTimeDeltaInSeconds(self):
 		#If the timer was not stopped, do so - then return the time delta.
-		
-		if (self.endTime is None): self.endTime = time.time()
-		return (self.endTime - self.startTime)
-	
+
+		if (self.endTime is None): self.endTime = ClockNanoseconds()
+		return (self.endTime - self.startTime) / 1e9
+
+	def RecordTime(self, nanoseconds):
+		#Saves one stopwatch time (in nanoseconds)
+		if (self.histogram is None):
+			self.times = collections.deque(maxlen = self.keepLastTimes)
+			self.histogram = LatencyHistogram()
+		self.histogram.Record(nanoseconds)
+		self.times.append(nanoseconds / 1e9)
+
 	def ClickIt(self):
 		#Mimic the clicking of a stopwatch - stop the timer, capture the time, and then re-start the timer.
-		
-		self.times.append(time.time() - self.startTime)
-		self.startTime = time.time() 
-		
+
+		myNow = ClockNanoseconds()
+		self.RecordTime(myNow - self.startTime)
+		self.startTime = myNow
+
 	def AverageRuntime(self):
 		#Return the average runtime for the instance.
-		
-		if (self.endTime is None): self.endTime = time.time()
-		
-		if (len(self.times) > 0): return sum(self.times) / len(self.times)
-		else: return (self.endTime - self.startTime)
-		
+
+		if (self.endTime is None): self.endTime = ClockNanoseconds()
+
+		if (self.histogram is not None and self.histogram.count > 0): return self.histogram.total / 1e9 / self.histogram.count
+		else: return (self.endTime - self.startTime) / 1e9
+
 	def ReturnAllTimes(self):
-		#Returns the list of all elapsed times
-		return self.times
+		#Returns the list of the last 'keepLastTimes' elapsed times (in seconds) - all of them, if there have not been more than that
+		if (self.times is None): return []
+		return list(self.times)
+
+	def Percentile(self, percent):
+		#Returns the stopwatch time (in seconds) that 'percent' (0 to 100) of the times are at or below, or None if there are no times
+		if (self.histogram is None): return None
+		myNanoseconds = self.histogram.Percentile(percent)
+		if (myNanoseconds is None): return None
+		else: return myNanoseconds / 1e9
+
+	def Summary(self):
+		#Returns a dictionary of count, mean, p50, p95, p99 and max for the stopwatch times, in seconds
+		if (self.histogram is None): return LatencyHistogram().Summary()
+		return self.histogram.Summary()
+
+	def Merge(self, otherTimer):
+		#Adds the stopwatch times of otherTimer (from another thread or process) into this one; ReturnAllTimes() gets otherTimer's recent times after this one's
+		if (otherTimer.histogram is None): return
+		if (self.histogram is None):
+			self.times = collections.deque(maxlen = self.keepLastTimes)
+			self.histogram = LatencyHistogram()
+		self.histogram.Merge(otherTimer.histogram)
+		self.times.extend(otherTimer.times)
+
+	def __enter__(self):
+		self.startTime = ClockNanoseconds()
+		self.endTime = None
+		return self
+
+	def __exit__(self, excType, excValue, traceback):
+		self.endTime = ClockNanoseconds()
+		self.RecordTime(self.endTime - self.startTime)
+		#returning False lets any exception carry on
+		return False
+
+	def __call__(self, myFunction):
+		#Used as a decorator; the start time is kept per call, so a decorated function can be called from several threads (though Merge() of per-thread timers is safer)
+		@functools.wraps(myFunction)
+		def TimedFunction(*args, **kwargs):
+			myStart = ClockNanoseconds()
+			try:
+				return myFunction(*args, **kwargs)
+			finally:
+				self.RecordTime(ClockNanoseconds() - myStart)
+
+		return TimedFunction
+
+class SpanProfiler(object):
+	"""
+	A profiler for named spans of code - a span is timed from start to end, and spans started inside other spans (in the same thread) are nested under them,
+	so the time can be followed from a whole job down into GetResultsInDataFrame, findMatches, GetFileWalkInformation and so on.
+
+	The profiler in this file (spanProfiler) is off unless the environment variable GPF_PROFILE is set to the file the profile should be written to when Python exits,
+		for example 'GPF_PROFILE=/tmp/myJob.folded python myJob.py'. The file type is picked by its name:
+		- a name ending in '.json' gets Chrome trace events (open it in chrome://tracing, Perfetto or speedscope)
+		- anything else gets collapsed stacks ('outer;inner;innermost <microseconds>' on each line), which flamegraph.pl, inferno and speedscope all read
+	It can also be turned on from code with Enable() (and written with Write()).
+
+	To add spans:
+	- 'with DateFunc.ProfileSpan("name"):' times the block
+	- '@DateFunc.Profiled("name")' above a function times every call to it - but not a generator, where it would only time creating the generator; time the work
+		between the yields with ProfileSpan instead (and close the span before yielding, as findMatchesInChunks does)
+	While the profiler is off, ProfileSpan hands back one shared span that does nothing and a profiled function only checks a flag, so they can be left in hot code.
+
+	Every span name also gets a TimeIt stopwatch, so Summary() can report how many times it ran, the total time and its percentiles.
+	Only the process the profiler was turned on in writes the file - spans inside worker processes (like findMatches with workers > 1) are not collected, but the time
+		still shows up in the span that is waiting on the workers.
+	Chrome trace events are kept for the first 'maxEvents' spans only; the collapsed stacks and the summary are running totals, so they do not grow with the run.
+	"""
+
+	def __init__(self, outputFile = None, maxEvents = 1000000):
+		self.enabled = False
+		self.outputFile = None
+		self.maxEvents = maxEvents
+		self.lock = threading.Lock()
+		self.local = threading.local()
+		self.writeAtExitRegistered = False
+		self.Reset()
+
+		if (outputFile): self.Enable(outputFile)
+
+	def Reset(self):
+		#Forgets every span recorded so far
+		self.timers = {}
+		self.collapsedStacks = {}
+		self.events = []
+		self.droppedEvents = 0
+		self.originTime = ClockNanoseconds()
+
+	def Enable(self, outputFile = None):
+		#Turns the profiler on; if outputFile is given, the profile is written to it when Python exits
+		self.enabled = True
+
+		if (outputFile):
+			self.outputFile = outputFile
+			if (not self.writeAtExitRegistered):
+				atexit.register(self.WriteAtExit)
+				self.writeAtExitRegistered = True
+
+	def Disable(self):
+		#Turns the profiler off (spans that are already open are still recorded when they end)
+		self.enabled = False
+
+	def Span(self, name):
+		#Returns a span for a 'with' block - or the shared span that does nothing, if the profiler is off
+		if (self.enabled): return ProfiledSpan(self, name)
+		else: return disabledSpan
+
+	def Profile(self, name = None):
+		#Returns a decorator that times every call to a function as a span called 'name' (the function's name if none is given)
+		def Decorator(myFunction):
+			mySpanName = name or myFunction.__name__
+
+			@functools.wraps(myFunction)
+			def ProfiledFunction(*args, **kwargs):
+				if (not self.enabled): return myFunction(*args, **kwargs)
+
+				with ProfiledSpan(self, mySpanName):
+					return myFunction(*args, **kwargs)
+
+			return ProfiledFunction
+
+		return Decorator
+
+	def OpenSpans(self):
+		#The spans open in this thread (outermost first), as lists of [name, start time, time spent in spans nested under it]
+		try:
+			return self.local.openSpans
+		except AttributeError:
+			self.local.openSpans = []
+			return self.local.openSpans
+
+	def BeginSpan(self, name):
+		self.OpenSpans().append([name, ClockNanoseconds(), 0])
+
+	def EndSpan(self):
+		myEndTime = ClockNanoseconds()
+		myOpenSpans = self.OpenSpans()
+
+		myStack = ';'.join([y[0] for y in myOpenSpans])
+		myName, myStartTime, myNestedTime = myOpenSpans.pop()
+		myDuration = myEndTime - myStartTime
+		if (len(myOpenSpans) > 0): myOpenSpans[-1][2] += myDuration
+
+		with self.lock:
+			if (myName not in self.timers): self.timers[myName] = TimeIt(keepLastTimes = 0)
+			self.timers[myName].RecordTime(myDuration)
+
+			#the collapsed stacks hold the time spent in each span itself (not in the spans nested under it), which is what flame graphs expect
+			self.collapsedStacks[myStack] = self.collapsedStacks.get(myStack, 0) + myDuration - myNestedTime
+
+			if (len(self.events) < self.maxEvents): self.events.append((myName, myStartTime, myDuration, threading.current_thread().ident))
+			else: self.droppedEvents += 1
+
+	def Summary(self):
+		"""
+		Returns a dataframe with a row per span name (longest total time first) and the columns: span, count, totalSeconds, meanSeconds, p50Seconds, p95Seconds,
+		p99Seconds, maxSeconds
+		"""
+		myRows = []
+		with self.lock:
+			for myName, myTimer in self.timers.items():
+				mySummary = myTimer.Summary()
+				myRows.append({'span': myName, 'count': mySummary['count'], 'totalSeconds': (myTimer.histogram.total / 1e9) if (myTimer.histogram is not None) else 0.0, 'meanSeconds': mySummary['mean'],
+					'p50Seconds': mySummary['p50'], 'p95Seconds': mySummary['p95'], 'p99Seconds': mySummary['p99'], 'maxSeconds': mySummary['max']})
+
+		dfSummary = pd.DataFrame(myRows, columns = ['span', 'count', 'totalSeconds', 'meanSeconds', 'p50Seconds', 'p95Seconds', 'p99Seconds', 'maxSeconds'])
+		return dfSummary.sort_values('totalSeconds', ascending = False).reset_index(drop = True)
+
+	def Write(self, outputFile):
+		#Writes the profile to outputFile - Chrome trace events if the name ends in '.json', collapsed stacks otherwise (see the class notes)
+		with self.lock:
+			if (outputFile.lower().endswith('.json')):
+				myProcessID = os.getpid()
+				#Chrome trace times are in microseconds
+				myEvents = [{'name': y[0], 'ph': 'X', 'ts': (y[1] - self.originTime) / 1000.0, 'dur': y[2] / 1000.0, 'pid': myProcessID, 'tid': y[3]} for y in self.events]
+				with open(outputFile, 'w') as myFile:
+					json.dump({'traceEvents': myEvents, 'displayTimeUnit': 'ms', 'otherData': {'droppedEvents': self.droppedEvents}}, myFile)
+			else:
+				with open(outputFile, 'w') as myFile:
+					for myStack in sorted(self.collapsedStacks.keys()):
+						myFile.write("{} {}\n".format(myStack, int(round(self.collapsedStacks[myStack] / 1000.0))))
+
+	def WriteAtExit(self):
+		#Registered with atexit by Enable(); worker processes that inherited the profiler leave the file to the process that turned it on
+		if (self.outputFile and multiprocessing.current_process().name == 'MainProcess'):
+			try:
+				self.Write(self.outputFile)
+			except (IOError, OSError):
+				pass
+
+class ProfiledSpan(object):
+	#A span for a 'with' block; see SpanProfiler
+	def __init__(self, profiler, name):
+		self.profiler = profiler
+		self.name = name
+
+	def __enter__(self):
+		self.profiler.BeginSpan(self.name)
+		return self
+
+	def __exit__(self, excType, excValue, traceback):
+		self.profiler.EndSpan()
+		return False
+
+class DisabledSpan(object):
+	#The span handed out while the profiler is off; it does nothing
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, traceback):
+		return False
+
+disabledSpan = DisabledSpan()
+
+#The profiler for this repo's functions; it is turned on (and written to the file named) by the GPF_PROFILE environment variable
+spanProfiler = SpanProfiler(os.environ.get('GPF_PROFILE'))
+
+def ProfileSpan(name):
+	#Returns a span for a 'with' block on spanProfiler; see SpanProfiler
+	return spanProfiler.Span(name)
+
+def Profiled(name = None):
+	#Returns a decorator that times every call to a function on spanProfiler; see SpanProfiler
+	return spanProfiler.Profile(name)
 
 class TimeToUpdate(object):
 		"""
@@ -137,69 +528,231 @@ class TimeToUpdate(object):
 			return retVal
 
 		
-def CheckIfDateTimeValid(dateAsStr):
+class BoundedCache(object):
+	"""
+	A small cache that holds (at most) 'maxSize' keys and throws out the least recently used ones first, so memory stays bounded no matter how many distinct values
+	go through it.
+
+	To keep lookups as cheap as a plain dictionary (an OrderedDict that moves every hit to the end costs more than the parsing it saves in Python 2), keys are kept in
+		two generations: new and recently used keys go into the current one, and once it holds maxSize / 2 keys, the older generation is thrown out and the current
+		one takes its place.  A key that is used from the older generation is moved back into the current one, so anything used within the last maxSize / 2 new keys
+		is never thrown out - the same promise a strict LRU cache of that size makes.
+
+	Get() returns 'default' if the key is not in the cache; Set() adds (or replaces) a key; Clear() empties it.
+	"""
+
+	def __init__(self, maxSize = 100000):
+		self.current = {}
+		self.older = {}
+
+		if (isinstance(maxSize, (int, long)) and maxSize > 1):
+			self.maxSize = maxSize
+		else:
+			#'maxSize' must be an integer above 1; setting to 100000
+			self.maxSize = 100000
+
+	def Get(self, key, default = None):
+		#Returns the value for key (and marks it as recently used), or 'default' if its not in the cache
+		try:
+			return self.current[key]
+		except KeyError:
+			pass
+		except TypeError:
+			#unhashable keys are never cached
+			return default
+
+		try:
+			myValue = self.older.pop(key)
+		except KeyError:
+			return default
+
+		self.Set(key, myValue)
+		return myValue
+
+	def Set(self, key, value):
+		#Adds (or replaces) key, starting a new generation if the current one is full
+		if (len(self.current) >= self.maxSize // 2):
+			self.older = self.current
+			self.current = {}
+
+		try:
+			self.current[key] = value
+		except TypeError:
+			#unhashable keys are never cached
+			pass
+
+	def Clear(self):
+		#Empties the cache
+		self.current = {}
+		self.older = {}
+
+#Parsed dates are cached here; see ParseDateTime
+parsedDateTimeCache = BoundedCache(100000)
+
+def ParseDateTime(dateAsStr, useCache = True):
 	"""
 	takes as input a date/time in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d'
-	returns a True if the input is a valid datetime, False otherwise
-	
-	How this works is it tries to do a simple change of the datetime and then tries to convert back; if it can successfully, the datetime is valid
+	returns a tuple of (the datetime, True if the input was just a date) - or None if the input is not a valid date/time.  Every function in this file parses through here.
+
+	The two layouts are fixed width, so a well formed string is simply sliced apart and handed to datetime() - which is several times faster than strptime.  Anything
+		that is not exactly 10 or 19 characters with the separators in place (for example '2020-1-5', which strptime allows) goes through the same split / strptime
+		steps as before, so what counts as valid has not changed.
+	Results are kept in a bounded cache (parsedDateTimeCache) since the same handful of dates tend to show up over and over; set useCache to False to skip it.
 	"""
+	if (useCache):
+		myParsed = parsedDateTimeCache.Get(dateAsStr, False)
+		#False means the string was not in the cache (None is a valid cached result: the string is not a date)
+		if (myParsed is not False): return myParsed
 
-	valid = True
+	myParsed = ParseDateTimeUncached(dateAsStr)
+
+	if (useCache): parsedDateTimeCache.Set(dateAsStr, myParsed)
+	return myParsed
+
+def ParseDateTimeUncached(dateAsStr):
+	#The body of ParseDateTime, without the cache
+
+	if (not isinstance(dateAsStr, basestring)): return None
+	if (isinstance(dateAsStr, unicode)):
+		#strptime only takes ASCII digits, while isdigit() / int() would take any unicode digit - so anything non-ASCII is not a date
+		try:
+			dateAsStr = dateAsStr.encode('ascii')
+		except UnicodeError:
+			return None
+
+	myLength = len(dateAsStr)
 
 	try:
-		#replace all spaces and  colons with a dash ('-') 
+		if (myLength == 10 and dateAsStr[4] == '-' and dateAsStr[7] == '-'):
+			myParts = (dateAsStr[0:4], dateAsStr[5:7], dateAsStr[8:10])
+			if ((myParts[0] + myParts[1] + myParts[2]).isdigit()):
+				return (datetime.datetime(int(myParts[0]), int(myParts[1]), int(myParts[2])), True)
+		elif (myLength == 19 and dateAsStr[4] == '-' and dateAsStr[7] == '-' and dateAsStr[10] == ' ' and dateAsStr[13] == ':' and dateAsStr[16] == ':'):
+			myParts = (dateAsStr[0:4], dateAsStr[5:7], dateAsStr[8:10], dateAsStr[11:13], dateAsStr[14:16], dateAsStr[17:19])
+			if ((myParts[0] + myParts[1] + myParts[2] + myParts[3] + myParts[4] + myParts[5]).isdigit()):
+				return (datetime.datetime(int(myParts[0]), int(myParts[1]), int(myParts[2]), int(myParts[3]), int(myParts[4]), int(myParts[5])), False)
+	except ValueError:
+		#the digits are all there, but its not a real date (like '2020-02-30')
+		return None
+
+	#not in the fixed width layout; fall back to the original (slower) parsing
+	try:
+		#replace all spaces and  colons with a dash ('-')
 		dateTimeList = string.replace(string.replace(dateAsStr, ":", "-"), " ", "-").split('-')
-	
+
 		if len(dateTimeList) == 3:
 			#simply a date
-			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d')
-			addTime = myTimestamp + datetime.timedelta(seconds=(-1))
-			dummyTime = addTime.strftime('%Y-%m-%d')
+			return (datetime.datetime.strptime(dateAsStr, '%Y-%m-%d'), True)
 		elif len(dateTimeList) == 6:
 			#date and time
-			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d %H:%M:%S')
-			addTime = myTimestamp + datetime.timedelta(seconds=(-1))
-			dummyTime = addTime.strftime('%Y-%m-%d %H:%M:%S')
-		else:
-			valid = False
+			return (datetime.datetime.strptime(dateAsStr, '%Y-%m-%d %H:%M:%S'), False)
+	except:
+		pass
+
+	return None
+
+def FormatDateTime(myTimestamp, justDate = False):
+	"""
+	Returns myTimestamp as a string in the format '%Y-%m-%d %H:%M:%S' (or '%Y-%m-%d' if justDate) - the fast counterpart of strftime for the two layouts in this file.
+
+	Just like strftime in Python 2, a ValueError is raised for years before 1900, so every function gives the same answer it did when it used strftime.
+	"""
+	if (myTimestamp.year < 1900): raise ValueError("year={} is before 1900".format(myTimestamp.year))
+
+	#isoformat is done in C; slicing drops the microseconds and any UTC offset, just as the strftime layouts did
+	if (justDate): return myTimestamp.isoformat(' ')[:10]
+	else: return myTimestamp.isoformat(' ')[:19]
+
+def CheckIfDateTimeValid(dateAsStr):
+	"""
+	takes as input a date/time in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d'
+	returns a True if the input is a valid datetime, False otherwise
+
+	How this works is it tries to do a simple change of the datetime and then tries to convert back; if it can successfully, the datetime is valid
+	"""
+
+	valid = True
+
+	try:
+		myTimestamp, justDate = ParseDateTime(dateAsStr)
+		addTime = myTimestamp + datetime.timedelta(seconds=(-1))
+		dummyTime = FormatDateTime(addTime, justDate)
 	except:
+		#this includes ParseDateTime returning None (which cannot be unpacked)
 		valid = False
 
 	return valid
 
+#pytz zones and their transition tables, by name; see GetTimezone and TimezoneTable
+timezoneObjects = {}
+timezoneTables = {}
+
+def GetTimezone(timezoneName):
+	#Returns pytz.timezone(timezoneName), building each zone only once
+	try:
+		return timezoneObjects[timezoneName]
+	except KeyError:
+		timezoneObjects[timezoneName] = pytz.timezone(timezoneName)
+		return timezoneObjects[timezoneName]
+
+def TimezoneTable(timezoneName):
+	"""
+	Returns the transition table for a timezone as a tuple of three numpy arrays (built once per zone and then cached):
+	- the UTC times (as int64 nanoseconds) that each period starts at; the first period starts before any date pandas can hold
+	- the UTC offset (in nanoseconds) of each period
+	- whether each period is daylight saving time
+	This is the same table pytz uses (pytz stops listing transitions in 2037, so later dates use the last offset - just like pytz).
+	"""
+	try:
+		return timezoneTables[timezoneName]
+	except KeyError:
+		pass
+
+	myZone = GetTimezone(timezoneName)
+	myTransitions = getattr(myZone, '_utc_transition_times', None)
+
+	if (myTransitions):
+		myStarts = np.array(myTransitions, dtype='datetime64[s]').astype(np.int64)
+		myOffsets = np.array([y[0].days * 86400 + y[0].seconds for y in myZone._transition_info], dtype=np.int64)
+		myIsDst = np.array([y[1] != datetime.timedelta(0) for y in myZone._transition_info], dtype=bool)
+	else:
+		#UTC and fixed offset zones have a single period
+		myOffset = myZone.utcoffset(datetime.datetime(2000, 1, 1))
+		myStarts = np.array([-9000000000], dtype=np.int64)
+		myOffsets = np.array([myOffset.days * 86400 + myOffset.seconds], dtype=np.int64)
+		myIsDst = np.array([False], dtype=bool)
+
+	#keep the starts inside the range int64 nanoseconds can hold (the first transition pytz lists is in the year 1)
+	myStarts = np.clip(myStarts, -9000000000, 9000000000) * 1000000000
+	timezoneTables[timezoneName] = (myStarts, myOffsets * 1000000000, myIsDst)
+	return timezoneTables[timezoneName]
+
 def ConvertDateTimeToTimezone(DateTimeAsSTR, from_tz, to_tz, is_dst=None):
 	"""
-	This function takes in a date/time (as a string), a 'from' timezone, a 'to' timezone, and a dst qualifier (which I dont actually use).
+	This function takes in a date/time (as a string), a 'from' timezone, a 'to' timezone, and a dst qualifier.
 	This function returns a datetime (in string format) converted to the 'to_tz' timezone.
 	from_tz / to_tz are a string timezone; there are many acceptable timezones
 		Common ones for the US: 'US/Alaska', 'US/Central', 'US/Eastern', 'US/Hawaii', 'US/Mountain', 'US/Pacific', 'US/Pacific-New', 'US/Samoa', 'UTC'
 		you can see them all if you do `print pytz.all_timezones`
+	is_dst only matters for the hour the clocks are set back (which happens twice) or forward (which never happens) in from_tz; it is handed to pytz's localize:
+		None (the default) - raises pytz.AmbiguousTimeError / pytz.NonExistentTimeError
+		True - an ambiguous time is read as daylight saving time (the first of the two); a nonexistent time is read with the daylight saving offset
+		False - an ambiguous time is read as standard time (the second of the two); a nonexistent time is read with the standard offset
+	To convert many dates at once, use ConvertDateTimeToTimezoneSeries.
 	"""
 	
-	convertTO = pytz.timezone(to_tz)
-	convertFROM = pytz.timezone(from_tz)
-	
+	convertTO = GetTimezone(to_tz)
+	convertFROM = GetTimezone(from_tz)
+
 	if (CheckIfDateTimeValid(DateTimeAsSTR)):
+		#CheckIfDateTimeValid just parsed this, so this comes straight out of the cache
+		myTimestamp, justDate = ParseDateTime(DateTimeAsSTR)
 
-		dateTimeList = string.replace(string.replace(DateTimeAsSTR, ":", "-"), " ", "-").split('-')
-		if len(dateTimeList) == 3:
-			#simply a date
-			myTimestamp = datetime.datetime.strptime(DateTimeAsSTR, '%Y-%m-%d')
-		elif len(dateTimeList) == 6:
-			#date and time
-			myTimestamp = datetime.datetime.strptime(DateTimeAsSTR, '%Y-%m-%d %H:%M:%S')
-		
 		from_dt = convertFROM.localize(myTimestamp, is_dst=is_dst)
-		
+
 		convertedTimestamp = convertTO.normalize(from_dt.astimezone(convertTO))
-	
-		if len(dateTimeList) == 3:
-			#simply a date
-			return convertedTimestamp.strftime('%Y-%m-%d')
-		elif len(dateTimeList) == 6:
-			#date and time
-			return convertedTimestamp.strftime('%Y-%m-%d %H:%M:%S')
+
+		return FormatDateTime(convertedTimestamp, justDate)
 	else:
 		return None
 
@@ -211,10 +764,7 @@ def AddSecondsToNow(addSeconds = 0, useUTC = 1, returnJustDate = 0):
 		myTimestamp = datetime.datetime.now()
 	addTime = myTimestamp + datetime.timedelta(seconds=addSeconds)
 
-	if returnJustDate == 1:
-		myStrAddTime = addTime.strftime('%Y-%m-%d')
-	else:
-		myStrAddTime = addTime.strftime('%Y-%m-%d %H:%M:%S')		
+	myStrAddTime = FormatDateTime(addTime, returnJustDate == 1)
 
 	return myStrAddTime
 
@@ -226,16 +776,13 @@ def SubtractSecondsFromNow(subtractSeconds = 0, useUTC = 1, returnJustDate = 0):
 		myTimestamp = datetime.datetime.now()
 	addTime = myTimestamp + datetime.timedelta(seconds=-1*subtractSeconds)
 
-	if returnJustDate == 1:
-		myStrAddTime = addTime.strftime('%Y-%m-%d')
-	else:
-		myStrAddTime = addTime.strftime('%Y-%m-%d %H:%M:%S')		
+	myStrAddTime = FormatDateTime(addTime, returnJustDate == 1)
 
 	return myStrAddTime
 
 
 def AddSecondsToDateTime(dateAsStr, addSeconds = 0):
-	#takes as input 
+	#takes as input
 	#	a date/time in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d'
 	#	seconds to add to this time
 	#returns a string that represents the given datetime plus the provided seconds
@@ -243,21 +790,11 @@ def AddSecondsToDateTime(dateAsStr, addSeconds = 0):
 	invalid = 0
 
 	try:
-		dateTimeList = string.replace(string.replace(dateAsStr, ":", "-"), " ", "-").split('-')
-		
-		if len(dateTimeList) == 3:
-			#simply a date
-			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d')
-			addTime = myTimestamp + datetime.timedelta(seconds=addSeconds)
-			myStrAddTime = addTime.strftime('%Y-%m-%d')
-		elif len(dateTimeList) == 6:
-			#date and time
-			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d %H:%M:%S')
-			addTime = myTimestamp + datetime.timedelta(seconds=addSeconds)
-			myStrAddTime = addTime.strftime('%Y-%m-%d %H:%M:%S')
-		else:
-			invalid = 1
+		myTimestamp, justDate = ParseDateTime(dateAsStr)
+		addTime = myTimestamp + datetime.timedelta(seconds=addSeconds)
+		myStrAddTime = FormatDateTime(addTime, justDate)
 	except:
+		#this includes ParseDateTime returning None (which cannot be unpacked)
 		invalid = 1
 
 	if invalid == 1:
@@ -266,7 +803,7 @@ def AddSecondsToDateTime(dateAsStr, addSeconds = 0):
 		return myStrAddTime
 
 def SubtractSecondsFromDateTime(dateAsStr, subtractSeconds = 0):
-	#takes as input 
+	#takes as input
 	#	a date/time in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d'
 	#	seconds to subtract from this time
 	#returns a string that represents the given datetime minus the provided seconds
@@ -274,21 +811,11 @@ def SubtractSecondsFromDateTime(dateAsStr, subtractSeconds = 0):
 	invalid = 0
 
 	try:
-		dateTimeList = string.replace(string.replace(dateAsStr, ":", "-"), " ", "-").split('-')
-	
-		if len(dateTimeList) == 3:
-			#simply a date
-			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d')
-			addTime = myTimestamp + datetime.timedelta(seconds=(-1)*subtractSeconds)
-			myStrAddTime = addTime.strftime('%Y-%m-%d')
-		elif len(dateTimeList) == 6:
-			#date and time
-			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d %H:%M:%S')
-			addTime = myTimestamp + datetime.timedelta(seconds=(-1)*subtractSeconds)
-			myStrAddTime = addTime.strftime('%Y-%m-%d %H:%M:%S')
-		else:
-			invalid = 1
+		myTimestamp, justDate = ParseDateTime(dateAsStr)
+		addTime = myTimestamp + datetime.timedelta(seconds=(-1)*subtractSeconds)
+		myStrAddTime = FormatDateTime(addTime, justDate)
 	except:
+		#this includes ParseDateTime returning None (which cannot be unpacked)
 		invalid = 1
 
 	if invalid == 1:
@@ -298,25 +825,20 @@ def SubtractSecondsFromDateTime(dateAsStr, subtractSeconds = 0):
 
 def StripMinutesAndSecondsFromDatetime(dateTimeAsStr):
 	#This function takes a datetime and strips the minutes and seconds out of the time
-	#If successful, the datetime is returned minus the minutes and seconds (in string format); if the datetime is invalid, None is returned 
+	#If successful, the datetime is returned minus the minutes and seconds (in string format); if the datetime is invalid, None is returned
 
 	invalid = 0
 
 	try:
-		dateTimeList = string.replace(string.replace(dateTimeAsStr, ":", "-"), " ", "-").split('-')
-	
-		if len(dateTimeList) == 3:
+		myTimestamp, justDate = ParseDateTime(dateTimeAsStr)
+
+		if (justDate):
 			#simply a date
-			myTimestamp = datetime.datetime.strptime(dateTimeAsStr, '%Y-%m-%d')
-			myTimestamp = myTimestamp.strftime('%Y-%m-%d')
-		elif len(dateTimeList) == 6:
-			#date and time
-			myTimestamp = datetime.datetime.strptime(dateTimeAsStr, '%Y-%m-%d %H:%M:%S')
-			myTimestamp = myTimestamp.replace(minute=0, second=0)
-			myTimestamp = myTimestamp.strftime('%Y-%m-%d %H:%M:%S')
+			myTimestamp = FormatDateTime(myTimestamp, True)
 		else:
-			invalid = 1
-			
+			#date and time
+			myTimestamp = FormatDateTime(myTimestamp.replace(minute=0, second=0))
+
 	except:
 		invalid = 1
 
@@ -325,6 +847,208 @@ def StripMinutesAndSecondsFromDatetime(dateTimeAsStr):
 	else:
 		return myTimestamp
 	
+def FormatDateTimeArray(timestamps, justDate = False):
+	#Formats a datetime64 array as '%Y-%m-%d %H:%M:%S' (or '%Y-%m-%d' if justDate) strings without going through python datetime objects; NaT comes back as 'NaT'
+	if (justDate): return np.datetime_as_string(timestamps, unit='D')
+	
+	myStrings = np.datetime_as_string(timestamps, unit='s')
+	myStrings = myStrings.astype(myStrings.dtype.kind + '19')
+	#numpy separates the date and time with a 'T'; swap in the space in place by looking at the strings as a (rows x 19) grid of characters
+	myStrings.view(myStrings.dtype.kind + '1').reshape(-1, 19)[:, 10] = ' '
+	return myStrings
+
+def SecondsAsTimedelta(seconds):
+	#Converts seconds (a single number or one per row) into numpy timedelta64[ns] the same way datetime.timedelta(seconds=x) would (it keeps microseconds)
+	mySeconds = np.asarray(seconds)
+	
+	if (mySeconds.dtype.kind in 'iub'):
+		return mySeconds.astype(np.int64).astype('timedelta64[s]').astype('timedelta64[ns]')
+	else:
+		return (np.round(mySeconds.astype(float) * 1e6).astype(np.int64) * 1000).astype('timedelta64[ns]')
+
+def RowValue(values, myRow):
+	#Returns values[myRow] if values holds one value per row, or values itself if its a single value
+	if (np.ndim(values) > 0): return np.asarray(values).reshape(-1)[myRow]
+	else: return values
+
+def ApplyToDateTimeArray(dates, vectorFunction, scalarFunction, returnValidity = False):
+	"""
+	This is the engine behind the vectorized ('...Series') functions below; you should not need to call it directly.
+	
+	dates can be a pandas Series, a numpy array or a list. Strings must be in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d' (just like the scalar functions);
+		a datetime64 Series / array is also accepted.
+	vectorFunction takes the parsed dates (a datetime64[ns] array, NaT for nulls) and returns the adjusted dates the same way, with NaT for any it could not adjust.
+	scalarFunction takes a single input value and its row number, and returns what the scalar function would for that row.
+	
+	For strings, the result is the same as calling scalarFunction on every row:
+	1. Everything is parsed by pandas in one shot, and a row only counts as parsed if formatting the result reproduces the input exactly - that is what
+		holds pandas (which is far more forgiving) to the two layouts. Impossible dates like '2020-02-30' become NaT.
+	2. Rows whose input or result is outside of what pandas can hold (or before 1900, which FormatDateTime refuses just like strftime in Python 2) - along with anything else that
+		is not null but did not parse - are handed to scalarFunction one at a time, so there is exactly one set of rules for what is valid. For normal data
+		this is a handful of rows, if any.
+	3. Nulls are skipped outright; the scalar functions return None (or False) for them anyway.
+	
+	The return value matches the input - a Series (with the same index) if a Series was passed in, a numpy array otherwise:
+	- datetime64 input returns datetime64 (NaT where the input was NaT) - or a boolean mask if returnValidity is True.
+	- string input returns strings in the layout of the input row (None where invalid) - or a boolean mask if returnValidity is True.
+	"""
+	myIndex = None
+	myName = None
+	if (isinstance(dates, pd.Series)):
+		myIndex = dates.index
+		myName = dates.name
+		myValues = dates.values
+	else:
+		myValues = np.asarray(dates)
+	
+	#make sure myValues is never a 0-d array (someone passed in a single value)
+	myValues = myValues.reshape(-1)
+	
+	if (myValues.dtype.kind == 'M'):
+		#already datetime64 - there is no string layout to keep, so this is pure array math
+		myTimestamps = myValues.astype('datetime64[ns]')
+		myValid = ~np.isnat(myTimestamps)
+		
+		if (returnValidity):
+			myResult = myValid
+		else:
+			myResult = vectorFunction(myTimestamps)
+	else:
+		myObjects = myValues.astype(object)
+		myTimestamps = np.array(pd.to_datetime(myObjects, format='%Y-%m-%d %H:%M:%S', errors='coerce').values, dtype='datetime64[ns]')
+		myIsDateTime = (FormatDateTimeArray(myTimestamps).astype(object) == myObjects)
+		myIsDateOnly = (FormatDateTimeArray(myTimestamps, justDate = True).astype(object) == myObjects)
+		myTimestamps[~(myIsDateTime | myIsDateOnly)] = np.datetime64('NaT')
+		
+		myAdjusted = vectorFunction(myTimestamps)
+		
+		#only rows whose input and result are both safely inside the range FormatDateTime handles are done here; see step 2 in the docstring
+		myEarliest = np.datetime64('1900-01-01', 'ns')
+		myFast = (~np.isnat(myTimestamps)) & (~np.isnat(myAdjusted)) & (myTimestamps >= myEarliest) & (myAdjusted >= myEarliest)
+		mySlow = np.flatnonzero((~myFast) & pd.notnull(myValues))
+		
+		if (returnValidity):
+			myResult = myFast.copy()
+		else:
+			myResult = np.full(len(myValues), None, dtype=object)
+			
+			myMask = myFast & myIsDateTime
+			if (myMask.any()):
+				myResult[myMask] = FormatDateTimeArray(myAdjusted[myMask]).astype(object)
+			myMask = myFast & myIsDateOnly
+			if (myMask.any()):
+				myResult[myMask] = FormatDateTimeArray(myAdjusted[myMask], justDate = True).astype(object)
+		
+		for myRow in mySlow:
+			myResult[myRow] = scalarFunction(myValues[myRow], myRow)
+	
+	if (myIndex is not None): return pd.Series(myResult, index=myIndex, name=myName)
+	else: return myResult
+
+@Profiled('DateFunctions.CheckIfDateTimeValidSeries')
+def CheckIfDateTimeValidSeries(dates):
+	"""
+	The vectorized version of CheckIfDateTimeValid - takes a pandas Series / numpy array / list of dates and returns a boolean mask (a Series if a Series was passed in)
+		that is True where the date is valid.
+	Strings must be in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d'; for a datetime64 Series / array, everything but NaT is valid.
+	"""
+	myDelta = SecondsAsTimedelta(-1)
+	return ApplyToDateTimeArray(dates, lambda myTimestamps: myTimestamps + myDelta, lambda myDate, myRow: CheckIfDateTimeValid(myDate), returnValidity = True)
+
+@Profiled('DateFunctions.AddSecondsToDateTimeSeries')
+def AddSecondsToDateTimeSeries(dates, addSeconds = 0):
+	"""
+	The vectorized version of AddSecondsToDateTime - takes a pandas Series / numpy array / list of dates and adds addSeconds to each.
+	addSeconds can be a single number or one number per row.
+	Strings (in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d') come back as strings in the same layout, with None for invalid dates; a datetime64 Series / array
+		comes back as datetime64 (with NaT for NaT).
+	"""
+	myDelta = SecondsAsTimedelta(addSeconds).reshape(-1)
+	return ApplyToDateTimeArray(dates, lambda myTimestamps: myTimestamps + myDelta, lambda myDate, myRow: AddSecondsToDateTime(myDate, RowValue(addSeconds, myRow)))
+
+@Profiled('DateFunctions.SubtractSecondsFromDateTimeSeries')
+def SubtractSecondsFromDateTimeSeries(dates, subtractSeconds = 0):
+	"""
+	The vectorized version of SubtractSecondsFromDateTime - takes a pandas Series / numpy array / list of dates and subtracts subtractSeconds from each.
+	subtractSeconds can be a single number or one number per row. Return values follow AddSecondsToDateTimeSeries.
+	"""
+	myDelta = SecondsAsTimedelta((-1)*np.asarray(subtractSeconds)).reshape(-1)
+	return ApplyToDateTimeArray(dates, lambda myTimestamps: myTimestamps + myDelta, lambda myDate, myRow: SubtractSecondsFromDateTime(myDate, RowValue(subtractSeconds, myRow)))
+
+@Profiled('DateFunctions.StripMinutesAndSecondsFromDatetimeSeries')
+def StripMinutesAndSecondsFromDatetimeSeries(dates):
+	"""
+	The vectorized version of StripMinutesAndSecondsFromDatetime - takes a pandas Series / numpy array / list of dates and strips the minutes and seconds out of each.
+	Strings come back as strings in the same layout (date-only strings are simply passed back), with None for invalid dates; a datetime64 Series / array is floored
+		to the hour and comes back as datetime64.
+	"""
+	return ApplyToDateTimeArray(dates, lambda myTimestamps: myTimestamps.astype('datetime64[h]').astype('datetime64[ns]'), lambda myDate, myRow: StripMinutesAndSecondsFromDatetime(myDate))
+
+def ConvertTimestampsToTimezone(timestamps, from_tz, to_tz, is_dst = None):
+	"""
+	Converts a numpy datetime64 array of (naive) times in from_tz into the same times in to_tz (also naive) in one pass, using the cached transition tables from
+	TimezoneTable; the result is a datetime64[ns] array with NaT for NaT.
+	is_dst decides the times that are ambiguous or do not exist in from_tz, the same way it does for ConvertDateTimeToTimezone - except that with is_dst=None
+		those rows come back as NaT instead of raising, so one bad row does not stop the whole batch.
+	"""
+	myLocal = np.asarray(timestamps).astype('datetime64[ns]').astype(np.int64)
+	myStarts, myOffsets, myIsDst = TimezoneTable(from_tz)
+
+	#stay well away from the ends of what int64 nanoseconds can hold (NaT is the smallest int64), so adding an offset cannot wrap around
+	myLimit = 9000000000 * 1000000000
+	myUsable = (myLocal > -myLimit) & (myLocal < myLimit)
+
+	#myPeriod is the last period that has started (in its own local time) by each time; the only other period that time could belong to is the one before it
+	myPeriod = np.clip(np.searchsorted(myStarts + myOffsets, myLocal, side='right') - 1, 0, len(myStarts) - 1)
+	myPrevious = np.maximum(myPeriod - 1, 0)
+	myNextStarts = np.append(myStarts[1:], np.iinfo(np.int64).max)
+
+	myInPeriod = (myLocal - myOffsets[myPeriod]) < myNextStarts[myPeriod]
+	myInPrevious = (myPeriod > 0) & ((myLocal - myOffsets[myPrevious]) >= myStarts[myPrevious]) & ((myLocal - myOffsets[myPrevious]) < myStarts[myPeriod])
+
+	myChosen = np.where(myInPeriod, myPeriod, myPrevious)
+	myAmbiguous = myInPeriod & myInPrevious
+	myNonexistent = (~myInPeriod) & (~myInPrevious)
+
+	if (is_dst is None):
+		myUsable &= ~(myAmbiguous | myNonexistent)
+	else:
+		#ambiguous: like pytz's localize, take the period whose daylight saving flag matches is_dst - and if both (or neither) match, the first one for True and
+		#	the second one for False
+		myPickPrevious = np.where(myIsDst[myPrevious] != myIsDst[myPeriod], myIsDst[myPrevious] == bool(is_dst), bool(is_dst))
+		myChosen[myAmbiguous & myPickPrevious] = myPrevious[myAmbiguous & myPickPrevious]
+
+		#nonexistent: the clocks jumped over this time at the end of myPeriod; True reads it with the offset after the jump, False with the one before it
+		if (is_dst): myChosen[myNonexistent] = np.minimum(myPeriod[myNonexistent] + 1, len(myStarts) - 1)
+		else: myChosen[myNonexistent] = myPeriod[myNonexistent]
+
+	myUTC = myLocal - myOffsets[myChosen]
+
+	myStarts, myOffsets, myIsDst = TimezoneTable(to_tz)
+	myPeriod = np.clip(np.searchsorted(myStarts, myUTC, side='right') - 1, 0, len(myStarts) - 1)
+
+	myResult = (myUTC + myOffsets[myPeriod]).astype('datetime64[ns]')
+	myResult[~myUsable] = np.datetime64('NaT')
+	return myResult
+
+@Profiled('DateFunctions.ConvertDateTimeToTimezoneSeries')
+def ConvertDateTimeToTimezoneSeries(dates, from_tz, to_tz, is_dst = None):
+	"""
+	The vectorized version of ConvertDateTimeToTimezone - takes a pandas Series / numpy array / list of dates in from_tz and converts them all to to_tz at once.
+	Strings (in the format '%Y-%m-%d %H:%M:%S' OR '%Y-%m-%d') come back as strings in the same layout, with None for invalid dates; a datetime64 Series / array
+		(of naive times) comes back as datetime64 (with NaT for NaT).
+	is_dst works just like it does in ConvertDateTimeToTimezone, except that with is_dst=None, times that are ambiguous or do not exist in from_tz come back as
+		None (NaT) instead of raising - see ConvertTimestampsToTimezone.
+	"""
+	return ApplyToDateTimeArray(dates, lambda myTimestamps: ConvertTimestampsToTimezone(myTimestamps, from_tz, to_tz, is_dst), lambda myDate, myRow: ConvertDateTimeToTimezoneOrNone(myDate, from_tz, to_tz, is_dst))
+
+def ConvertDateTimeToTimezoneOrNone(DateTimeAsSTR, from_tz, to_tz, is_dst = None):
+	#ConvertDateTimeToTimezone, but with None in place of any error (like an ambiguous time with is_dst=None); the batch conversion falls back on this
+	try:
+		return ConvertDateTimeToTimezone(DateTimeAsSTR, from_tz, to_tz, is_dst)
+	except:
+		return None
+	
 def PrintTimestampedMsg(printProgressToScreen = False, myMsg = "NULL", useUTC = True, printToFile = None):
 	#if printProgressToScreen, a timestamp and the supplied message is printed to the screen
 	#if printToFile is an opened file, this will print the message to that file. This can be used as a log
@@ -333,7 +1057,7 @@ def PrintTimestampedMsg(printProgressToScreen = False, myMsg = "NULL", useUTC =
 			myTimestamp = datetime.datetime.utcnow()
 		else:
 			myTimestamp = datetime.datetime.now()
-		myStrTimestamp = myTimestamp.strftime('%Y-%m-%d %H:%M:%S')
+		myStrTimestamp = FormatDateTime(myTimestamp)
 		print "{}: {}".format(myStrTimestamp, myMsg)
 	
 	if printToFile is not None:
@@ -342,7 +1066,7 @@ def PrintTimestampedMsg(printProgressToScreen = False, myMsg = "NULL", useUTC =
 				myTimestamp = datetime.datetime.utcnow()
 			else:
 				myTimestamp = datetime.datetime.now()
-			myStrTimestamp = myTimestamp.strftime('%Y-%m-%d %H:%M:%S')
+			myStrTimestamp = FormatDateTime(myTimestamp)
 			printToFile.write("{}: {}\n".format(myStrTimestamp, myMsg))
 		except:
 			pass
@@ -0,0 +1,123 @@
+import sys
+import string
+import datetime
+import platform
+import pandas as pd
+import numpy as np
+
+import DateFunctions as DateFunc
+"""
+This file holds a micro-benchmark for the scalar DateFunctions (AddSecondsToDateTime, CheckIfDateTimeValid and ConvertDateTimeToTimezone), comparing the fixed width
+parser / cache (ParseDateTime and FormatDateTime) against the strptime / strftime path the functions used before.
+
+The quickest way to run it is from the command line:
+python DateFunctionsBenchmark.py [numValues]
+for example 'python DateFunctionsBenchmark.py 100000'; if no count is given, 200k values are run.
+"""
+
+def StrptimeAddSecondsToDateTime(dateAsStr, addSeconds = 0):
+	#AddSecondsToDateTime as it was before ParseDateTime / FormatDateTime, kept here as the baseline
+
+	try:
+		dateTimeList = string.replace(string.replace(dateAsStr, ":", "-"), " ", "-").split('-')
+
+		if len(dateTimeList) == 3:
+			#simply a date
+			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d')
+			return (myTimestamp + datetime.timedelta(seconds=addSeconds)).strftime('%Y-%m-%d')
+		elif len(dateTimeList) == 6:
+			#date and time
+			myTimestamp = datetime.datetime.strptime(dateAsStr, '%Y-%m-%d %H:%M:%S')
+			return (myTimestamp + datetime.timedelta(seconds=addSeconds)).strftime('%Y-%m-%d %H:%M:%S')
+	except:
+		pass
+
+	return None
+
+def StrptimeCheckIfDateTimeValid(dateAsStr):
+	#CheckIfDateTimeValid as it was before ParseDateTime / FormatDateTime; the baseline
+	return (StrptimeAddSecondsToDateTime(dateAsStr, -1) is not None)
+
+def StrptimeConvertDateTimeToTimezone(DateTimeAsSTR, from_tz, to_tz, is_dst=None):
+	#ConvertDateTimeToTimezone as it was before ParseDateTime / FormatDateTime (which parsed the string twice - once to validate it); the baseline
+	convertTO = DateFunc.pytz.timezone(to_tz)
+	convertFROM = DateFunc.pytz.timezone(from_tz)
+
+	if (StrptimeCheckIfDateTimeValid(DateTimeAsSTR)):
+		if (len(DateTimeAsSTR) == 10): myFormat = '%Y-%m-%d'
+		else: myFormat = '%Y-%m-%d %H:%M:%S'
+
+		from_dt = convertFROM.localize(datetime.datetime.strptime(DateTimeAsSTR, myFormat), is_dst=is_dst)
+		return convertTO.normalize(from_dt.astimezone(convertTO)).strftime(myFormat)
+	else:
+		return None
+
+def GenerateDateStrings(numValues, uniqueValues = None, dateOnlyRate = .3, invalidRate = .01, seed = 0):
+	"""
+	Returns a list of numValues date strings, drawn from 'uniqueValues' distinct values (or all distinct, if None) - which is what decides how much the cache helps.
+	'dateOnlyRate' of them are in the '%Y-%m-%d' layout (the rest are '%Y-%m-%d %H:%M:%S') and 'invalidRate' of them are impossible dates.
+	"""
+	myRandom = np.random.RandomState(seed)
+
+	if (uniqueValues is None): myCount = numValues
+	else: myCount = min(uniqueValues, numValues)
+
+	#seconds from 2000-01-01 spread over 20 years
+	mySeconds = myRandom.randint(0, 20 * 365 * 86400, size = myCount).astype('timedelta64[s]')
+	myValues = DateFunc.FormatDateTimeArray(np.datetime64('2000-01-01 00:00:00') + mySeconds).astype(object)
+
+	myDateOnly = myRandom.random_sample(myCount) < dateOnlyRate
+	myValues[myDateOnly] = [y[:10] for y in myValues[myDateOnly]]
+
+	myInvalid = myRandom.random_sample(myCount) < invalidRate
+	myValues[myInvalid] = [y[:5] + '02-30' + y[10:] for y in myValues[myInvalid]]
+
+	if (myCount < numValues): myValues = myValues[myRandom.randint(0, myCount, size = numValues)]
+
+	return myValues.tolist()
+
+def TimeCalls(myFunction, myValues, *args):
+	#Calls myFunction on every value and returns a tuple of (the results, the wall clock seconds)
+	myTimer = DateFunc.TimeIt()
+	myResults = [myFunction(y, *args) for y in myValues]
+	myTimer.Stop()
+	return myResults, myTimer.GetTimeDeltaInSeconds()
+
+def RunBenchmarks(numValues = 200000, uniqueValues = [1000, None], seed = 0, printProgressToScreen = True):
+	"""
+	Times each function over numValues generated strings, once for each entry in 'uniqueValues' (None means every string is different, so the cache never hits), and
+	returns a dataframe with one row per function and uniqueValues: benchmark, values, uniqueValues, strptimeSeconds, fastSeconds, speedup.  The cache is cleared
+	before each timing, and the results of both paths are checked against each other (a mismatch raises an AssertionError).
+	"""
+	myResults = []
+
+	myFunctions = [('AddSecondsToDateTime', StrptimeAddSecondsToDateTime, DateFunc.AddSecondsToDateTime, (3600,)),
+		('CheckIfDateTimeValid', StrptimeCheckIfDateTimeValid, DateFunc.CheckIfDateTimeValid, ()),
+		('ConvertDateTimeToTimezone', StrptimeConvertDateTimeToTimezone, DateFunc.ConvertDateTimeToTimezone, ('UTC', 'US/Eastern'))]
+
+	for myUnique in uniqueValues:
+		myValues = GenerateDateStrings(numValues, uniqueValues = myUnique, seed = seed)
+
+		for myName, myBaseline, myFast, myArgs in myFunctions:
+			DateFunc.PrintTimestampedMsg(printProgressToScreen, "Running {} over {} values ({} unique)".format(myName, numValues, myUnique))
+
+			DateFunc.parsedDateTimeCache.Clear()
+			myExpected, myBaselineSeconds = TimeCalls(myBaseline, myValues, *myArgs)
+			DateFunc.parsedDateTimeCache.Clear()
+			myActual, myFastSeconds = TimeCalls(myFast, myValues, *myArgs)
+
+			assert (myExpected == myActual), "{} returned different results than the strptime path".format(myName)
+
+			myResults.append({'benchmark': myName, 'values': numValues, 'uniqueValues': myUnique, 'strptimeSeconds': myBaselineSeconds, 'fastSeconds': myFastSeconds})
+
+	dfResults = pd.DataFrame(myResults, columns = ['benchmark', 'values', 'uniqueValues', 'strptimeSeconds', 'fastSeconds'])
+	dfResults['speedup'] = dfResults['strptimeSeconds'] / dfResults['fastSeconds']
+	dfResults.insert(0, 'python', platform.python_version())
+
+	return dfResults
+
+if __name__ == '__main__':
+	if (len(sys.argv) > 1):
+		print(RunBenchmarks(int(sys.argv[1])).to_string(index = False))
+	else:
+		print(RunBenchmarks().to_string(index = False))
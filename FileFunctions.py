@@ -10,6 +10,8 @@ import grp
 import pandas as pd
 import numpy as np
 
+import DateFunctions as DateFunc
+
 import smtplib
 import mimetypes
 import shutil
@@ -166,6 +168,7 @@ def CheckIfRemoteFileExists(userName, hostName, fileDirAndName):
 		
 	return success
 
+@DateFunc.Profiled('FileFunctions.GetRemoteFile')
 def GetRemoteFile(userName, hostName, foreignFileDir, foreignFileName, localDirectory, localFileName = None):
 	"""
 	This sub gets a remote file from a server that supports ssh
@@ -197,6 +200,7 @@ def GetRemoteFile(userName, hostName, foreignFileDir, foreignFileName, localDire
 	return success
 
 
+@DateFunc.Profiled('FileFunctions.UploadFileToRemoteHost')
 def UploadFileToRemoteHost(userName, hostName, localDirectory, localFileName, foreignFileDir, foreignFileName = None):
 	"""
 	This sub uploads a file on a remote server that supports ssh
@@ -232,6 +236,7 @@ def UploadFileToRemoteHost(userName, hostName, localDirectory, localFileName, fo
 	return success
 	
 
+@DateFunc.Profiled('FileFunctions.GetFileWalkInformation')
 def GetFileWalkInformation(baseDirectory, getUID = False, getUserName = False, getGID = False, getGroupName = False, getAccessTime = False, getModifiedTime = False, get_md5sum = False, get_sha1sum = False, get_sha256sum = False, get_sha512sum = False, followLinks = False, printProgressToScreen = False, useUTC = False):
 	"""
 	This function performs a 'walk' on a directory; this means you provide a directory, and this function will go find all files in all subdirectories along with some 
@@ -522,6 +527,7 @@ def	__compressFiles(mySeries, baseDirectory, targetDirectory, deleteIfZipped, zi
 	#the '."*' is important
 	#if ((FileFunc.RunCommandWithResults("ls -la " + '"' + newLocation + '/' + mySeries[1] + '."*') is not None) & (unZipPerformed) & (deleteIfUnzipped)): os.remove(mySeries[0] + '/' + mySeries[1] + mySeries[2])
 	
+@DateFunc.Profiled('FileFunctions.CompressAllInDirectory')
 def CompressAllInDirectory(baseDirectory, targetDirectory = None, deleteIfZipped = False, getZipped_sha256sum = True, zipType = 0, printProgressToScreen = True, useUTC = False):
 	"""
 	This function takes a directory and compresses (via unzip, gunzip, or 7z) all files in that base directory (As well as all subdirectories) and saves them to a target directory 
@@ -645,6 +651,7 @@ def	__decompressFiles(mySeries, baseDirectory, targetDirectory, deleteIfUnzipped
 	#the '."*' is important
 	if ((RunCommandWithResults("ls -la " + '"' + newLocation + '/' + mySeries[1] + '."*') is not None) & (unZipPerformed) & (deleteIfUnzipped)): os.remove(mySeries[0] + '/' + mySeries[1] + mySeries[2])
 
+@DateFunc.Profiled('FileFunctions.DecompressAllInDirectory')
 def DecompressAllInDirectory(baseDirectory, targetDirectory = None, deleteIfUnzipped = False, getUnzipped_sha256sum = True, unzipZipFiles = True, unzip7zFiles = True, unzipGzFiles = True, printProgressToScreen = False, useUTC = False):
 	"""
 	This function takes a directory and decompresses (via unzip, gunzip, and 7z) all files in that base directory (As well as all subdirectories) to a target directory (if one is supplied, 
@@ -1,174 +1,1724 @@
+import os
 import re
+import copy
+import heapq
+import collections
+import pickle
+import multiprocessing
 import pandas as pd
 import numpy as np
 import difflib
 
+#rapidfuzz is optional; if its installed, the non-difflib scorers use its compiled (C++) implementations, otherwise they fall back to NumPy
+try:
+	from rapidfuzz import process as rapidfuzzProcess
+	from rapidfuzz import fuzz as rapidfuzzFuzz
+	from rapidfuzz.distance import Levenshtein as rapidfuzzLevenshtein
+	from rapidfuzz.distance import JaroWinkler as rapidfuzzJaroWinkler
+	from rapidfuzz.distance import Indel as rapidfuzzIndel
+	rapidfuzzAvailable = True
+except ImportError:
+	rapidfuzzAvailable = False
+
 import DateFunctions as DateFunc
 """
 This file holds functions that help match records in one table/dataframe with records in another table/dataframe across variable columns with variable confidence levels.
 """
-def findMatches(dataframeA, dataframeB, matchDictionary, matchConfidenceCol = 'matchConfidence', enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, saveUnusedFromDataframeA = 1, saveUnusedFromDataframeB = 1, printProgressToScreen = False):
+@DateFunc.Profiled('MatchConfidence.findMatches')
+def findMatches(dataframeA, dataframeB, matchDictionary, matchConfidenceCol = 'matchConfidence', enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, saveUnusedFromDataframeA = 1, saveUnusedFromDataframeB = 1, printProgressToScreen = False, blockingKey = None, maxCandidates = 100, workers = 1, matchIndex = None, returnTierReport = False, assignment = 'greedy', assignmentDepth = 10, returnColumns = None):
 	"""
 	Rules
 	1. The column names in each dataframe must be unique
-	2. The following column names CANNOT be used: origIndexA, origIndexB, matchConfidence, findMatchString
+	2. The following column names CANNOT be used: origIndexA, origIndexB, matchConfidence
 	3. You can use the fuzzy string pattern matching, but its best to compare strings first without the fuzzy part - this is far faster and will most likely eliminate many matches beforehand
 	
 	This function uses dataframeA as an anchor and matches to B; its assumed that dataframeA has unique keys, although this is not enforced.
 	
-	Note that this returns a dataframe containing ALL DATA from dataframes A and B; two new columns are also created, origIndexA and origIndexB, which list the original 
-	index mappings.  Use these to map one to the other.  If one is NULL, it means there was not a match found for that row
+	Note that this returns a dataframe containing ALL DATA from dataframes A and B; two new columns are also created, origIndexA and origIndexB, which list the original 
+	index mappings.  Use these to map one to the other.  If one is NULL, it means there was not a match found for that row
+	The columns are always laid out as origIndexA, origIndexB, matchConfidenceCol, then the columns of A, then the columns of B.  Neither dataframe is copied or 
+	modified - the tiers only ever look at the key columns, and the wide result is put together once at the very end.
+	
+	If no records were matched it simply returns an empty dataframe; to check for an empty dataframe from the calling function:
+	if (returnedDataFrame.empty): <whatever>
+	
+	'matchDictionary' takes an object that is formatted by the 'createMatchDictionary' function below.
+	
+	'matchConfidenceCol' is the column name where the match confidence is stored.
+	
+	'enforceUniqueMatch' = 1 forces a 1:1 matchup IF a match exists; in other words, if multiple elements of B match A for any given match confidence, only 
+	one match is used. Set this to 0 to ignore this.
+	
+	'matchChallengerToMultipleMasters' is used where the master (dataframeA) to challenger (dataframeB) list is 1:many (meaning B can be shared to multiple As but a single A cannot be shared 
+	by multiple Bs), and in these cases we wish to remove the master column (which was already matched) and NOT the corresponding value of dataframeB (as the same value in B can match 
+	multiple values in A, but A must only be matched once).   If matchChallengerToMultipleMasters is set to 1, removal of the challenger identification will NOT happen and thus all values in B
+	can be used multiple times; this is defaulted to 0. 
+	Note this is different from 'enforceUniqueMatch', as 'enforceUniqueMatch' speaks only to ties for a specific match confidence.
+	Also note that currently, many:1 or many:many is not allowed at all.  The master MUST be a 1:? 
+
+	'saveUnusedFromDataframeA'/'saveUnusedFromDataframeB' means if there are any unmatched rows from dataframe A (or respectively B), tack on to the end before returning the matches. Default
+	is 1 (meaning tack on matches). 	
+	
+	'blockingKey' turns on candidate blocking for the fuzzy string tiers (see the 'CandidateIndex' class below).  By default (None) every value in A is scored against 
+	every remaining value in B, which is O(|A|*|B|) SequenceMatcher work; set this to 'ngram' (character trigrams) or 'token' (whitespace separated words) and each value 
+	in A is only scored against the (at most) 'maxCandidates' values in B that share the most blocking keys with it.  The cutoff ('strLikenessPcnt') means exactly the 
+	same thing either way - blocking only limits which values of B get scored.
+	
+	'workers' is the number of processes used to score the fuzzy string tiers; the default (1) scores everything in this process.  If this is above 1, the values of A 
+	are split across a process pool (see 'GetClosestStringMatchesInParallel') and the results are reconciled in the original row order, so the matches are exactly the 
+	same as the single process run.
+	
+	'matchIndex' takes a MatchIndex (see below) that was built from dataframeB ahead of time; if its passed, dataframeB is ignored (it can be None) and all of the 
+	B side preparation (lower-casing, null filtering, building candidate lists and join keys) is taken from the index instead of being redone.  The index's own 
+	blocking settings are used for the fuzzy tiers, so 'blockingKey' and 'maxCandidates' are ignored for any tier the index covers.
+	
+	'assignment' picks how the fuzzy string tiers hand out the values of B.  The default ('greedy') goes down A in order and each value takes its closest remaining 
+	value of B, so an early row of A can take the value of B that a later row matched far better (and the result depends on the order of A).  'optimal' keeps the 
+	'assignmentDepth' best values of B for each value of A and then solves for the 1:1 assignment with the highest total score (see 'GetOptimalStringAssignment'); 
+	its slower than greedy, but the matches no longer depend on the order of A (other than how exact ties are broken).  With blocking on, only the sparse top lists are ever held, so it scales to large 
+	frames.
+	
+	'returnTierReport' - if this is True, a tuple is returned instead: the matched dataframe (exactly as above) and a dataframe with one row per match tier that 
+	shows where the time went (use report.to_dict('records') if a list of dictionaries is easier to log).  The columns are:
+	- tier / <matchConfidenceCol>: the tier number and its match confidence
+	- seconds: the wall clock time spent on the tier
+	- rowsBeforeA / rowsAfterA / rowsBeforeB / rowsAfterB: the rows of A and B that were still unmatched going into (and coming out of) the tier
+	- candidatePairs: the number of (A, B) pairs whose keys matched, before enforceUniqueMatch was applied
+	- matchesAccepted: the number of matches the tier kept
+	- fuzzyLookups / fuzzyComparisons: the number of strings of A that were fuzzy matched, and the number of candidate strings of B that were scored for them 
+		(both are 0 for a tier with no fuzzy columns)
+	If printProgressToScreen is True, a line per tier is printed as well.
+	
+	'returnColumns' - by default (None) every column of A and B is returned.  Pass a list of column names and only origIndexA, origIndexB, matchConfidenceCol and 
+	those columns are returned (names that are in neither dataframe are ignored); pass an empty list to get just the mapping.  The other columns are never 
+	gathered, so on wide dataframes this saves most of the memory (and time) that goes into building the result.
+	
+	Example - just the mapping, then the columns that are needed pulled from A by its index:
+	mapping = findMatches(dataframeA, dataframeB, matchDictionary, returnColumns = [])
+	mapping = mapping.join(dataframeA[['customerName']], on = 'origIndexA')
+	"""
+	
+	#neither dataframe is copied or modified - the tiers only read the key columns, and the result is built once at the end from the rows that are returned
+	if (matchIndex is not None):
+		#the index holds its own copy of B, which is never modified
+		dfB = matchIndex.dataframeB
+		columnNamesB = matchIndex.columnNamesB
+	else:
+		dfB = dataframeB
+		columnNamesB = dfB.columns.values
+	
+	#True for every row that has not been matched yet
+	availableA = np.ones(dataframeA.shape[0], dtype=bool)
+	availableB = np.ones(dfB.shape[0], dtype=bool)
+	
+	myTierReport = []
+	matchedPairs = MatchTiers(dataframeA, dfB, matchDictionary, availableA, availableB, matchConfidenceCol = matchConfidenceCol, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, matchIndex = matchIndex, tierReport = myTierReport, assignment = assignment, assignmentDepth = assignmentDepth)
+	
+	for myTier in myTierReport:
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Tier {} ({}): {} matches from {} candidate pairs in {:.3f} seconds; {} of A and {} of B left".format(myTier['tier'], myTier[matchConfidenceCol], myTier['matchesAccepted'], myTier['candidatePairs'], myTier['seconds'], myTier['rowsAfterA'], myTier['rowsAfterB']))
+	
+	if (len(matchedPairs) == 0):
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Warning: No matches found!")
+		
+		matched = pd.DataFrame()
+	else:
+		#if there are some elements left in either A or B, lump them on the bottom. leave their matchConfidence NULL
+		#also check to see if it was indicated that we wish to lump them or not with saveUnusedFromDataframeA/B 
+		if (saveUnusedFromDataframeA == 1): unusedRowsA = np.flatnonzero(availableA)
+		else: unusedRowsA = []
+		if (saveUnusedFromDataframeB == 1): unusedRowsB = np.flatnonzero(availableB)
+		else: unusedRowsB = []
+		
+		#everything is stitched together exactly once, with a fresh index (0, 1, 2...)
+		matched = BuildMatchedFrame(dataframeA, dfB, matchedPairs, unusedRowsA, unusedRowsB, matchConfidenceCol = matchConfidenceCol, columnsA = ReturnedColumns(dataframeA.columns.values, returnColumns), columnsB = ReturnedColumns(columnNamesB, returnColumns))
+	
+	if (returnTierReport):
+		return matched, TierReportToDataFrame(myTierReport, matchConfidenceCol)
+	else:
+		return matched
+
+def findMatchesInChunks(chunksOfA, dataframeB, matchDictionary, matchConfidenceCol = 'matchConfidence', enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, saveUnusedFromDataframeA = 1, saveUnusedFromDataframeB = 1, printProgressToScreen = False, blockingKey = None, maxCandidates = 100, workers = 1, matchIndex = None, tierReport = None, assignment = 'greedy', assignmentDepth = 10, returnColumns = None):
+	"""
+	This is the streaming version of findMatches, for when dataframeA is too large to hold in memory; its a generator that takes the A side in chunks and yields the 
+	matches for each chunk as soon as its done, so only one chunk of A (plus B) is ever held at once.
+	
+	'chunksOfA' is any iterable of dataframes that all have the same columns; for example pd.read_csv(myFile, chunksize = 500000) or, from a database, 
+	pd.read_sql(SQL, con = myDatabaseConnection.ReturnConnection(), chunksize = 500000).  The index of each chunk becomes origIndexA, so it should be unique across 
+	chunks (read_csv and read_sql number their chunks continuously, so this is already the case for them).
+	
+	B stays resident as a MatchIndex: if 'matchIndex' is passed its used (and dataframeB can be None), otherwise one is built once from dataframeB (using 
+	'blockingKey' and 'maxCandidates') before the first chunk is matched.
+	
+	Every chunk is run through all of the match tiers before the next chunk is started, and the rows of B that were used up stay used up for every later chunk (unless
+	matchChallengerToMultipleMasters is 1) - so each B row is still only matched once across the whole stream.  Because of this the matches can differ from a single
+	findMatches call over all of A when several rows of A compete for the same row of B (here the earlier chunk always wins).
+	
+	What is yielded:
+	- One dataframe per chunk holding that chunk's matches (laid out just like the findMatches result) followed by the chunk's unmatched rows if 
+		saveUnusedFromDataframeA is 1.  Chunks with nothing to return are skipped.
+	- After the last chunk, one more dataframe holding the rows of B that were never matched, if saveUnusedFromDataframeB is 1 and there are any.
+	
+	The rows of B that were never matched get the columns of A (left NULL) as well, so every dataframe yielded has the same columns.
+	
+	'tierReport' - since this is a generator, the tier report is not returned; instead pass a list and one dictionary per tier per chunk is appended to it (the same 
+	keys as the findMatches report, plus 'chunk').  TierReportToDataFrame(tierReport) turns it into a dataframe once the stream is done.
+	
+	All of the other parameters are the same as findMatches.
+	
+	Example:
+	for matched in findMatchesInChunks(pd.read_csv('/data/feed.csv', chunksize = 500000), dataframeB, matchDictionary):
+		matched.to_csv('/data/feedMatched.csv', mode = 'a', header = False)
+	"""
+	
+	#a profiled generator would only time its creation, so the work is profiled in spans that are closed before anything is yielded (the time the caller takes
+	#	with each chunk is not counted)
+	with DateFunc.ProfileSpan('MatchConfidence.findMatchesInChunks'):
+		if (matchIndex is None): matchIndex = MatchIndex(dataframeB, matchDictionary, blockingKey = blockingKey, maxCandidates = maxCandidates)
+	dfB = matchIndex.dataframeB
+	columnsB = ReturnedColumns(matchIndex.columnNamesB, returnColumns)
+	
+	#B's bookkeeping lives across every chunk
+	availableB = np.ones(dfB.shape[0], dtype=bool)
+	
+	#the columns of A are only known once a chunk has been read; the left over rows of B use them too
+	lastChunkOfA = pd.DataFrame()
+	
+	for chunkNumber, chunkOfA in enumerate(chunksOfA):
+		lastChunkOfA = chunkOfA
+		myMatched = None
+		
+		with DateFunc.ProfileSpan('MatchConfidence.findMatchesInChunks'):
+			availableA = np.ones(chunkOfA.shape[0], dtype=bool)
+			
+			myChunkReport = []
+			matchedPairs = MatchTiers(chunkOfA, dfB, matchDictionary, availableA, availableB, matchConfidenceCol = matchConfidenceCol, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, matchIndex = matchIndex, tierReport = myChunkReport, assignment = assignment, assignmentDepth = assignmentDepth)
+			if (tierReport is not None):
+				for myTier in myChunkReport:
+					myTier['chunk'] = chunkNumber
+					tierReport.append(myTier)
+			DateFunc.PrintTimestampedMsg(printProgressToScreen, "Chunk {}: {} of {} rows matched".format(chunkNumber, chunkOfA.shape[0] - availableA.sum(), chunkOfA.shape[0]))
+			
+			if (saveUnusedFromDataframeA == 1): unusedRowsA = np.flatnonzero(availableA)
+			else: unusedRowsA = []
+			
+			if ((len(matchedPairs) > 0) | (len(unusedRowsA) > 0)): myMatched = BuildMatchedFrame(chunkOfA, dfB, matchedPairs, unusedRowsA, [], matchConfidenceCol = matchConfidenceCol, columnsA = ReturnedColumns(chunkOfA.columns.values, returnColumns), columnsB = columnsB)
+		
+		if (myMatched is not None): yield myMatched
+	
+	if((availableB.any()) & (saveUnusedFromDataframeB == 1)):
+		with DateFunc.ProfileSpan('MatchConfidence.findMatchesInChunks'):
+			myMatched = BuildMatchedFrame(lastChunkOfA, dfB, [], [], np.flatnonzero(availableB), matchConfidenceCol = matchConfidenceCol, columnsA = ReturnedColumns(lastChunkOfA.columns.values, returnColumns), columnsB = columnsB)
+		yield myMatched
+
+@DateFunc.Profiled('MatchConfidence.findMatchesIncremental')
+def findMatchesIncremental(previousMatches, dataframeA, newRowsOfB, matchDictionary, matchConfidenceCol = 'matchConfidence', enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, saveUnusedFromDataframeA = 1, saveUnusedFromDataframeB = 1, printProgressToScreen = False, blockingKey = None, maxCandidates = 100, workers = 1, assignment = 'greedy', assignmentDepth = 10):
+	"""
+	This updates an earlier findMatches result when dataframeB has grown (or some of its rows changed), without re-running the match over the full history; the 
+	work done is in proportion to the new rows, not to the size of A and B.
+	
+	'previousMatches' is the earlier result of findMatches (with its origIndexA, origIndexB and matchConfidenceCol columns) over dataframeA and the earlier B.  
+	'newRowsOfB' holds the rows of B that are new or changed since then, with B's columns; its index is the index of B, so a row whose index was already in B is a 
+	changed row and any other row is new.
+	
+	What is done:
+	1. Every match in previousMatches is kept as is, unless its B row changed - then the match is dropped and its A row is 'freed'.
+	2. The rows of A that are not kept in a match (the ones that were never matched plus the freed ones) are matched against newRowsOfB, running every tier.
+	3. The freed rows of A - and any row of dataframeA that is not in previousMatches at all (new rows of A) - that are still unmatched are then matched against 
+		the rows of the earlier B that are still available (not changed, and unless matchChallengerToMultipleMasters is 1, not used in a kept match).
+	The old rows of B are rebuilt from previousMatches, so the unmatched rows of B must be in it (it must have been made with saveUnusedFromDataframeB = 1), along 
+	with all of B's columns (so it cannot be a result made with 'returnColumns').
+	
+	Note this is not always exactly what a full findMatches run would return: a new row of B never takes over a kept match, even if it matches that row of A at a 
+	higher confidence, and step 3 comes after step 2 for every tier rather than tier by tier.
+	
+	The result is laid out just like a findMatches result - the kept matches, the new matches, then (if saveUnusedFromDataframeA / saveUnusedFromDataframeB are 
+	1) the rows of A and B that are still unmatched - so it can be passed back in as previousMatches the next time.  All of the other parameters are the same as 
+	findMatches.
+	"""
+	
+	if (previousMatches.empty):
+		#there was nothing before, so everything has to be matched
+		return findMatches(dataframeA, newRowsOfB, matchDictionary, matchConfidenceCol = matchConfidenceCol, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, saveUnusedFromDataframeA = saveUnusedFromDataframeA, saveUnusedFromDataframeB = saveUnusedFromDataframeB, printProgressToScreen = printProgressToScreen, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, assignment = assignment, assignmentDepth = assignmentDepth)
+	
+	#split the earlier result into its matches, and keep the ones whose B row did not change
+	myMatched = previousMatches['origIndexA'].notnull() & previousMatches['origIndexB'].notnull()
+	myChangedB = previousMatches['origIndexB'].isin(newRowsOfB.index)
+	myKept = (myMatched & ~myChangedB).values
+	myKeptIndexA = previousMatches.loc[myKept, 'origIndexA']
+	myFreedIndexA = previousMatches.loc[(myMatched & myChangedB).values, 'origIndexA']
+	
+	#the rows of A that are up for grabs, and which of those get a second try against the old rows of B
+	dfA = dataframeA.loc[~dataframeA.index.isin(myKeptIndexA),:]
+	mySecondTryA = dfA.index.isin(myFreedIndexA) | ~dfA.index.isin(previousMatches['origIndexA'])
+	
+	#the old rows of B (one per origIndexB, with B's columns and indexed by origIndexB), minus the changed ones
+	dfOldB = previousMatches.loc[previousMatches['origIndexB'].notnull().values,:].drop_duplicates('origIndexB')
+	dfOldB = dfOldB.loc[~dfOldB['origIndexB'].isin(newRowsOfB.index).values,:]
+	dfOldB = dfOldB.set_index('origIndexB')[newRowsOfB.columns]
+	
+	availableA = np.ones(dfA.shape[0], dtype=bool)
+	availableNewB = np.ones(newRowsOfB.shape[0], dtype=bool)
+	if (matchChallengerToMultipleMasters == 0):
+		availableOldB = ~dfOldB.index.isin(previousMatches.loc[myKept, 'origIndexB'])
+	else:
+		availableOldB = np.ones(dfOldB.shape[0], dtype=bool)
+	
+	matchedPieces = [previousMatches.loc[myKept,:]]
+	
+	#everything that is not matched against the new rows of B
+	matchedPairs = MatchTiers(dfA, newRowsOfB, matchDictionary, availableA, availableNewB, matchConfidenceCol = matchConfidenceCol, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, assignment = assignment, assignmentDepth = assignmentDepth)
+	matchedPieces.append(BuildMatchedFrame(dfA, newRowsOfB, matchedPairs, [], [], matchConfidenceCol = matchConfidenceCol))
+	DateFunc.PrintTimestampedMsg(printProgressToScreen, "{} of {} unmatched rows of A matched to the {} new rows of B".format(dfA.shape[0] - availableA.sum(), dfA.shape[0], newRowsOfB.shape[0]))
+	
+	#the freed and new rows of A against what is left of the old rows of B; MatchTiers only flags rows in its own mask, so the ones it uses are carried back over
+	mySecondTryAvailable = availableA & mySecondTryA
+	if ((mySecondTryAvailable.any()) & (availableOldB.any())):
+		myBefore = mySecondTryAvailable.copy()
+		matchedPairs = MatchTiers(dfA, dfOldB, matchDictionary, mySecondTryAvailable, availableOldB, matchConfidenceCol = matchConfidenceCol, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, assignment = assignment, assignmentDepth = assignmentDepth)
+		matchedPieces.append(BuildMatchedFrame(dfA, dfOldB, matchedPairs, [], [], matchConfidenceCol = matchConfidenceCol))
+		availableA[myBefore & ~mySecondTryAvailable] = False
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "{} of {} freed or new rows of A matched to the old rows of B".format((myBefore & ~mySecondTryAvailable).sum(), myBefore.sum()))
+	
+	#lump the rows that are still unmatched on the bottom, just like findMatches
+	if (saveUnusedFromDataframeA == 1): matchedPieces.append(BuildMatchedFrame(dfA, newRowsOfB, [], np.flatnonzero(availableA), [], matchConfidenceCol = matchConfidenceCol))
+	if (saveUnusedFromDataframeB == 1):
+		matchedPieces.append(BuildMatchedFrame(dfA, newRowsOfB, [], [], np.flatnonzero(availableNewB), matchConfidenceCol = matchConfidenceCol))
+		matchedPieces.append(BuildMatchedFrame(dfA, dfOldB, [], [], np.flatnonzero(availableOldB), matchConfidenceCol = matchConfidenceCol))
+	
+	return pd.concat(matchedPieces, ignore_index = True)
+
+@DateFunc.Profiled('MatchConfidence.findDuplicates')
+def findDuplicates(dataframe, matchDictionary, clusterCol = 'clusterID', matchConfidenceCol = 'matchConfidence', blockingKey = 'ngram', maxCandidates = 100, neighbors = 5, workers = 1, printProgressToScreen = False):
+	"""
+	This finds the duplicates inside a single dataframe, using the same tiered match dictionary as findMatches (see 'createMatchDictionary'); findMatches(df, df) 
+	does not work for this, as every row would simply match itself.  Each tier links the rows that agree on all of its columns, the links are merged into clusters 
+	(two rows end up in the same cluster if there is any chain of links between them) and one cluster ID is returned per row.
+	
+	Only 'colA' of each column compare is used ('colB' is used if 'colA' is blank), so a dictionary built for findMatches can be re-used as long as its A columns are 
+	columns of this dataframe.
+	
+	All of the pairs of rows are never formed, so this scales to millions of rows:
+	- Rows that agree exactly on every column of the tier (fuzzy columns on their normalized values - see 'normalizer') are linked straight away, each to the first 
+		row holding the same values.  A tier with no 'strLikenessPcnt' stops there.
+	- For the fuzzy columns, only one row of each distinct set of values (a 'record') goes on.  The distinct values of the first fuzzy column are scored against each 
+		other, and each is paired with (up to) its 'neighbors' closest values that pass the cutoff - and with itself, so records that share the value are paired 
+		too; two records are then a candidate pair only if they hold such a pair of values and agree on all of the exact columns.  The candidate pairs are scored on the tier's other fuzzy columns, and the ones that pass are linked.
+	'blockingKey' and 'maxCandidates' work the same as in findMatches (only the candidates the CandidateIndex returns are scored), except the default here is 
+	'ngram' - without blocking every distinct value is scored against every other one, which is quadratic.  'workers' is the number of processes used for the 
+	scoring.  Rows with a NULL in any of a tier's columns are not linked by that tier.  'tolerance' is not used here - those columns are compared exactly.
+	
+	Returns a dataframe with the same index as 'dataframe' and two columns:
+	- clusterCol: the cluster ID of the row (0, 1, 2... in the order the clusters first show up in the dataframe); rows that were not linked to anything get a 
+		cluster of their own
+	- matchConfidenceCol: the match confidence of the first tier that linked the row to another row (NULL if it was never linked)
+	The dataframe passed is not modified; to put the cluster ID on it, dataframe.join(retVal[clusterCol]).
+	
+	Example:
+	myDictionary = createMatchDictionary([2,1])
+	myDictionary[0][0]['colA'] = 'customerName'
+	myDictionary[0][1]['colA'] = 'zipCode'
+	myDictionary[1][0]['colA'] = 'customerName'
+	myDictionary[1][0]['strLikenessPcnt'] = .9
+	clusters = findDuplicates(customers, myDictionary)
+	"""
+	
+	numRows = dataframe.shape[0]
+	myClusters = DisjointSets(numRows)
+	myConfidence = np.empty(numRows, dtype=object)
+	myConfidence[:] = np.nan
+	
+	myNormalizationCache = NormalizationCache(dataframe, dataframe)
+	
+	for i in range(matchDictionary['NumElements']):
+		myTierTimer = DateFunc.TimeIt()
+		
+		myExactKeys = []
+		myFuzzyKeys = []
+		for x in range(matchDictionary[i]['numberColumnCompares']):
+			myCol = matchDictionary[i][x]['colA']
+			if (myCol == ''): myCol = matchDictionary[i][x]['colB']
+			
+			if (matchDictionary[i][x]['strLikenessPcnt'] != ''):
+				myFuzzyKeys.append((myNormalizationCache.GetNormalized('A', myCol, matchDictionary[i][x].get('normalizer', '')), matchDictionary[i][x]['strLikenessPcnt'], matchDictionary[i][x].get('scorer', '')))
+			else:
+				myExactKeys.append(dataframe[myCol].values)
+		
+		#rows that agree exactly on every column (fuzzy columns on their normalized values) are linked straight away - each to the first row holding the same values
+		myLinksA, myLinksB, myRecordRows = LinkRowsByCode(FactorizeJoinKeys(myExactKeys + [y[0] for y in myFuzzyKeys], [y[:0] for y in myExactKeys + [y[0] for y in myFuzzyKeys]])[0])
+		
+		if ((len(myFuzzyKeys) > 0) & (len(myRecordRows) > 0)):
+			#the distinct records are then paired up on their first fuzzy column, within the same exact key, and every pair is checked against the other fuzzy columns
+			if (len(myExactKeys) > 0): myBlocks = FactorizeJoinKeys(myExactKeys, [y[:0] for y in myExactKeys])[0][myRecordRows]
+			else: myBlocks = np.zeros(len(myRecordRows), dtype=np.int64)
+			
+			myStringIDs, myUniqueStrings = pd.factorize(myFuzzyKeys[0][0][myRecordRows])
+			myPairsA, myPairsB = GetSimilarStringPairs(list(myUniqueStrings), myCutoff = myFuzzyKeys[0][1], scorer = myFuzzyKeys[0][2], blockingKey = blockingKey, maxCandidates = maxCandidates, neighbors = neighbors, workers = workers)
+			
+			#every string is its own neighbor as well, so records that share the first fuzzy value (and differ on another fuzzy column) are paired up too
+			myPairsA = np.concatenate([myPairsA, np.arange(len(myUniqueStrings), dtype=np.int64)])
+			myPairsB = np.concatenate([myPairsB, np.arange(len(myUniqueStrings), dtype=np.int64)])
+			
+			#each record is expanded to the strings that are similar to its own, and then joined to the records (in the same block) holding those strings
+			myOrder = np.argsort(myPairsA, kind='mergesort')
+			myNeighborTable = {'rows': myPairsB[myOrder], 'offsets': np.concatenate([[0], np.cumsum(np.bincount(myPairsA, minlength=len(myUniqueStrings)))]).astype(np.int64)}
+			myRecords, myNeighborStrings = ExpandJoinPairs(myNeighborTable, myStringIDs, np.arange(len(myRecordRows)))
+			myRecordsA, myRecordsB = JoinOnKeys([myBlocks[myRecords], myNeighborStrings], myRecords, [myBlocks, myStringIDs], np.arange(len(myRecordRows)))
+			
+			#a pair can be found from both ends, so only keep it once (and a record is never paired with itself)
+			myDistinct = (myRecordsA != myRecordsB)
+			myRecordsA = myRecordsA[myDistinct]
+			myRecordsB = myRecordsB[myDistinct]
+			myPairCodes = np.unique(np.minimum(myRecordsA, myRecordsB) * len(myRecordRows) + np.maximum(myRecordsA, myRecordsB))
+			myRecordsA = myRecordRows[myPairCodes // len(myRecordRows)]
+			myRecordsB = myRecordRows[myPairCodes % len(myRecordRows)]
+			
+			#the pairs are scored on each of the other fuzzy columns in one batch; only the pairs still standing are scored on the next column
+			myKeep = np.ones(len(myRecordsA), dtype=bool)
+			for myValues, myCutoff, myScorer in myFuzzyKeys[1:]:
+				myPairs = np.flatnonzero(myKeep)
+				myKeep[myPairs] = (ScoreStringPairs(myValues[myRecordsA[myPairs]], myValues[myRecordsB[myPairs]], myScorer) >= myCutoff)
+			
+			myLinksA = np.concatenate([myLinksA, myRecordsA[myKeep]])
+			myLinksB = np.concatenate([myLinksB, myRecordsB[myKeep]])
+		
+		myClusters.Union(myLinksA, myLinksB)
+		
+		#a row linked in this tier (either end of a link) gets the tier's confidence, unless an earlier tier already linked it
+		myNewlyLinked = np.zeros(numRows, dtype=bool)
+		myNewlyLinked[myLinksA] = True
+		myNewlyLinked[myLinksB] = True
+		myNewlyLinked &= pd.isnull(myConfidence)
+		myConfidence[myNewlyLinked] = matchDictionary[i]['matchConfidence']
+		
+		myTierTimer.Stop()
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Tier {} ({}): {} links, {} rows newly linked in {:.3f} seconds".format(i, matchDictionary[i]['matchConfidence'], len(myLinksA), myNewlyLinked.sum(), myTierTimer.GetTimeDeltaInSeconds()))
+	
+	#number the clusters in the order they first show up
+	myClusterIDs = pd.factorize(myClusters.Find(np.arange(numRows)))[0]
+	
+	return pd.DataFrame({clusterCol: myClusterIDs, matchConfidenceCol: pd.Series(myConfidence).infer_objects().values}, index = dataframe.index, columns = [clusterCol, matchConfidenceCol])
+
+def LinkRowsByCode(codes):
+	"""
+	Links every row to the first row that has the same code (codes from FactorizeJoinKeys; rows coded -1 are skipped), without forming any other pairs.  Returns 
+	three numpy arrays: the rows that were linked, the first row each one was linked to, and the first row of every code (one per distinct code, in code order).
+	"""
+	myRows = np.flatnonzero(codes >= 0)
+	myCodes = codes[myRows]
+	
+	myFirstRows = np.full(myCodes.max() + 1 if (len(myCodes) > 0) else 0, len(codes), dtype=np.int64)
+	np.minimum.at(myFirstRows, myCodes, myRows)
+	myTargets = myFirstRows[myCodes]
+	myLinked = (myTargets != myRows)
+	
+	return myRows[myLinked], myTargets[myLinked], myFirstRows[myFirstRows < len(codes)]
+
+@DateFunc.Profiled('MatchConfidence.findMatchesInDatabase')
+def findMatchesInDatabase(databaseConnection, tableA, tableB, keyColumnA, keyColumnB, matchDictionary, matchConfidenceCol = 'matchConfidence', enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, saveUnusedFromDataframeA = 1, saveUnusedFromDataframeB = 1, printProgressToScreen = False, returnColumns = (), tempSchemaName = 'TEMP', inMemory = 1, blockingKey = None, maxCandidates = 100, workers = 1, assignment = 'greedy', assignmentDepth = 10):
+	"""
+	This is findMatches for when A and B are MySQL tables: the exact tiers are run in the database as SQL joins, and only the rows that are still unmatched are 
+	pulled into Python for the rest of the tiers - so the bulk of the rows never cross the wire.
+	
+	'databaseConnection' is a DatabaseConnection (see DatabaseConnections.py) to the MySQL server holding both tables.  'tableA' / 'tableB' are the tables, as 
+	'schema.table', and 'keyColumnA' / 'keyColumnB' are a unique key column of each (ideally the primary key) - these play the part of the dataframe index, so they 
+	are what ends up in origIndexA / origIndexB.
+	
+	What is done:
+	1. A mapping table (origIndexA, origIndexB, matchConfidenceCol, indexed on both keys) is made with the connection's CreateTempTable, in 'tempSchemaName' 
+		(in memory if 'inMemory' is 1; set it to 0 if the mapping may not fit in memory).
+	2. Every tier at the start of matchDictionary that only has exact columns (no 'strLikenessPcnt', 'tolerance' or 'compositeCutoff') is run, in order, as an 
+		INSERT ... SELECT joining tableA to tableB on the tier's columns and skipping the keys that are already in the mapping (B keys are only skipped if 
+		matchChallengerToMultipleMasters is 0).  With enforceUniqueMatch each key of A takes the smallest matching key of B - the database has no row order, so the 
+		key order stands in for it.
+	3. The matches are read back from the mapping (only the 3 mapping columns, plus whatever 'returnColumns' asks for) and the mapping table is dropped.
+	4. If any tiers are left, the rows of A that are not in the mapping (and the rows of B, unless matchChallengerToMultipleMasters is 1) are pulled with 
+		GetResultsInDataFrame and run through findMatches with the rest of the tiers; if no tiers are left, the unmatched rows are only pulled if 
+		saveUnusedFromDataframeA / saveUnusedFromDataframeB ask for them.
+	
+	Note the SQL joins compare the way MySQL does, which is not always the way pandas does: with the usual case insensitive collations 'ABC' = 'abc', and '1' = 1.
+	
+	'returnColumns' is the same as in findMatches, except the default here is () - just the mapping - since pulling every column of the matched rows is what this 
+	is meant to avoid; pass None for every column.  All of the other parameters are the same as in findMatches.
+	
+	Returns the matches laid out like a findMatches result (the database matches first), or None if anything in the database failed (including a table or key 
+	column that can not be found).
+	
+	Testing note: the generated SQL (the INSERT ... SELECT with the mapping table joined twice, and MIN() / GROUP BY for enforceUniqueMatch) has been checked 
+	against findMatches on the same data through a stand-in connection backed by SQLite, for each of enforceUniqueMatch, matchChallengerToMultipleMasters and 
+	the saveUnused options - but it has not been run against a real MySQL server, so the MySQL specific parts (the backtick quoting, information_schema and 
+	CreateTempTable) are untested.
+	"""
+	
+	myTimer = DateFunc.TimeIt()
+	mySchemaA, myTableA = tableA.split('.')
+	mySchemaB, myTableB = tableB.split('.')
+	myQuotedA = "`{}`.`{}`".format(mySchemaA, myTableA)
+	myQuotedB = "`{}`.`{}`".format(mySchemaB, myTableB)
+	
+	#the tiers that can be pushed down are the exact ones before the first tier that needs Python
+	numPushedTiers = 0
+	while (numPushedTiers < matchDictionary['NumElements']):
+		myTier = matchDictionary[numPushedTiers]
+		if (any([(myTier[x]['strLikenessPcnt'] != '') | (myTier[x].get('tolerance', '') != '') for x in range(myTier['numberColumnCompares'])]) | (myTier.get('compositeCutoff', '') != '')): break
+		numPushedTiers += 1
+	
+	#the columns of both tables (without reading any rows), and the key types so the mapping can be joined back on its indexes
+	myEmptyA = databaseConnection.GetResultsInDataFrame("SELECT * FROM {} LIMIT 0".format(myQuotedA))
+	myEmptyB = databaseConnection.GetResultsInDataFrame("SELECT * FROM {} LIMIT 0".format(myQuotedB))
+	myKeyTypes = databaseConnection.GetResultsInDataFrame("SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_TYPE FROM information_schema.COLUMNS WHERE (TABLE_SCHEMA = '{}' AND TABLE_NAME = '{}' AND COLUMN_NAME = '{}') OR (TABLE_SCHEMA = '{}' AND TABLE_NAME = '{}' AND COLUMN_NAME = '{}')".format(mySchemaA, myTableA, keyColumnA, mySchemaB, myTableB, keyColumnB))
+	if ((myEmptyA is None) | (myEmptyB is None) | (myKeyTypes is None)):
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Could not read the columns of {} / {}".format(tableA, tableB))
+		return None
+	myKeyTypeA = myKeyTypes.loc[(myKeyTypes['TABLE_SCHEMA'] == mySchemaA) & (myKeyTypes['TABLE_NAME'] == myTableA), 'COLUMN_TYPE']
+	myKeyTypeB = myKeyTypes.loc[(myKeyTypes['TABLE_SCHEMA'] == mySchemaB) & (myKeyTypes['TABLE_NAME'] == myTableB), 'COLUMN_TYPE']
+	if ((myKeyTypeA.empty) | (myKeyTypeB.empty)):
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Could not find the key column {} of {} / {} of {}".format(keyColumnA, tableA, keyColumnB, tableB))
+		return None
+	myKeyTypeA = myKeyTypeA.iloc[0]
+	myKeyTypeB = myKeyTypeB.iloc[0]
+	myColumnsA = [x for x in ReturnedColumns(myEmptyA.columns.values, returnColumns) if x != keyColumnA]
+	myColumnsB = [x for x in ReturnedColumns(myEmptyB.columns.values, returnColumns) if x != keyColumnB]
+	
+	matchedPieces = []
+	if (numPushedTiers > 0):
+		myMappingTable = databaseConnection.CreateTempTable("origIndexA {}, origIndexB {}, `{}` INT, INDEX (origIndexA), INDEX (origIndexB)".format(myKeyTypeA, myKeyTypeB, matchConfidenceCol), tempSchemaName = tempSchemaName, description = 'findMatchesInDatabase mapping', InMemory = inMemory)
+		if (myMappingTable is None):
+			DateFunc.PrintTimestampedMsg(printProgressToScreen, "Could not create the mapping table")
+			return None
+		myMappingTable = "`{}`.`{}`".format(tempSchemaName, myMappingTable)
+		
+		for i in range(numPushedTiers):
+			myTierTimer = DateFunc.TimeIt()
+			
+			myJoin = " AND ".join(["a.`{}` = b.`{}`".format(matchDictionary[i][x]['colA'], matchDictionary[i][x]['colB']) for x in range(matchDictionary[i]['numberColumnCompares'])])
+			#rows that are already in the mapping are skipped; B rows can be re-used if matchChallengerToMultipleMasters is 1
+			myWhere = "usedA.origIndexA IS NULL"
+			myUsedB = ""
+			if (matchChallengerToMultipleMasters == 0):
+				myUsedB = " LEFT JOIN {} usedB ON usedB.origIndexB = b.`{}`".format(myMappingTable, keyColumnB)
+				myWhere = myWhere + " AND usedB.origIndexB IS NULL"
+			if (enforceUniqueMatch == 1): mySelect = "SELECT a.`{}`, MIN(b.`{}`), {}".format(keyColumnA, keyColumnB, matchDictionary[i]['matchConfidence'])
+			else: mySelect = "SELECT a.`{}`, b.`{}`, {}".format(keyColumnA, keyColumnB, matchDictionary[i]['matchConfidence'])
+			
+			SQL = "INSERT INTO {} (origIndexA, origIndexB, `{}`) {} FROM {} a INNER JOIN {} b ON {} LEFT JOIN {} usedA ON usedA.origIndexA = a.`{}`{} WHERE {}".format(myMappingTable, matchConfidenceCol, mySelect, myQuotedA, myQuotedB, myJoin, myMappingTable, keyColumnA, myUsedB, myWhere)
+			if (enforceUniqueMatch == 1): SQL = SQL + " GROUP BY a.`{}`".format(keyColumnA)
+			
+			if (databaseConnection.AttemptChangeQuery(SQL) == -1):
+				DateFunc.PrintTimestampedMsg(printProgressToScreen, "Tier {} failed in the database".format(i))
+				databaseConnection.AttemptChangeQuery("DROP TABLE {}".format(myMappingTable))
+				return None
+			myTierTimer.Stop()
+			DateFunc.PrintTimestampedMsg(printProgressToScreen, "Tier {} ({}) run in the database in {:.3f} seconds".format(i, matchDictionary[i]['matchConfidence'], myTierTimer.GetTimeDeltaInSeconds()))
+		
+		#read the matches back, with only the columns that were asked for
+		mySelect = ", ".join(["m.origIndexA", "m.origIndexB", "m.`{}`".format(matchConfidenceCol)] + ["a.`{}`".format(x) for x in myColumnsA] + ["b.`{}`".format(x) for x in myColumnsB])
+		myMatched = databaseConnection.GetResultsInDataFrame("SELECT {} FROM {} m INNER JOIN {} a ON a.`{}` = m.origIndexA INNER JOIN {} b ON b.`{}` = m.origIndexB ORDER BY m.`{}`".format(mySelect, myMappingTable, myQuotedA, keyColumnA, myQuotedB, keyColumnB, matchConfidenceCol))
+		if (myMatched is None):
+			databaseConnection.AttemptChangeQuery("DROP TABLE {}".format(myMappingTable))
+			return None
+		#the mapping columns come back with their SQL names (and the key types), so the names are set by position
+		myMatched.columns = ['origIndexA', 'origIndexB', matchConfidenceCol] + myColumnsA + myColumnsB
+		matchedPieces.append(myMatched)
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "{} matches made in the database".format(myMatched.shape[0]))
+		
+		myUnmatchedA = "SELECT a.* FROM {} a LEFT JOIN {} m ON m.origIndexA = a.`{}` WHERE m.origIndexA IS NULL".format(myQuotedA, myMappingTable, keyColumnA)
+		if (matchChallengerToMultipleMasters == 0): myUnmatchedB = "SELECT b.* FROM {} b LEFT JOIN {} m ON m.origIndexB = b.`{}` WHERE m.origIndexB IS NULL".format(myQuotedB, myMappingTable, keyColumnB)
+		else: myUnmatchedB = "SELECT b.* FROM {} b".format(myQuotedB)
+	else:
+		myMappingTable = None
+		myUnmatchedA = "SELECT a.* FROM {} a".format(myQuotedA)
+		myUnmatchedB = "SELECT b.* FROM {} b".format(myQuotedB)
+	
+	#only pull what is still needed: everything left for the rest of the tiers, or just the unused rows that are to be returned
+	dfA = None
+	dfB = None
+	if ((numPushedTiers < matchDictionary['NumElements']) | (saveUnusedFromDataframeA == 1)): dfA = databaseConnection.GetResultsInDataFrame(myUnmatchedA)
+	if ((numPushedTiers < matchDictionary['NumElements']) | (saveUnusedFromDataframeB == 1)): dfB = databaseConnection.GetResultsInDataFrame(myUnmatchedB)
+	if (myMappingTable is not None): databaseConnection.AttemptChangeQuery("DROP TABLE {}".format(myMappingTable))
+	
+	if (dfA is None): dfA = myEmptyA
+	if (dfB is None): dfB = myEmptyB
+	dfA = dfA.set_index(keyColumnA)
+	dfB = dfB.set_index(keyColumnB)
+	DateFunc.PrintTimestampedMsg(printProgressToScreen, "{} rows of A and {} rows of B pulled from the database".format(dfA.shape[0], dfB.shape[0]))
+	
+	if (numPushedTiers < matchDictionary['NumElements']):
+		#the rest of the tiers, renumbered from 0 but keeping their match confidence
+		myRemainingDictionary = {'NumElements': matchDictionary['NumElements'] - numPushedTiers}
+		for i in range(numPushedTiers, matchDictionary['NumElements']): myRemainingDictionary[i - numPushedTiers] = matchDictionary[i]
+		
+		myMatched = findMatches(dfA, dfB, myRemainingDictionary, matchConfidenceCol = matchConfidenceCol, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, saveUnusedFromDataframeA = saveUnusedFromDataframeA, saveUnusedFromDataframeB = saveUnusedFromDataframeB, printProgressToScreen = printProgressToScreen, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, assignment = assignment, assignmentDepth = assignmentDepth, returnColumns = myColumnsA + myColumnsB)
+	else:
+		myMatched = pd.DataFrame()
+	
+	#findMatches returns an empty dataframe if nothing matched (and nothing is matched here if no tiers are left), so the unused rows are laid out here in that case
+	if (myMatched.empty):
+		myMatched = BuildMatchedFrame(dfA, dfB, [], np.arange(dfA.shape[0]) if (saveUnusedFromDataframeA == 1) else [], np.arange(dfB.shape[0]) if (saveUnusedFromDataframeB == 1) else [], matchConfidenceCol = matchConfidenceCol, columnsA = myColumnsA, columnsB = myColumnsB)
+	matchedPieces.append(myMatched)
+	
+	myTimer.Stop()
+	DateFunc.PrintTimestampedMsg(printProgressToScreen, "findMatchesInDatabase done in {:.3f} seconds".format(myTimer.GetTimeDeltaInSeconds()))
+	
+	return pd.concat(matchedPieces, ignore_index = True)
+
+@DateFunc.Profiled('MatchConfidence.CalibrateMatchDictionary')
+def CalibrateMatchDictionary(dataframeA, dataframeB, matchDictionary, sampleSizeA = 10000, sampleSizeB = None, cutoffs = [.6, .65, .7, .75, .8, .85, .9, .95], maxAmbiguousRate = .05, minReorderAgreement = .99, seed = 0, enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, blockingKey = None, maxCandidates = 100, workers = 1, printProgressToScreen = False):
+	"""
+	This is a tuning aid for a match dictionary: instead of running findMatches over the full data again and again to pick cutoffs and an order for the tiers, it 
+	runs everything on a sample and reports what each tier does, along with a recommended dictionary.
+	
+	'sampleSizeA' rows of dataframeA are sampled (with 'seed', and kept in their original order).  By default all of dataframeB is used, since sampling both sides 
+	throws most of the true matches away; set 'sampleSizeB' to sample B as well if its too large, but note the yields then come out low by about 
+	sampleSizeB / len(dataframeB).  'enforceUniqueMatch', 'matchChallengerToMultipleMasters', 'blockingKey', 'maxCandidates' and 'workers' are passed on to 
+	findMatches.
+	
+	Returns a dictionary holding:
+	- 'tiers': a dataframe with one row per tier -
+		- standaloneMatches / standaloneYield: the matches the tier makes on its own (and as a fraction of the sampled rows of A)
+		- sequenceMatches / sequenceYield / sequenceRowsIn: the same when the tiers are run in order, and the rows of A the tier still had to look at
+		- candidatesPerMatch: candidate pairs per match made on its own (above 1 means the tier's keys are ambiguous - a false positive proxy)
+		- secondsPerRow / fuzzyComparisons: the cost of the tier on its own, per sampled row of A, and the number of fuzzy scores it took
+	- 'cutoffs': a dataframe with one row per fuzzy column per cutoff in 'cutoffs', from the 2 best distinct values of B for each value of A -
+		- yield: the fraction of the (non NULL) values of A whose best value of B scores at least the cutoff
+		- ambiguousRate: of those, the fraction where a second, different value of B also scores at least the cutoff (a false positive proxy)
+		- recommended: True on the lowest cutoff whose ambiguousRate is at most 'maxAmbiguousRate' (the highest cutoff if none are)
+	- 'matchDictionary': a copy of matchDictionary where every cutoff below its column's recommended cutoff is raised to it, and with the tiers that are cheap 
+		(exact and tolerance only) moved ahead of the fuzzy tiers (each group keeps its order, and every tier keeps its match confidence) - so the fuzzy tiers only 
+		see what the cheap ones left.  A cheap tier is only moved ahead of a fuzzy tier for sure when its exact columns include all of the fuzzy tier's exact 
+		columns; if moving every cheap tier first needs more than that, it is only done when the sample matches with it agree with the ones without it (the same 
+		rule, cutoffs raised either way) on at least 'minReorderAgreement' of the sampled rows of A
+	- 'comparison': a dataframe with one row for the original dictionary and one for the recommended one: the matches made on the sample, the seconds and fuzzy 
+		scores it took, and 'agreement' - the fraction of the sampled rows of A that got the same rows of B and confidences as with the original dictionary (all of 
+		them, if enforceUniqueMatch is 0)
+	The original matchDictionary is not changed; use the returned one as is, or take only the parts that look right.
+	"""
+	
+	myRandom = np.random.RandomState(seed)
+	mySampleA = dataframeA.iloc[np.sort(myRandom.choice(dataframeA.shape[0], min(sampleSizeA, dataframeA.shape[0]), replace = False))]
+	if (sampleSizeB is not None): mySampleB = dataframeB.iloc[np.sort(myRandom.choice(dataframeB.shape[0], min(sampleSizeB, dataframeB.shape[0]), replace = False))]
+	else: mySampleB = dataframeB
+	numRowsA = float(max(mySampleA.shape[0], 1))
+	
+	def RunSample(myDictionary):
+		#one findMatches run over the sample; returns the mapping (matches only), the tier report and the seconds it took
+		myTimer = DateFunc.TimeIt()
+		myMatched, myReport = findMatches(mySampleA, mySampleB, myDictionary, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters, saveUnusedFromDataframeA = 0, saveUnusedFromDataframeB = 0, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers, returnTierReport = True, returnColumns = [])
+		myTimer.Stop()
+		return myMatched, myReport, myTimer.GetTimeDeltaInSeconds()
+	
+	def Agreement(myMatched, myOtherMatched):
+		#the fraction of the sampled rows of A that got exactly the same (row of B, confidence) pairs in both runs - as sets, since with enforceUniqueMatch = 0 a row 
+		#	of A can have several
+		myTriples = []
+		for myFrame in [myMatched, myOtherMatched]:
+			if (myFrame.empty): myTriples.append(pd.DataFrame(columns = ['origIndexA', 'origIndexB', 'matchConfidence']))
+			else: myTriples.append(myFrame[['origIndexA', 'origIndexB', 'matchConfidence']].drop_duplicates())
+		myBoth = myTriples[0].merge(myTriples[1], how = 'outer', on = ['origIndexA', 'origIndexB', 'matchConfidence'], indicator = True)
+		return 1 - myBoth.loc[myBoth['_merge'] != 'both', 'origIndexA'].nunique() / numRowsA
+	
+	#the tiers run in order, and each tier on its own
+	myOriginalMatched, mySequenceReport, myOriginalSeconds = RunSample(matchDictionary)
+	myTiers = []
+	for i in range(matchDictionary['NumElements']):
+		myStandaloneReport = RunSample({'NumElements': 1, 0: matchDictionary[i]})[1].to_dict('records')[0]
+		myTiers.append({'tier': i, 'matchConfidence': matchDictionary[i]['matchConfidence'], 'isCheap': IsCheapTier(matchDictionary[i]), 
+			'standaloneMatches': myStandaloneReport['matchesAccepted'], 'standaloneYield': myStandaloneReport['matchesAccepted'] / numRowsA, 
+			'sequenceMatches': mySequenceReport['matchesAccepted'].iloc[i], 'sequenceYield': mySequenceReport['matchesAccepted'].iloc[i] / numRowsA, 'sequenceRowsIn': mySequenceReport['rowsBeforeA'].iloc[i], 
+			'candidatesPerMatch': myStandaloneReport['candidatePairs'] / float(max(myStandaloneReport['matchesAccepted'], 1)), 
+			'secondsPerRow': myStandaloneReport['seconds'] / numRowsA, 'fuzzyComparisons': myStandaloneReport['fuzzyComparisons']})
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Tier {} calibrated: {} matches on its own, {} in order".format(i, myTiers[-1]['standaloneMatches'], myTiers[-1]['sequenceMatches']))
+	
+	#the cutoff curves of every fuzzy column, each (column pair, normalizer, scorer) only once
+	myCurves = {}
+	myCutoffRows = []
+	myRecommendedDictionary = copy.deepcopy(matchDictionary)
+	myNormalizationCache = NormalizationCache(mySampleA, mySampleB)
+	for i in range(matchDictionary['NumElements']):
+		for x in range(matchDictionary[i]['numberColumnCompares']):
+			myColumn = matchDictionary[i][x]
+			if ((myColumn['strLikenessPcnt'] == '') | (myColumn.get('tolerance', '') != '')): continue
+			
+			myKey = (myColumn['colA'], myColumn['colB'], myColumn.get('normalizer', ''), myColumn.get('scorer', ''))
+			if myKey not in myCurves:
+				myValuesA = myNormalizationCache.GetNormalized('A', myColumn['colA'], myColumn.get('normalizer', ''))
+				myValuesB = pd.unique(myNormalizationCache.GetNormalized('B', myColumn['colB'], myColumn.get('normalizer', '')))
+				#the values are already normalized, so they are passed through as is
+				myTop = GetTopCandidates(myValuesA, myValuesB, k = 2, myCutoff = min(cutoffs), scorer = myColumn.get('scorer', ''), normalizer = lambda y: y, blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers)
+				#the best and second best score of each value of A (0 if there is none); the padding keeps the lookups in bounds
+				myCounts = np.diff(myTop['offsets'])
+				myScores = np.concatenate([myTop['scores'], [0, 0]])
+				myBest = np.where(myCounts > 0, myScores[myTop['offsets'][:-1]], 0)
+				mySecond = np.where(myCounts > 1, myScores[myTop['offsets'][:-1] + 1], 0)
+				myNotNull = pd.notnull(myValuesA)
+				
+				myCurve = []
+				for myCutoff in sorted(cutoffs):
+					myMatchedCount = np.count_nonzero(myBest[myNotNull] >= myCutoff)
+					myCurve.append({'colA': myColumn['colA'], 'colB': myColumn['colB'], 'cutoff': myCutoff, 'yield': myMatchedCount / float(max(np.count_nonzero(myNotNull), 1)), 
+						'ambiguousRate': np.count_nonzero(mySecond[myNotNull] >= myCutoff) / float(max(myMatchedCount, 1)), 'recommended': False})
+				myRecommended = [y for y in myCurve if y['ambiguousRate'] <= maxAmbiguousRate]
+				if (len(myRecommended) > 0): myRecommended[0]['recommended'] = True
+				else: myCurve[-1]['recommended'] = True
+				myCurves[myKey] = myCurve
+			
+			for myRow in myCurves[myKey]:
+				#cutoffs are only ever raised, so tiers that share a column keep their own (higher) cutoffs
+				if ((myRow['recommended']) & (myRow['cutoff'] > myColumn['strLikenessPcnt'])): myRecommendedDictionary[i][x]['strLikenessPcnt'] = myRow['cutoff']
+				myRow = dict(myRow)
+				myRow.update({'tier': i, 'column': x, 'currentCutoff': myColumn['strLikenessPcnt']})
+				myCutoffRows.append(myRow)
+	
+	#the cheap tiers go first (each group keeps its order) - but a cheap tier only moves ahead of a fuzzy tier on its own if its exact columns cover the fuzzy 
+	#	tier's, so it cannot take rows from the fuzzy tier that the fuzzy tier would have matched on other keys
+	mySafeOrder = []
+	for i in range(matchDictionary['NumElements']):
+		myPosition = len(mySafeOrder)
+		if (IsCheapTier(matchDictionary[i])):
+			while ((myPosition > 0) and (not IsCheapTier(matchDictionary[mySafeOrder[myPosition - 1]])) and (TierExactColumns(matchDictionary[i]) >= TierExactColumns(matchDictionary[mySafeOrder[myPosition - 1]]))): myPosition -= 1
+		mySafeOrder.insert(myPosition, i)
+	myCheapFirstOrder = [i for i in range(matchDictionary['NumElements']) if IsCheapTier(matchDictionary[i])] + [i for i in range(matchDictionary['NumElements']) if not IsCheapTier(matchDictionary[i])]
+	
+	myCutoffDictionary = myRecommendedDictionary
+	myRecommendedDictionary = dict([('NumElements', matchDictionary['NumElements'])] + [(y, myCutoffDictionary[i]) for y, i in enumerate(mySafeOrder)])
+	myRecommendedMatched, myRecommendedReport, myRecommendedSeconds = RunSample(myRecommendedDictionary)
+	
+	if (myCheapFirstOrder != mySafeOrder):
+		#the rest of the moves are only kept if they hardly change the matches
+		myCheapFirstDictionary = dict([('NumElements', matchDictionary['NumElements'])] + [(y, myCutoffDictionary[i]) for y, i in enumerate(myCheapFirstOrder)])
+		myCheapFirstMatched, myCheapFirstReport, myCheapFirstSeconds = RunSample(myCheapFirstDictionary)
+		myReorderAgreement = Agreement(myRecommendedMatched, myCheapFirstMatched)
+		if (myReorderAgreement >= minReorderAgreement):
+			myRecommendedDictionary = myCheapFirstDictionary
+			myRecommendedMatched, myRecommendedReport, myRecommendedSeconds = myCheapFirstMatched, myCheapFirstReport, myCheapFirstSeconds
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Moving every cheap tier first agrees on {:.1%} of the sample; {}".format(myReorderAgreement, "moved" if (myReorderAgreement >= minReorderAgreement) else "only the covered ones were moved"))
+	
+	#how the recommendation does on the sample against the original
+	myAgreement = Agreement(myOriginalMatched, myRecommendedMatched)
+	myComparison = pd.DataFrame([
+		{'matchDictionary': 'original', 'matches': myOriginalMatched.shape[0], 'seconds': myOriginalSeconds, 'fuzzyComparisons': mySequenceReport['fuzzyComparisons'].sum(), 'agreement': 1.0}, 
+		{'matchDictionary': 'recommended', 'matches': myRecommendedMatched.shape[0], 'seconds': myRecommendedSeconds, 'fuzzyComparisons': myRecommendedReport['fuzzyComparisons'].sum(), 'agreement': myAgreement}], 
+		columns = ['matchDictionary', 'matches', 'seconds', 'fuzzyComparisons', 'agreement'])
+	DateFunc.PrintTimestampedMsg(printProgressToScreen, "Recommended dictionary: {} matches in {:.3f} seconds (original: {} in {:.3f}), {:.1%} agreement".format(myRecommendedMatched.shape[0], myRecommendedSeconds, myOriginalMatched.shape[0], myOriginalSeconds, myAgreement))
+	
+	return {'tiers': pd.DataFrame(myTiers, columns = ['tier', 'matchConfidence', 'isCheap', 'standaloneMatches', 'standaloneYield', 'sequenceMatches', 'sequenceYield', 'sequenceRowsIn', 'candidatesPerMatch', 'secondsPerRow', 'fuzzyComparisons']), 
+		'cutoffs': pd.DataFrame(myCutoffRows, columns = ['tier', 'column', 'colA', 'colB', 'currentCutoff', 'cutoff', 'yield', 'ambiguousRate', 'recommended']), 
+		'matchDictionary': myRecommendedDictionary, 'comparison': myComparison}
+
+def IsCheapTier(tierDictionary):
+	#Returns True if a tier (one element of a match dictionary) is only joins - exact and tolerance columns, no fuzzy string matching
+	
+	return not any([(tierDictionary[x]['strLikenessPcnt'] != '') & (tierDictionary[x].get('tolerance', '') == '') for x in range(tierDictionary['numberColumnCompares'])])
+
+def TierExactColumns(tierDictionary):
+	#Returns the set of (colA, colB) pairs a tier (one element of a match dictionary) has to match exactly - its columns without a 'strLikenessPcnt' or 'tolerance'
+	
+	return set([(tierDictionary[x]['colA'], tierDictionary[x]['colB']) for x in range(tierDictionary['numberColumnCompares']) if (tierDictionary[x]['strLikenessPcnt'] == '') & (tierDictionary[x].get('tolerance', '') == '')])
+
+def TierReportToDataFrame(tierReport, matchConfidenceCol = 'matchConfidence'):
+	"""
+	Turns the list of tier dictionaries filled in by MatchTiers (or findMatchesInChunks) into a dataframe, one row per tier, with the columns in a readable order.
+	"""
+	myColumns = ['tier', matchConfidenceCol, 'seconds', 'rowsBeforeA', 'rowsAfterA', 'rowsBeforeB', 'rowsAfterB', 'candidatePairs', 'matchesAccepted', 'fuzzyLookups', 'fuzzyComparisons']
+	if ((len(tierReport) > 0) and ('chunk' in tierReport[0])): myColumns = ['chunk'] + myColumns
+	
+	return pd.DataFrame(tierReport, columns = myColumns)
+
+@DateFunc.Profiled('MatchConfidence.MatchTiers')
+def MatchTiers(dfA, dfB, matchDictionary, availableA, availableB, matchConfidenceCol = 'matchConfidence', enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0, blockingKey = None, maxCandidates = 100, workers = 1, matchIndex = None, normalizationCache = None, tierReport = None, assignment = 'greedy', assignmentDepth = 10):
+	"""
+	This is the engine behind findMatches; it runs every match tier (confidence level) in matchDictionary, in order, and returns a list holding one tuple per tier 
+	that matched at least one row: (rowsA, rowsB, matchConfidence), where rowsA and rowsB are numpy arrays of the row positions (0, 1, 2...) of the matched pairs.  No 
+	rows are ever gathered here - only the key columns are read - so the caller builds the result once (see 'BuildMatchedFrame').  dfA and dfB are not modified.
+	
+	availableA and availableB are boolean numpy arrays (one element per row of dfA / dfB) that flag the rows that are still up for grabs; they are updated IN PLACE as
+	rows are matched, so after this returns they flag the rows that were never used (B rows are never flagged as used if matchChallengerToMultipleMasters is 1).
+	
+	matchConfidenceCol, enforceUniqueMatch, matchChallengerToMultipleMasters, blockingKey, maxCandidates, workers and matchIndex are the same as 
+	in findMatches; if matchIndex is passed, dfB MUST be matchIndex.dataframeB.
+	
+	normalizationCache takes a NormalizationCache over dfA and dfB; if one is not passed, a new one is made for this call.
+	
+	assignment and assignmentDepth are the same as in findMatches; anything other than 'optimal' is treated as 'greedy'.
+	
+	If 'tierReport' (a list) is passed, one dictionary per tier is appended to it - see 'findMatches' for what each one holds.
+	"""
+	matchedPairs = []
+	
+	if (normalizationCache is None): normalizationCache = NormalizationCache(dfA, dfB)
+	
+	#cycle through all possible matches
+	for i in range(matchDictionary['NumElements']):
+		
+		#these are only kept for the tier report, but they are cheap enough to always keep
+		myTierTimer = DateFunc.TimeIt()
+		myRowsBeforeA = int(availableA.sum())
+		myRowsBeforeB = int(availableB.sum())
+		myScoringStats = {'fuzzyLookups': 0, 'fuzzyComparisons': 0}
+		
+		#only the rows that are still available are joined, and only their key columns are ever pulled out; the full rows are only built for the accepted matches
+		myRowsA = np.flatnonzero(availableA)
+		myRowsB = np.flatnonzero(availableB)
+		
+		#if the B side of this tier was prepared ahead of time, use it; the index only holds lower-cased values, so any other normalizer has to be done here
+		useMatchIndex = ((matchIndex is not None) and (GetTierSignature(matchDictionary, i) in matchIndex.joinTables))
+		for x in range(matchDictionary[i]['numberColumnCompares']):
+			if (matchDictionary[i][x].get('normalizer', '') != ''): useMatchIndex = False
+			if (matchDictionary[i][x].get('tolerance', '') != ''): useMatchIndex = False
+		
+		if (IsCompositeTier(matchDictionary[i])):
+			#every fuzzy column of the tier is scored at once, on one set of candidate pairs
+			myRowsA, myRowsB = CompositeFuzzyJoin(dfA, dfB, matchDictionary[i], myRowsA, availableB, normalizationCache, blockingKey = blockingKey, maxCandidates = maxCandidates, assignment = assignment, assignmentDepth = assignmentDepth, scoringStats = myScoringStats, enforceUniqueMatch = enforceUniqueMatch, matchChallengerToMultipleMasters = matchChallengerToMultipleMasters)
+		else:
+			myKeysA = []
+			myKeysB = []
+			myTolerancesA = []
+			myTolerancesB = []
+			myTolerances = []
+			#cycle through every single column match for this match grouping to build the join keys
+			for x in range(matchDictionary[i]['numberColumnCompares']):
+				myColA = matchDictionary[i][x]['colA']
+				myColB = matchDictionary[i][x]['colB']
+				"""
+				If strLikenessPcnt is set, this means we will be attempting a string comparison using a fuzzy match between 
+				colA and colB (fuzzy match means the strings do not have to be exactly alike). The user sets strLikenessPcnt to
+				be 0 < strLikenessPcnt <= 1, and then a function determines the closest match (determined by strLikenessPcnt)
+				
+				We will use A as the anchor: the key for A becomes the matching (or closest) normalized string in B, and the key for B is its normalized string,
+				so we then simply join on the two
+				
+				If tolerance is set instead, the column is numeric (or a date) and only has to be within the tolerance; these columns are joined separately below
+				"""
+				if (matchDictionary[i][x].get('tolerance', '') != ''):
+					myTolerancesA.append(dfA[myColA].values[availableA])
+					myTolerancesB.append(dfB[myColB].values[availableB])
+					myTolerances.append(matchDictionary[i][x]['tolerance'])
+				elif (matchDictionary[i][x]['strLikenessPcnt']!=''):
+					#each column is only normalized once per run, no matter how many tiers use it
+					myNormalizer = matchDictionary[i][x].get('normalizer', '')
+					myValuesA = normalizationCache.GetNormalized('A', myColA, myNormalizer)[availableA]
+					
+					if (useMatchIndex):
+						#B was already lower-cased (and possibly indexed) by the match index; the join is done on the index as well, so B needs no key
+						myPotentialMatchList = matchIndex.normalizedKeys[myColB].Take(np.flatnonzero(availableB & matchIndex.notNullKeys[myColB]))
+						myCandidateIndex = matchIndex.GetCandidateIndex(myColB, availableB)
+					else:
+						#capitalization DOES matter - so B is matched on its normalized (by default lower case) values as well
+						myKeysB.append(normalizationCache.GetNormalized('B', myColB, myNormalizer)[availableB])
+
+						#get the list of potentials from B (with NO NULLS!), and the blocking index if blocking was requested
+						myPotentialMatchList = normalizationCache.GetCandidateList(myColB, myNormalizer, availableB)
+						if (blockingKey is not None):
+							myCandidateIndex = normalizationCache.GetCandidateIndex(myColB, myNormalizer, availableB, blockingKey = blockingKey, maxCandidates = maxCandidates)
+						else:
+							myCandidateIndex = None
+					
+					#hand-built dictionaries may not have a scorer; difflib is the default
+					myScorer = matchDictionary[i][x].get('scorer', '')
+					#NULLs in A can never match (and the scorers cannot handle them), so only the non NULL values are looked up
+					myNotNullA = pd.notnull(myValuesA)
+					myStringsA = myValuesA[myNotNullA].tolist()
+					if (assignment == 'optimal'):
+						myClosestA = GetOptimalStringAssignment(myStringsA, myPotentialMatchList, myCutoff = matchDictionary[i][x]['strLikenessPcnt'], candidateIndex = myCandidateIndex, assignmentDepth = assignmentDepth, scorer = myScorer, workers = workers, scoringStats = myScoringStats)
+					elif (workers > 1):
+						myClosestA = GetClosestStringMatchesInParallel(myStringsA, myPotentialMatchList, myCutoff = matchDictionary[i][x]['strLikenessPcnt'], workers = workers, candidateIndex = myCandidateIndex, scorer = myScorer, scoringStats = myScoringStats)
+					else:
+						myClosestA = [GetClosestStringMatch(y,myPotentialMatchList, removeMatched = 1, myCutoff = matchDictionary[i][x]['strLikenessPcnt'], candidateIndex = myCandidateIndex, scorer = myScorer, scoringStats = myScoringStats) for y in myStringsA]
+					
+					#the key for A is the closest match in B; the match dictionary itself is NOT changed, so it can be re-used for the next call
+					myMatchKeyA = np.empty(len(myValuesA), dtype=object)
+					myMatchKeyA[:] = np.nan
+					myMatchKeyA[myNotNullA] = myClosestA
+					myKeysA.append(myMatchKeyA)
+				else:
+					myKeysA.append(dfA[myColA].values[availableA])
+					if not (useMatchIndex): myKeysB.append(dfB[myColB].values[availableB])
+			
+			if (useMatchIndex):
+				#look the keys of A up in the index's join table; rows with NULL keys are never returned
+				myRowsA, myRowsB = matchIndex.LookupPairs(GetTierSignature(matchDictionary, i), myKeysA, myRowsA, availableB)
+			elif (len(myTolerances) > 0):
+				#a sorted join on the tolerance columns, within the rows that share the other keys; the closest B comes first for each A
+				myRowsA, myRowsB = JoinWithinTolerance(myKeysA, myRowsA, myKeysB, myRowsB, myTolerancesA, myTolerancesB, myTolerances)
+			else:
+				#join on shared integer codes of the keys; rows with NULL keys are never returned
+				myRowsA, myRowsB = JoinOnKeys(myKeysA, myRowsA, myKeysB, myRowsB)
+		myCandidatePairs = len(myRowsA)
+		
+		#if we wish to enforce a unique match between A and B do so 
+		if (enforceUniqueMatch==1):
+			#flag the B rows that survived the enforced unique match (the first B for each A) and keep ONLY those
+			survivingB = np.zeros(dfB.shape[0], dtype=bool)
+			survivingB[myRowsB[np.unique(myRowsA, return_index = True)[1]]] = True
+			myKeep = survivingB[myRowsB]
+			myRowsA = myRowsA[myKeep]
+			myRowsB = myRowsB[myKeep]
+		
+		#if there are at lease some rows matched
+		if(len(myRowsA) > 0):
+			
+			#remove the items just matched from the feeder dataframes by flagging them as used
+			availableA[myRowsA] = False
+			"""
+			B is handled a bit differently.  In some instances where the master (dfA) to challenger list is 1:many, and in these cases we wish to remove the master column
+			(which was already matched) and NOT the corresponding value of dfB (as the same value in B can match multiple values in A, but A must only be matched once).
+			if it is indicated that this is the case, do NOT eliminate used B indexes
+			so if matchChallengerToMultipleMasters is set to 1, the below will NOT run and thus all values in B can be used multiple times (this is defaulted to 0)				
+			"""
+			if(matchChallengerToMultipleMasters == 0): availableB[myRowsB] = False
+			
+			matchedPairs.append((myRowsA, myRowsB, matchDictionary[i]['matchConfidence']))
+		
+		if (tierReport is not None):
+			myTierTimer.Stop()
+			tierReport.append({'tier': i, matchConfidenceCol: matchDictionary[i]['matchConfidence'], 'seconds': myTierTimer.GetTimeDeltaInSeconds(), 
+				'rowsBeforeA': myRowsBeforeA, 'rowsAfterA': int(availableA.sum()), 'rowsBeforeB': myRowsBeforeB, 'rowsAfterB': int(availableB.sum()), 
+				'candidatePairs': myCandidatePairs, 'matchesAccepted': len(myRowsA), 'fuzzyLookups': myScoringStats['fuzzyLookups'], 
+				'fuzzyComparisons': myScoringStats['fuzzyComparisons']})
+	
+	return matchedPairs
+
+def ReturnedColumns(columnNames, returnColumns = None):
+	"""
+	Returns the columns of columnNames that a findMatches result should hold - all of them if returnColumns is None, otherwise only the ones in returnColumns 
+	(keeping the order of columnNames).
+	"""
+	if (returnColumns is None): return list(columnNames)
+	
+	return [x for x in columnNames if x in returnColumns]
+
+def TakeRows(dataframe, rows, columns):
+	"""
+	Gathers 'columns' of 'dataframe' at the row positions in 'rows' (a numpy array) into a new dataframe indexed 0, 1, 2...; a position of -1 gives a row of NULLs.
+	Only the requested columns are ever copied.
+	"""
+	myValid = (rows >= 0)
+	
+	if (len(columns) == 0): return pd.DataFrame(index = np.arange(len(rows)))
+	
+	#nothing to gather (or nothing to gather from) - the whole thing is NULL
+	if (not myValid.any()): return pd.DataFrame(np.nan, index = np.arange(len(rows)), columns = columns)
+	
+	myColumnPositions = [dataframe.columns.get_loc(x) for x in columns]
+	myTaken = dataframe.iloc[np.where(myValid, rows, 0), myColumnPositions]
+	myTaken.index = np.arange(len(rows))
+	if (not myValid.all()): myTaken.loc[~myValid,:] = np.nan
+	
+	return myTaken
+
+@DateFunc.Profiled('MatchConfidence.BuildMatchedFrame')
+def BuildMatchedFrame(dataframeA, dataframeB, matchedPairs, unusedRowsA, unusedRowsB, matchConfidenceCol = 'matchConfidence', columnsA = None, columnsB = None):
+	"""
+	Builds a findMatches result from the row positions that MatchTiers returned: the matched pairs in tier order, then the rows of A in 'unusedRowsA', then the rows 
+	of B in 'unusedRowsB' (both are row positions as well).  The columns are origIndexA, origIndexB, matchConfidenceCol, 'columnsA' and then 'columnsB' (by default 
+	every column of each dataframe); the other side of an unused row, and its match confidence, is left NULL.
+	
+	Each column is gathered exactly once, straight from dataframeA / dataframeB.
+	"""
+	if (columnsA is None): columnsA = list(dataframeA.columns.values)
+	if (columnsB is None): columnsB = list(dataframeB.columns.values)
+	
+	#lay the row positions of both sides out in the final order; -1 means there is no row on that side
+	myPiecesA = [x[0] for x in matchedPairs] + [np.asarray(unusedRowsA, dtype=np.int64), np.repeat(-1, len(unusedRowsB))]
+	myPiecesB = [x[1] for x in matchedPairs] + [np.repeat(-1, len(unusedRowsA)), np.asarray(unusedRowsB, dtype=np.int64)]
+	myRowsA = np.concatenate(myPiecesA).astype(np.int64)
+	myRowsB = np.concatenate(myPiecesB).astype(np.int64)
+	
+	myConfidence = np.empty(len(myRowsA), dtype=object)
+	myConfidence[:] = np.nan
+	myConfidence[:len(myRowsA) - len(unusedRowsA) - len(unusedRowsB)] = np.concatenate([np.repeat(x[2], len(x[0])) for x in matchedPairs] + [np.array([], dtype=object)])
+	
+	#the original indexes, NULL where there is no row
+	myIndexA = pd.Series(dataframeA.index).reindex(myRowsA).values
+	myIndexB = pd.Series(dataframeB.index).reindex(myRowsB).values
+	
+	myMapping = pd.DataFrame({'origIndexA': myIndexA, 'origIndexB': myIndexB, matchConfidenceCol: pd.Series(myConfidence).infer_objects().values}, columns = ['origIndexA', 'origIndexB', matchConfidenceCol])
+	
+	return pd.concat([myMapping, TakeRows(dataframeA, myRowsA, columnsA), TakeRows(dataframeB, myRowsB, columnsB)], axis = 1)
+
+class NormalizationCache(object):
+	"""
+	This holds the normalized (by default, lower-cased) string columns of dfA and dfB for one findMatches run, so a column that is fuzzy matched in several tiers is 
+	only normalized once.  Everything is keyed by (side, column, normalizer) and covers every row of the frame; the tiers slice out the rows that are still available.
+	
+	For B it also keeps the list of candidate strings (non NULL normalized values of the available rows) - which is only rebuilt if rows of B were used up since it 
+	was last asked for - and, if blocking is on, one CandidateIndex per column that is re-used across tiers by resetting its counts.
+	
+	'normalizer' is the 'normalizer' entry of the match dictionary column: '' (the default) lower-cases the column, or it can be any function that takes a pd.Series 
+	and returns the normalized pd.Series, for example lambda y: RemoveDistractingWords(y, ['inc', 'llc', 'corp']).  Use the SAME function object in every tier that 
+	should share the normalized values - two separate lambdas are cached separately.
+	"""
+	def __init__(self, dfA, dfB):
+		self.frames = {'A': dfA, 'B': dfB}
+		self.normalized = {}
+		self.candidateLists = {}
+		self.candidateIndexes = {}
+	
+	def GetNormalized(self, side, column, normalizer = ''):
+		#Returns the normalized values of a column of dfA (side 'A') or dfB (side 'B') as a numpy array with one element per row
+		
+		myKey = (side, column, normalizer)
+		if myKey not in self.normalized:
+			if (normalizer == ''): self.normalized[myKey] = self.frames[side][column].str.lower().values
+			else: self.normalized[myKey] = np.asarray(normalizer(self.frames[side][column]), dtype=object)
+		
+		return self.normalized[myKey]
+	
+	def GetCandidateList(self, column, normalizer, availableB):
+		"""
+		Returns a list of the non NULL normalized values of a column of dfB for the rows flagged in availableB (in row order).  The list is a copy, so it can be handed 
+		straight to GetClosestStringMatch (which removes what it matches).
+		"""
+		myKey = (column, normalizer)
+		#rows of B are only ever used up during a run, so the count of available rows tells us if the saved list is still good
+		myAvailableCount = np.count_nonzero(availableB)
+		if ((myKey not in self.candidateLists) or (self.candidateLists[myKey][0] != myAvailableCount)):
+			myNormalized = self.GetNormalized('B', column, normalizer)
+			self.candidateLists[myKey] = (myAvailableCount, myNormalized[availableB & pd.notnull(myNormalized)].tolist())
+		
+		return list(self.candidateLists[myKey][1])
+	
+	def GetCandidateIndex(self, column, normalizer, availableB, blockingKey = 'ngram', maxCandidates = 100):
+		#Returns a CandidateIndex over the normalized values of a column of dfB, reset so only the rows flagged in availableB can be matched
+		
+		myKey = (column, normalizer, blockingKey, maxCandidates)
+		if myKey not in self.candidateIndexes:
+			myNormalized = self.GetNormalized('B', column, normalizer)
+			self.candidateIndexes[myKey] = BuildRowCandidateIndex(myNormalized, pd.notnull(myNormalized), blockingKey = blockingKey, maxCandidates = maxCandidates)
+		
+		return ResetRowCandidateIndex(self.candidateIndexes[myKey][0], self.candidateIndexes[myKey][1], availableB)
+
+def BuildRowCandidateIndex(values, notNull, blockingKey = 'ngram', ngramSize = 3, maxCandidates = 100):
+	#Builds a CandidateIndex over every non NULL element of values; also returns the ID of each element's string in the index (-1 for NULLs) so it can be reset by rows
+	
+	myValues = np.asarray(values)[notNull].tolist()
+	myCandidateIndex = CandidateIndex(myValues, blockingKey = blockingKey, ngramSize = ngramSize, maxCandidates = maxCandidates)
+	
+	myRowIDs = np.full(len(notNull), -1, dtype=np.int64)
+	myRowIDs[np.asarray(notNull)] = [myCandidateIndex.stringToID[y] for y in myValues]
+	
+	return myCandidateIndex, myRowIDs
+
+def ResetRowCandidateIndex(candidateIndex, rowIDs, available):
+	#Returns a view of a CandidateIndex from BuildRowCandidateIndex with counts that let only the rows flagged in available be matched; the index itself is not changed
+	
+	return candidateIndex.WithCounts(np.bincount(rowIDs[available & (rowIDs >= 0)], minlength=len(candidateIndex.uniqueStrings)).astype(np.int64))
+
+def GetTierSignature(matchDictionary, tierNumber):
+	#Returns a tuple that identifies the B side of a match tier: one (colB, isFuzzy) pair per column compare.  Tiers with the same signature prepare B the same way.
+	return tuple((matchDictionary[tierNumber][x]['colB'], matchDictionary[tierNumber][x]['strLikenessPcnt'] != '') for x in range(matchDictionary[tierNumber]['numberColumnCompares']))
+
+class PackedStrings(object):
+	"""
+	An array of strings held as one buffer of bytes ('buffer') plus where each string starts in it ('offsets', one more element than there are strings) - unlike a 
+	fixed width numpy array, which makes every element as long as the longest one, so a single very long value cannot blow up the memory.  Both are plain numpy 
+	arrays, so they can be saved with np.save and memory mapped when loaded.
+	
+	If any of the strings is unicode they are all stored as UTF-8 and come back as unicode ('isUnicode'); otherwise the bytes come back just as they went in.
+	"""
+	def __init__(self, strings = None):
+		self.isUnicode = False
+		self.buffer = np.zeros(0, dtype=np.uint8)
+		self.offsets = np.zeros(1, dtype=np.int64)
+		
+		if (strings is not None): self.Pack(strings)
+	
+	def __len__(self):
+		return len(self.offsets) - 1
+	
+	def Pack(self, strings):
+		#Replaces the contents with a list (or array) of strings
+		
+		strings = list(strings)
+		self.isUnicode = any([isinstance(y, unicode) for y in strings])
+		if (self.isUnicode): myEncoded = [unicode(y).encode('utf-8') for y in strings]
+		else: myEncoded = strings
+		
+		self.offsets = np.concatenate([[0], np.cumsum([len(y) for y in myEncoded])]).astype(np.int64)
+		self.buffer = np.frombuffer(b''.join(myEncoded), dtype=np.uint8) if (self.offsets[-1] > 0) else np.zeros(0, dtype=np.uint8)
+	
+	def Take(self, rows):
+		#Returns the strings at the positions in rows, as a list
+		
+		rows = np.asarray(rows, dtype=np.int64)
+		myBytes = self.buffer.tobytes()
+		myStarts = self.offsets[rows].tolist()
+		myEnds = self.offsets[rows + 1].tolist()
+		
+		if (self.isUnicode): return [myBytes[y:z].decode('utf-8') for y, z in zip(myStarts, myEnds)]
+		else: return [myBytes[y:z] for y, z in zip(myStarts, myEnds)]
+
+class MatchIndex(object):
+	"""
+	This holds everything findMatches needs from dataframeB (the challenger), prepared ahead of time; its meant for the case where many different dataframeAs are 
+	matched against the same dataframeB, so the B side work is only done once.  Pass it to findMatches with 'matchIndex'.
+	
+	When built (by passing dataframeB and matchDictionary), the index holds:
+	- A copy of dataframeB ('dataframeB'), which is never modified (indexes saved by older versions also hold origIndexB / findMatchRowB columns; they are ignored).
+	- The lower-cased values (as PackedStrings) and a not NULL flag of every column of B used in a fuzzy tier ('normalizedKeys' / 'notNullKeys').
+	- A CandidateIndex for each of those columns, if a 'blockingKey' was given ('candidateIndexes').
+	- A join table for every tier ('joinTables'): the distinct (non NULL) keys of B for that tier, along with the rows of B that hold each key, grouped by key.  Fuzzy 
+		columns are keyed on their lower-cased values.
+	The index covers any match dictionary whose tiers use the same B columns (and the same columns fuzzy/not fuzzy) - the cutoffs and confidence levels can change.
+	
+	The index can be written to a directory with 'Save()' and read back with 'Load()'; the large arrays are memory mapped when loaded, so loading is fast and the 
+	operating system can share the pages across processes.
+	
+	Matching never changes the index - GetCandidateIndex hands each tier its own view of a CandidateIndex to use up - so one index can be shared by findMatches calls 
+	running at the same time in several threads.
+	
+	Example:
+	myIndex = MatchIndex(dataframeB, matchDictionary, blockingKey = 'ngram')
+	myIndex.Save('/data/matchIndexes/vendorMaster')
+	...
+	myIndex = MatchIndex()
+	myIndex.Load('/data/matchIndexes/vendorMaster')
+	matched = findMatches(dataframeA, None, matchDictionary, matchIndex = myIndex)
+	"""
+	def __init__(self, dataframeB = None, matchDictionary = None, blockingKey = None, maxCandidates = 100, ngramSize = 3):
+		
+		self.blockingKey = blockingKey
+		self.maxCandidates = maxCandidates
+		self.ngramSize = ngramSize
+		
+		self.dataframeB = None
+		self.columnNamesB = None
+		self.normalizedKeys = {}
+		self.notNullKeys = {}
+		self.candidateIndexes = {}
+		self.candidateRowIDs = {}
+		self.joinTables = {}
+		
+		if ((dataframeB is not None) & (matchDictionary is not None)): self.Build(dataframeB, matchDictionary)
+		
+	def Build(self, dataframeB, matchDictionary):
+		#Prepare everything for dataframeB; see the class notes
+		
+		self.columnNamesB = dataframeB.columns.values
+		self.dataframeB = dataframeB.copy()
+		
+		for i in range(matchDictionary['NumElements']):
+			mySignature = GetTierSignature(matchDictionary, i)
+			if mySignature in self.joinTables: continue
+			#tiers with a tolerance (and composite tiers) are always joined at match time
+			if (any([matchDictionary[i][x].get('tolerance', '') != '' for x in range(matchDictionary[i]['numberColumnCompares'])])): continue
+			if (IsCompositeTier(matchDictionary[i])): continue
+			
+			myKeys = []
+			for myColB, isFuzzy in mySignature:
+				if (isFuzzy):
+					if myColB not in self.normalizedKeys: self.AddNormalizedKey(myColB)
+					myKeys.append(self.GetNormalizedValues(myColB))
+				else:
+					myKeys.append(self.dataframeB[myColB].values)
+			
+			self.joinTables[mySignature] = BuildJoinTable(myKeys)
+	
+	def AddNormalizedKey(self, myColB):
+		#Lower-case a column of B (and index it, if blocking is on)
+		
+		myNotNull = pd.notnull(self.dataframeB[myColB]).values
+		myLowered = self.dataframeB[myColB].str.lower().values
+		
+		#packed strings (with NULLs as the empty string) can be memory mapped later; the not NULL flag tells the empty string and NULL apart
+		self.normalizedKeys[myColB] = PackedStrings(np.where(myNotNull, myLowered, ''))
+		self.notNullKeys[myColB] = myNotNull
+		
+		if (self.blockingKey is not None):
+			self.candidateIndexes[myColB], self.candidateRowIDs[myColB] = BuildRowCandidateIndex(self.GetNormalizedValues(myColB), myNotNull, blockingKey = self.blockingKey, ngramSize = self.ngramSize, maxCandidates = self.maxCandidates)
+	
+	def GetNormalizedValues(self, myColB):
+		#Returns the lower-cased values of a column of B as an object array (one element per row), with None for NULLs
+		
+		myValues = np.full(len(self.notNullKeys[myColB]), None, dtype=object)
+		myRows = np.flatnonzero(self.notNullKeys[myColB])
+		myValues[myRows] = self.normalizedKeys[myColB].Take(myRows)
+		
+		return myValues
+	
+	def GetCandidateIndex(self, myColB, availableB):
+		#Returns a view of the CandidateIndex for a column of B (or None if there is not one) that only lets the rows flagged in availableB be matched; the index 
+		#	itself is not changed
+		
+		if myColB not in self.candidateIndexes: return None
+		
+		return ResetRowCandidateIndex(self.candidateIndexes[myColB], self.candidateRowIDs[myColB], availableB)
+	
+	def LookupPairs(self, mySignature, keyArraysA, rowsA, availableB):
+		#Look up the keys of A (one array per column compare, aligned with rowsA) in a tier's join table; returns the (row of A, row of B) pairs that match
+		
+		return LookupJoinTable(self.joinTables[mySignature], keyArraysA, rowsA, availableB)
+		
+	def Save(self, directory):
+		#Write the index to a directory (which is created if it does not exist); anything already in the directory with the same file names is overwritten
+		
+		if not os.path.exists(directory): os.makedirs(directory)
+		
+		self.dataframeB.to_pickle(os.path.join(directory, 'dataframeB.pkl'))
+		
+		myMeta = {'blockingKey': self.blockingKey, 'maxCandidates': self.maxCandidates, 'ngramSize': self.ngramSize, 'columnNamesB': self.columnNamesB, 'normalizedColumns': [], 'normalizedUnicode': [], 'joinTables': [], 'candidateIndexes': []}
+		
+		for myNumber, myColB in enumerate(self.normalizedKeys):
+			myMeta['normalizedColumns'].append(myColB)
+			myMeta['normalizedUnicode'].append(self.normalizedKeys[myColB].isUnicode)
+			np.save(os.path.join(directory, 'normalizedBuffer_{}.npy'.format(myNumber)), self.normalizedKeys[myColB].buffer)
+			np.save(os.path.join(directory, 'normalizedOffsets_{}.npy'.format(myNumber)), self.normalizedKeys[myColB].offsets)
+			np.save(os.path.join(directory, 'notNull_{}.npy'.format(myNumber)), self.notNullKeys[myColB])
+			
+			if myColB in self.candidateIndexes:
+				#the postings are written as one big array of IDs plus the offset of each key
+				myCandidateIndex = self.candidateIndexes[myColB]
+				myPostingKeys = list(myCandidateIndex.postings.keys())
+				myPostingOffsets = np.cumsum([0] + [len(myCandidateIndex.postings[myKey]) for myKey in myPostingKeys])
+				myPostingIDs = np.concatenate([myCandidateIndex.postings[myKey] for myKey in myPostingKeys]) if len(myPostingKeys) > 0 else np.array([], dtype=np.int64)
+				np.save(os.path.join(directory, 'postingIDs_{}.npy'.format(myNumber)), myPostingIDs)
+				np.save(os.path.join(directory, 'postingOffsets_{}.npy'.format(myNumber)), myPostingOffsets)
+				np.save(os.path.join(directory, 'candidateRowIDs_{}.npy'.format(myNumber)), self.candidateRowIDs[myColB])
+				myMeta['candidateIndexes'].append((myColB, myNumber, myCandidateIndex.uniqueStrings, myPostingKeys))
+		
+		for myNumber, mySignature in enumerate(self.joinTables):
+			myMeta['joinTables'].append((mySignature, myNumber, self.joinTables[mySignature]['uniqueKeys']))
+			np.save(os.path.join(directory, 'joinRows_{}.npy'.format(myNumber)), self.joinTables[mySignature]['rows'])
+			np.save(os.path.join(directory, 'joinOffsets_{}.npy'.format(myNumber)), self.joinTables[mySignature]['offsets'])
+		
+		with open(os.path.join(directory, 'meta.pkl'), 'wb') as myFile: pickle.dump(myMeta, myFile, pickle.HIGHEST_PROTOCOL)
+	
+	def Load(self, directory):
+		#Read an index written by Save(); the large arrays are memory mapped (read only)
+		
+		with open(os.path.join(directory, 'meta.pkl'), 'rb') as myFile: myMeta = pickle.load(myFile)
+		
+		self.blockingKey = myMeta['blockingKey']
+		self.maxCandidates = myMeta['maxCandidates']
+		self.ngramSize = myMeta['ngramSize']
+		self.columnNamesB = myMeta['columnNamesB']
+		self.dataframeB = pd.read_pickle(os.path.join(directory, 'dataframeB.pkl'))
+		
+		self.normalizedKeys = {}
+		self.notNullKeys = {}
+		for myNumber, myColB in enumerate(myMeta['normalizedColumns']):
+			self.normalizedKeys[myColB] = PackedStrings()
+			self.normalizedKeys[myColB].isUnicode = myMeta['normalizedUnicode'][myNumber]
+			self.normalizedKeys[myColB].buffer = np.load(os.path.join(directory, 'normalizedBuffer_{}.npy'.format(myNumber)), mmap_mode='r')
+			self.normalizedKeys[myColB].offsets = np.load(os.path.join(directory, 'normalizedOffsets_{}.npy'.format(myNumber)), mmap_mode='r')
+			self.notNullKeys[myColB] = np.load(os.path.join(directory, 'notNull_{}.npy'.format(myNumber)), mmap_mode='r')
+		
+		self.candidateIndexes = {}
+		self.candidateRowIDs = {}
+		for myColB, myNumber, myUniqueStrings, myPostingKeys in myMeta['candidateIndexes']:
+			myPostingIDs = np.load(os.path.join(directory, 'postingIDs_{}.npy'.format(myNumber)), mmap_mode='r')
+			myPostingOffsets = np.load(os.path.join(directory, 'postingOffsets_{}.npy'.format(myNumber)))
+			
+			#an empty CandidateIndex is filled in with the saved pieces rather than being rebuilt
+			myCandidateIndex = CandidateIndex([], blockingKey = self.blockingKey, ngramSize = self.ngramSize, maxCandidates = self.maxCandidates)
+			myCandidateIndex.uniqueStrings = myUniqueStrings
+			myCandidateIndex.stringToID = dict((myStr, myID) for myID, myStr in enumerate(myUniqueStrings))
+			myCandidateIndex.ResetCounts(np.ones(len(myUniqueStrings), dtype=np.int64))
+			myCandidateIndex.SetStringRanks()
+			myCandidateIndex.postings = dict((myKey, myPostingIDs[myPostingOffsets[y]:myPostingOffsets[y + 1]]) for y, myKey in enumerate(myPostingKeys))
+			
+			self.candidateIndexes[myColB] = myCandidateIndex
+			self.candidateRowIDs[myColB] = np.load(os.path.join(directory, 'candidateRowIDs_{}.npy'.format(myNumber)), mmap_mode='r')
+		
+		self.joinTables = {}
+		for mySignature, myNumber, myUniqueKeys in myMeta['joinTables']:
+			myRows = np.load(os.path.join(directory, 'joinRows_{}.npy'.format(myNumber)), mmap_mode='r')
+			myOffsets = np.load(os.path.join(directory, 'joinOffsets_{}.npy'.format(myNumber)), mmap_mode='r')
+			#the kinds of the keys are read off the distinct keys, so indexes saved before they were kept load too
+			if (isinstance(myUniqueKeys, pd.MultiIndex)): myKeyKinds = [JoinKeyKind(myUniqueKeys.get_level_values(y)) for y in range(myUniqueKeys.nlevels)]
+			else: myKeyKinds = [JoinKeyKind(myUniqueKeys)]
+			self.joinTables[mySignature] = {'uniqueKeys': myUniqueKeys, 'rows': myRows, 'offsets': myOffsets, 'keyKinds': myKeyKinds}
+
+def BuildJoinTable(keyArrays):
+	"""
+	Builds a hash join table over one or more key arrays (all the same length, one per key column): the distinct non NULL keys ('uniqueKeys', a pandas Index or 
+	MultiIndex that can be looked up), the row numbers that hold each key grouped by key ('rows') and where each key's rows start in 'rows' ('offsets').  The rows 
+	for key k are rows[offsets[k]:offsets[k + 1]], in their original order.  Rows with a NULL in any key column are left out.  The kind of values in each key column 
+	is kept too ('keyKinds', see JoinKeyKind), so LookupJoinTable can check the keys it is given against them.
+	"""
+	myNotNull = np.ones(len(keyArrays[0]), dtype=bool)
+	for myKeys in keyArrays: myNotNull &= pd.notnull(myKeys)
+	myValidRows = np.flatnonzero(myNotNull)
+	
+	if (len(keyArrays) == 1):
+		myCodes, myUniqueKeys = pd.factorize(keyArrays[0][myValidRows])
+		myUniqueKeys = pd.Index(myUniqueKeys)
+	else:
+		myCodes, myUniqueKeys = pd.factorize(pd.MultiIndex.from_arrays([myKeys[myValidRows] for myKeys in keyArrays]))
+	
+	myOrder = np.argsort(myCodes, kind='mergesort')
+	myOffsets = np.concatenate([[0], np.cumsum(np.bincount(myCodes, minlength=len(myUniqueKeys)))]).astype(np.int64)
+	
+	return {'uniqueKeys': myUniqueKeys, 'rows': myValidRows[myOrder].astype(np.int64), 'offsets': myOffsets, 'keyKinds': [JoinKeyKind(y) for y in keyArrays]}
+
+def LookupJoinTable(joinTable, keyArraysA, rowsA, availableB):
+	"""
+	Looks the keys of A (one array per key column, aligned with the row numbers in rowsA) up in a table built by BuildJoinTable; returns two arrays, the rows of A 
+	and the rows of B that match, skipping any B row that is not flagged in availableB.  A rows with a NULL key never match.
+	"""
+	CheckJoinKeyKinds([JoinKeyKind(y) for y in keyArraysA], joinTable['keyKinds'])
+	
+	myNotNull = np.ones(len(rowsA), dtype=bool)
+	for myKeys in keyArraysA: myNotNull &= pd.notnull(myKeys)
+	
+	if (len(keyArraysA) == 1):
+		myCodes = joinTable['uniqueKeys'].get_indexer(keyArraysA[0])
+	else:
+		myCodes = joinTable['uniqueKeys'].get_indexer(pd.MultiIndex.from_arrays(keyArraysA))
+	myKeep = myNotNull & (myCodes >= 0)
+	myRowsA, myRowsB = ExpandJoinPairs(joinTable, myCodes[myKeep], np.asarray(rowsA)[myKeep])
+	
+	myKeep = availableB[myRowsB]
+	return myRowsA[myKeep], myRowsB[myKeep]
+
+def ExpandJoinPairs(joinTable, codesA, rowsA):
+	#Expands every A row (rowsA, with the position of its key in the join table in codesA) into one (row of A, row of B) pair per B row holding its key; returns the two arrays
+	
+	myStarts = joinTable['offsets'][codesA]
+	myCounts = joinTable['offsets'][codesA + 1] - myStarts
+	myPositions = np.arange(myCounts.sum()) - np.repeat(np.cumsum(myCounts) - myCounts, myCounts) + np.repeat(myStarts, myCounts)
+	
+	return np.repeat(rowsA, myCounts), np.asarray(joinTable['rows'])[myPositions]
+
+def FactorizeJoinKeys(keyArraysA, keyArraysB):
+	"""
+	Turns the keys of A and B (one array per key column, in the same order on both sides) into one integer code per row, shared by both sides: two rows have the 
+	same code if and only if every one of their key columns is equal (with the same rules as pd.merge, so 1 and 1.0 are equal but 1 and '1' are not).  Rows with a 
+	NULL in any key column get -1.
+	
+	A ValueError is raised if a key column holds a different kind of values on each side (numbers against strings, for example - see CheckJoinKeyKinds).
+	
+	Returns a tuple of the codes for A, the codes for B (both int64 numpy arrays) and the number of distinct codes.
+	"""
+	myKindsA = [JoinKeyKind(y) for y in keyArraysA]
+	myKindsB = [JoinKeyKind(y) for y in keyArraysB]
+	CheckJoinKeyKinds(myKindsA, myKindsB)
+	
+	numRowsA = len(keyArraysA[0])
+	myCodesA = np.zeros(numRowsA, dtype=np.int64)
+	myCodesB = np.zeros(len(keyArraysB[0]), dtype=np.int64)
+	myNullA = np.zeros(numRowsA, dtype=bool)
+	myNullB = np.zeros(len(keyArraysB[0]), dtype=bool)
+	numCodes = 1
+	
+	for myKeysA, myKeysB, myKindA, myKindB in zip(keyArraysA, keyArraysB, myKindsA, myKindsB):
+		myKeysA = np.asarray(myKeysA)
+		myKeysB = np.asarray(myKeysB)
+		if ((myKeysA.dtype != myKeysB.dtype) & ((myKindA != 'number') | (myKindB != 'number'))):
+			#concatenating different dtypes could turn the values into something else (numbers into strings, say), so they are concatenated as Python objects
+			myKeysA = np.asarray(pd.Series(myKeysA).astype(object))
+			myKeysB = np.asarray(pd.Series(myKeysB).astype(object))
+		
+		#factorizing both sides together is what makes the codes shared
+		myCodes, myUniques = pd.factorize(np.concatenate([myKeysA, myKeysB]))
+		numUniques = max(len(myUniques), 1)
+		
+		#combine with the columns so far; if the combined codes could overflow, squeeze them back down to 0..n-1 first
+		if (numCodes * numUniques >= 2 ** 62):
+			mySqueezed, myUniqueCodes = pd.factorize(np.concatenate([myCodesA, myCodesB]))
+			myCodesA = mySqueezed[:numRowsA]
+			myCodesB = mySqueezed[numRowsA:]
+			numCodes = len(myUniqueCodes)
+		myCodesA = myCodesA * numUniques + myCodes[:numRowsA]
+		myCodesB = myCodesB * numUniques + myCodes[numRowsA:]
+		numCodes = numCodes * numUniques
+		
+		myNullA |= (myCodes[:numRowsA] < 0)
+		myNullB |= (myCodes[numRowsA:] < 0)
+	
+	#with more than one column the combined codes can be sparse, so number them 0..n-1 (this is what keeps the join table small)
+	if (len(keyArraysA) > 1):
+		mySqueezed, myUniqueCodes = pd.factorize(np.concatenate([myCodesA, myCodesB]))
+		myCodesA = mySqueezed[:numRowsA]
+		myCodesB = mySqueezed[numRowsA:]
+		numCodes = len(myUniqueCodes)
+	
+	myCodesA[myNullA] = -1
+	myCodesB[myNullB] = -1
+	
+	return myCodesA, myCodesB, numCodes
+
+def JoinKeyKind(keys):
+	#Returns the kind of values in a key array - 'number', 'string', 'datetime' or 'timedelta' - or None if it cannot be told (every value is NULL, or it holds a mix)
+	
+	keys = np.asarray(keys)
+	#a float or date column that is all NULL (like an empty column read from a file) could be any kind
+	if ((keys.dtype.kind in ('f', 'c', 'M', 'm')) and (not pd.notnull(keys).any())): return None
+	if (keys.dtype.kind in ('b', 'i', 'u', 'f', 'c')): return 'number'
+	elif (keys.dtype.kind in ('S', 'U')): return 'string'
+	elif (keys.dtype.kind == 'M'): return 'datetime'
+	elif (keys.dtype.kind == 'm'): return 'timedelta'
+	
+	#an object array (which is how pandas holds strings) is told by its values
+	myInferred = pd.api.types.infer_dtype(keys, skipna = True)
+	if (myInferred in ('integer', 'floating', 'mixed-integer-float', 'decimal', 'boolean', 'complex')): return 'number'
+	elif (myInferred in ('string', 'unicode', 'bytes')): return 'string'
+	elif (myInferred in ('datetime64', 'datetime', 'date')): return 'datetime'
+	elif (myInferred in ('timedelta64', 'timedelta')): return 'timedelta'
+	else: return None
+
+def CheckJoinKeyKinds(kindsA, kindsB):
+	#Raises a ValueError if any key column (kinds from JoinKeyKind, in the same order on both sides) holds one kind of values in A and another in B; a column whose kind cannot be told is not checked
+	
+	for myColumn, (myKindA, myKindB) in enumerate(zip(kindsA, kindsB)):
+		if ((myKindA is not None) and (myKindB is not None) and (myKindA != myKindB)):
+			raise ValueError("Join key column {} (counting from 0) holds {} values in A but {} values in B, so nothing could match; convert one side to the other's type first".format(myColumn, myKindA, myKindB))
+
+@DateFunc.Profiled('MatchConfidence.JoinOnKeys')
+def JoinOnKeys(keyArraysA, rowsA, keyArraysB, rowsB):
+	"""
+	The inner join behind the findMatches tiers: keyArraysA / keyArraysB hold one array per key column (in the same order on both sides), aligned with the row 
+	numbers in rowsA / rowsB.  Only the keys are touched - they are turned into shared integer codes (see 'FactorizeJoinKeys') and B is grouped by code just like 
+	BuildJoinTable does - so no rows are copied.
+	
+	Returns two arrays, the rows of A and the rows of B that match, in the order of rowsA (and for each row of A, in the order of rowsB).  Rows with a NULL key 
+	never match.
+	"""
+	rowsA = np.asarray(rowsA)
+	rowsB = np.asarray(rowsB)
+	myCodesA, myCodesB, numCodes = FactorizeJoinKeys(keyArraysA, keyArraysB)
+	
+	myValidB = (myCodesB >= 0)
+	myOrder = np.argsort(myCodesB[myValidB], kind='mergesort')
+	myJoinTable = {'rows': rowsB[myValidB][myOrder], 'offsets': np.concatenate([[0], np.cumsum(np.bincount(myCodesB[myValidB], minlength=numCodes))]).astype(np.int64)}
+	
+	myValidA = (myCodesA >= 0)
+	return ExpandJoinPairs(myJoinTable, myCodesA[myValidA], rowsA[myValidA])
+
+class DisjointSets(object):
+	"""
+	A union-find (disjoint set) structure over the numbers 0..size-1, worked on with numpy arrays so millions of links can be merged at once.  Each set is 
+	identified by its smallest member.
+	
+	Example:
+	mySets = DisjointSets(5)
+	mySets.Union(np.array([0, 3]), np.array([1, 4]))
+	mySets.Find(np.arange(5))		#array([0, 0, 2, 3, 3])
+	"""
+	def __init__(self, size):
+		self.parent = np.arange(size, dtype=np.int64)
+	
+	def Compress(self):
+		#Points every element straight at the root of its set
+		while True:
+			myGrandparent = self.parent[self.parent]
+			if (np.array_equal(myGrandparent, self.parent)): break
+			self.parent = myGrandparent
+	
+	def Find(self, elements):
+		#Returns the set (smallest member) of each element in elements
+		self.Compress()
+		return self.parent[np.asarray(elements, dtype=np.int64)]
+	
+	def Union(self, elementsA, elementsB):
+		#Merges the set of elementsA[i] with the set of elementsB[i] for every i
+		elementsA = np.asarray(elementsA, dtype=np.int64)
+		elementsB = np.asarray(elementsB, dtype=np.int64)
+		
+		#roots always point at a smaller root, so there can never be a cycle; links that lose out when several roots are re-pointed at once are simply re-tried
+		while (len(elementsA) > 0):
+			myRootsA = self.Find(elementsA)
+			myRootsB = self.Find(elementsB)
+			myPending = (myRootsA != myRootsB)
+			if (not myPending.any()): break
+			
+			elementsA = elementsA[myPending]
+			elementsB = elementsB[myPending]
+			np.minimum.at(self.parent, np.maximum(myRootsA[myPending], myRootsB[myPending]), np.minimum(myRootsA[myPending], myRootsB[myPending]))
+
+def GetSimilarStringPairs(uniqueStrings, myCutoff = .6, scorer = '', blockingKey = 'ngram', maxCandidates = 100, neighbors = 5, workers = 1):
+	"""
+	Scores every string in uniqueStrings (a list of distinct strings, no NULLs) against the others - only the ones the CandidateIndex returns, if blockingKey is 
+	set - and returns the pairs that score at least myCutoff as two numpy arrays of positions in uniqueStrings; each string is paired with (up to) its 'neighbors' 
+	best matches.  A string is never paired with itself.
+	"""
+	if (blockingKey is not None):
+		myCandidateIndex = CandidateIndex(uniqueStrings, blockingKey = blockingKey, maxCandidates = maxCandidates)
+		myStringToID = myCandidateIndex.stringToID
+	else:
+		myCandidateIndex = None
+		myStringToID = dict(zip(uniqueStrings, range(len(uniqueStrings))))
+	
+	#every string finds itself as well, so it gets one extra place in its ranking; the strings are distinct, so their IDs are their positions
+	myRanked = RankStringsAgainstCandidates(uniqueStrings, uniqueStrings, myStringToID, np.arange(len(uniqueStrings)), myCandidateIndex, myCutoff, neighbors + 1, scorer, workers)[0]
+	myPairsA = np.repeat(np.arange(len(uniqueStrings)), [len(y) for y in myRanked]).astype(np.int64)
+	myPairsB = np.array([myID for y in myRanked for myID, myScore in y], dtype=np.int64)
+	
+	myKeep = (myPairsA != myPairsB)
+	return myPairsA[myKeep], myPairsB[myKeep]
+
+def ToleranceValues(values, tolerance):
+	"""
+	Turns a numeric or date column (a numpy array) and its tolerance into numbers that can be compared: returns a tuple of the values as a numpy array, a not NULL 
+	flag per value and the tolerance.  Dates become nanoseconds - their tolerance can be a timedelta (pd.Timedelta, datetime.timedelta or np.timedelta64) or a 
+	number of days.  Anything else is turned into floats, and values that are not numbers are treated as NULL.
+	
+	Columns of python objects are looked at more closely, since that is how dates usually arrive: 'YYYY-MM-DD[ HH:MM:SS]' strings, or the datetime.date values 
+	MySQL hands back.  If every value that is not NULL is a number they are numbers; otherwise, if more of them read as dates than as numbers, they are dates.  
+	If not a single one of them reads as either, a ValueError is raised rather than letting the tier quietly match nothing.
+	"""
+	myArray = np.asarray(values)
+	
+	if (myArray.dtype == object):
+		myNotNull = pd.notnull(myArray)
+		myNumbers = pd.to_numeric(pd.Series(myArray), errors='coerce').values.astype(np.float64)
+		myNumberCount = int(pd.notnull(myNumbers).sum())
+		
+		if (myNumberCount < myNotNull.sum()):
+			myDates = pd.to_datetime(pd.Series(myArray), errors='coerce')
+			myDateCount = int(pd.notnull(myDates).sum())
+			
+			if (max(myNumberCount, myDateCount) == 0):
+				raise ValueError("None of the values of a tolerance column could be read as numbers or dates (the first one is {!r})".format(myArray[myNotNull][0]))
+			
+			if (myDateCount > myNumberCount): myArray = myDates.values
+	
+	if (np.issubdtype(myArray.dtype, np.datetime64)):
+		myValues = pd.to_datetime(myArray)
+		if (isinstance(tolerance, (int, float))): tolerance = pd.Timedelta(days = tolerance)
+		return np.asarray(myValues.asi8, dtype=np.int64), np.asarray(pd.notnull(myValues)), pd.Timedelta(tolerance).value
+	
+	myValues = pd.to_numeric(pd.Series(myArray), errors='coerce').values.astype(np.float64)
+	return myValues, pd.notnull(myValues), float(tolerance)
+
+def ToleranceSlack(values, tolerance):
+	#floats get a hair of slack, so a difference that is only over the tolerance because of rounding (.3 - .29, for example) still matches; dates (integers) get none
+	if (values.dtype == np.float64): return (np.abs(values) + tolerance) * 1e-12
+	else: return np.zeros(len(values), dtype=np.int64)
+
+def WithinTolerance(valuesA, notNullA, valuesB, notNullB, tolerance):
+	#For two aligned arrays of pairs (from ToleranceValues), returns True where both values are there and they are within the tolerance (plus ToleranceSlack)
+	return notNullA & notNullB & (np.abs(valuesA - valuesB) <= tolerance + ToleranceSlack(valuesA, tolerance))
+
+def SortedPositions(sortedCodes, sortedValues, codes, values, side = 'left'):
+	"""
+	np.searchsorted for a list sorted on two keys: sortedCodes / sortedValues are sorted by code and then value, and for each (code, value) in codes / values the 
+	position it would be inserted at is returned ('left' puts it before equal elements, 'right' after them).  Everything is done with one sort.
+	"""
+	numSorted = len(sortedCodes)
+	myTypes = np.concatenate([np.ones(numSorted, dtype=np.int8), np.repeat(np.int8(0 if (side == 'left') else 2), len(codes))])
+	myOrder = np.lexsort((myTypes, np.concatenate([sortedValues, values]), np.concatenate([sortedCodes, codes])))
+	
+	#the number of sorted elements that come before each of the new ones is its position
+	mySortedBefore = np.cumsum(myOrder < numSorted)
+	retVal = np.zeros(len(codes), dtype=np.int64)
+	retVal[myOrder[myOrder >= numSorted] - numSorted] = mySortedBefore[myOrder >= numSorted]
+	
+	return retVal
+
+@DateFunc.Profiled('MatchConfidence.JoinWithinTolerance')
+def JoinWithinTolerance(keyArraysA, rowsA, keyArraysB, rowsB, toleranceArraysA, toleranceArraysB, tolerances):
+	"""
+	The join behind a tier with 'tolerance' columns.  keyArraysA / keyArraysB are the columns that have to be equal (exactly as in JoinOnKeys, and they can be empty 
+	lists); toleranceArraysA / toleranceArraysB hold one array per tolerance column, and 'tolerances' the tolerance of each (see 'ToleranceValues').  A pair matches 
+	if its keys are equal and abs(valueA - valueB) <= tolerance for every tolerance column.
+	
+	This is a sorted neighborhood join, so no cross join is ever made: B is sorted on (key, first tolerance column), the window [value - tolerance, value + tolerance] 
+	of each row of A is found with a binary search, and the pairs in the window are then checked against the other tolerance columns - O(n log n) plus the pairs.
+	
+	Returns two arrays, the rows of A and the rows of B that match, in the order of rowsA; for each row of A the closest B (on the first tolerance column) comes 
+	first, and ties are in the order of rowsB.  Rows with a NULL key or tolerance value never match.
+	"""
+	rowsA = np.asarray(rowsA)
+	rowsB = np.asarray(rowsB)
+	
+	if (len(keyArraysA) > 0):
+		myCodesA, myCodesB = FactorizeJoinKeys(keyArraysA, keyArraysB)[:2]
+	else:
+		myCodesA = np.zeros(len(rowsA), dtype=np.int64)
+		myCodesB = np.zeros(len(rowsB), dtype=np.int64)
+	
+	myValuesA, myNotNullA, myTolerance = ToleranceValues(toleranceArraysA[0], tolerances[0])
+	myValuesB, myNotNullB = ToleranceValues(toleranceArraysB[0], tolerances[0])[:2]
+	#the window gets the same slack WithinTolerance allows
+	mySlack = ToleranceSlack(myValuesA, myTolerance)
+	
+	#sort the usable rows of B on (key, value), and find the window of each usable row of A
+	myValidB = np.flatnonzero((myCodesB >= 0) & myNotNullB)
+	mySortedB = myValidB[np.lexsort((myValuesB[myValidB], myCodesB[myValidB]))]
+	myValidA = np.flatnonzero((myCodesA >= 0) & myNotNullA)
+	myStarts = SortedPositions(myCodesB[mySortedB], myValuesB[mySortedB], myCodesA[myValidA], myValuesA[myValidA] - myTolerance - mySlack[myValidA], side = 'left')
+	myEnds = SortedPositions(myCodesB[mySortedB], myValuesB[mySortedB], myCodesA[myValidA], myValuesA[myValidA] + myTolerance + mySlack[myValidA], side = 'right')
 	
-	If no records were matched it simply returns an empty dataframe; to check for an empty dataframe from the calling function:
-	if (returnedDataFrame.empty): <whatever>
+	#expand every row of A into the rows of B in its window
+	myCounts = myEnds - myStarts
+	myPairsA = np.repeat(myValidA, myCounts)
+	myPairsB = mySortedB[np.arange(myCounts.sum()) - np.repeat(np.cumsum(myCounts) - myCounts, myCounts) + np.repeat(myStarts, myCounts)]
+	myDistances = np.abs(myValuesA[myPairsA] - myValuesB[myPairsB])
 	
-	'matchDictionary' takes an object that is formatted by the 'createMatchDictionary' function below.
+	#the other tolerance columns are simply checked on the pairs
+	for myArrayA, myArrayB, myGivenTolerance in zip(toleranceArraysA[1:], toleranceArraysB[1:], tolerances[1:]):
+		myOtherA, myOtherNotNullA, myOtherTolerance = ToleranceValues(myArrayA, myGivenTolerance)
+		myOtherB, myOtherNotNullB = ToleranceValues(myArrayB, myGivenTolerance)[:2]
+		myKeep = WithinTolerance(myOtherA[myPairsA], myOtherNotNullA[myPairsA], myOtherB[myPairsB], myOtherNotNullB[myPairsB], myOtherTolerance)
+		myPairsA = myPairsA[myKeep]
+		myPairsB = myPairsB[myKeep]
+		myDistances = myDistances[myKeep]
 	
-	'matchConfidenceCol' is the column name where the match confidence is stored.
+	myOrder = np.lexsort((myPairsB, myDistances, myPairsA))
+	return rowsA[myPairsA[myOrder]], rowsB[myPairsB[myOrder]]
+
+def IsCompositeTier(tierDictionary):
+	#Returns True if a tier (one element of a match dictionary) has a 'compositeCutoff' and at least one fuzzy column, so it is scored by CompositeFuzzyJoin
 	
-	'enforceUniqueMatch' = 1 forces a 1:1 matchup IF a match exists; in other words, if multiple elements of B match A for any given match confidence, only 
-	one match is used. Set this to 0 to ignore this.
+	if (tierDictionary.get('compositeCutoff', '') == ''): return False
 	
-	'matchChallengerToMultipleMasters' is used where the master (dataframeA) to challenger (dataframeB) list is 1:many (meaning B can be shared to multiple As but a single A cannot be shared 
-	by multiple Bs), and in these cases we wish to remove the master column (which was already matched) and NOT the corresponding value of dataframeB (as the same value in B can match 
-	multiple values in A, but A must only be matched once).   If matchChallengerToMultipleMasters is set to 1, removal of the challenger identification will NOT happen and thus all values in B
-	can be used multiple times; this is defaulted to 0. 
-	Note this is different from 'enforceUniqueMatch', as 'enforceUniqueMatch' speaks only to ties for a specific match confidence.
-	Also note that currently, many:1 or many:many is not allowed at all.  The master MUST be a 1:? 
+	return any([(tierDictionary[x]['strLikenessPcnt'] != '') & (tierDictionary[x].get('tolerance', '') == '') for x in range(tierDictionary['numberColumnCompares'])])
 
-	'saveUnusedFromDataframeA'/'saveUnusedFromDataframeB' means if there are any unmatched rows from dataframe A (or respectively B), tack on to the end before returning the matches. Default
-	is 1 (meaning tack on matches). 	
+@DateFunc.Profiled('MatchConfidence.CompositeFuzzyJoin')
+def CompositeFuzzyJoin(dfA, dfB, tierDictionary, rowsA, availableB, normalizationCache, blockingKey = None, maxCandidates = 100, assignment = 'greedy', assignmentDepth = 10, scoringStats = None, enforceUniqueMatch = 1, matchChallengerToMultipleMasters = 0):
 	"""
+	The join behind a tier with a 'compositeCutoff' (see 'createMatchDictionary'): instead of resolving each fuzzy column on its own, the candidate pairs are scored 
+	on all of the tier's fuzzy columns together and a pair is kept on its weighted average score.
+	1. The candidates are generated once, on the first fuzzy column (the 'lead' column): every distinct value of A is paired with the rows of B that the 
+		CandidateIndex returns for it (if blockingKey is set; otherwise with every row of B, which is quadratic).  Pairs that do not agree on the exact columns (or 
+		are not within a 'tolerance' column's tolerance) are dropped.
+	2. Every fuzzy column is scored on the candidate pairs in batches - each distinct value of A is scored against all of its distinct partners in one 
+		ScoreStrings call - and each (A, B) value pair is only scored once.
+	3. A pair is kept if every fuzzy column scores at least its 'strLikenessPcnt' and the weighted average (using each column's 'weight', 1 by default) is at least 
+		'compositeCutoff'.
+	4. Each row of A then gets one row of B: with assignment 'greedy' each row of A (in order) takes its best scoring row of B that was not already taken, and with 
+		'optimal' the 'assignmentDepth' best rows of B for each row of A are handed to SolveSparseAssignment for the highest total score.  With 
+		matchChallengerToMultipleMasters set to 1 a row of B is never taken, so every row of A simply gets its best row of B (which is also what the solver would 
+		give with no limit on how often a row of B is used).  With enforceUniqueMatch set to 0 there is no step 4: every pair that passed is returned, best first 
+		for each row of A - just as the other joins return every pair when uniqueness is not enforced.
 	
-	#this is done to make sure the original two dataframes are not modified
-	dfA = dataframeA.copy()
-	dfB = dataframeB.copy()
-
-	#get the original column names from A and B; this will be useful later	
-	originalColumnNames = dfA.columns.values #gets all column names
-	originalColumnNames = np.append(originalColumnNames,dfB.columns.values)
+	rowsA are the rows of dfA that are available and availableB flags the rows of dfB that are; normalizationCache is the NormalizationCache over dfA and dfB.  
+	Returns two arrays, the matched rows of A (in order) and their rows of B.
+	"""
+	rowsA = np.asarray(rowsA)
+	rowsB = np.flatnonzero(availableB)
 	
-	#append the added indexes to the front
-	originalColumnNames = np.append(['origIndexA', 'origIndexB', matchConfidenceCol],originalColumnNames)
+	myExactA = []
+	myExactB = []
+	myTolerancesA = []
+	myTolerancesB = []
+	myTolerances = []
+	myFuzzy = []
+	#the blocking index over the lead column, if blocking is on
+	myLeadIndex = None
+	for x in range(tierDictionary['numberColumnCompares']):
+		myColA = tierDictionary[x]['colA']
+		myColB = tierDictionary[x]['colB']
+		if (tierDictionary[x].get('tolerance', '') != ''):
+			myTolerancesA.append(dfA[myColA].values[rowsA])
+			myTolerancesB.append(dfB[myColB].values[rowsB])
+			myTolerances.append(tierDictionary[x]['tolerance'])
+		elif (tierDictionary[x]['strLikenessPcnt'] != ''):
+			myNormalizer = tierDictionary[x].get('normalizer', '')
+			#the weights are divided by their sum, so a weight of 0 (or a negative one cancelling a positive one) would make every composite score NaN
+			myWeight = tierDictionary[x].get('weight', 1)
+			if ((isinstance(myWeight, bool)) or (not isinstance(myWeight, (int, long, float, np.integer, np.floating))) or (not np.isfinite(myWeight)) or (myWeight <= 0)):
+				raise ValueError("Column {} of the tier with matchConfidence {} has a 'weight' of {!r}; weights must be positive numbers".format(x, tierDictionary['matchConfidence'], myWeight))
+			if ((len(myFuzzy) == 0) & (blockingKey is not None)): myLeadIndex = normalizationCache.GetCandidateIndex(myColB, myNormalizer, availableB, blockingKey = blockingKey, maxCandidates = maxCandidates)
+			myFuzzy.append((normalizationCache.GetNormalized('A', myColA, myNormalizer)[rowsA], normalizationCache.GetNormalized('B', myColB, myNormalizer)[rowsB], tierDictionary[x]['strLikenessPcnt'], tierDictionary[x].get('scorer', ''), myWeight))
+		else:
+			myExactA.append(dfA[myColA].values[rowsA])
+			myExactB.append(dfB[myColB].values[rowsB])
 	
-	#add the index as a column - use these specific names as the findMatches function requires it
-	dfA['origIndexA'] = dfA.index
-	dfB['origIndexB'] = dfB.index
+	#1. the candidate strings of B for each distinct lead string of A, as positions in the join table over the lead column of B
+	myLeadA, myLeadB = myFuzzy[0][0], myFuzzy[0][1]
+	myJoinTable = BuildJoinTable([myLeadB])
+	myRowToDistinct, myDistinctA = pd.factorize(myLeadA)
+	myCandidateCodes = []
+	for myStr in myDistinctA:
+		if (myLeadIndex is not None): myCandidateCodes.append(myJoinTable['uniqueKeys'].get_indexer(myLeadIndex.GetCandidates(myStr)))
+		else: myCandidateCodes.append(np.arange(len(myJoinTable['uniqueKeys'])))
+	myCandidateTable = {'rows': np.concatenate(myCandidateCodes + [np.zeros(0, dtype=np.int64)]).astype(np.int64), 'offsets': np.concatenate([[0], np.cumsum([len(y) for y in myCandidateCodes])]).astype(np.int64)}
 	
-	#now that the master columns are settled, get the sub-dataframe column names and store them too
-	dfA_Columns = dfA.columns.values
-	dfB_Columns = dfB.columns.values
+	#expand each row of A to its candidate strings, and then to the rows of B holding them (both as positions in rowsA / rowsB)
+	myValidA = np.flatnonzero(myRowToDistinct >= 0)
+	myPairsA, myPairCodes = ExpandJoinPairs(myCandidateTable, myRowToDistinct[myValidA], myValidA)
+	myPairsA, myPairsB = ExpandJoinPairs(myJoinTable, myPairCodes, myPairsA)
 	
-	AtLeastSomeMergedRecords = 0
+	if (len(myExactA) > 0):
+		myCodesA, myCodesB = FactorizeJoinKeys(myExactA, myExactB)[:2]
+		myKeep = (myCodesA[myPairsA] >= 0) & (myCodesA[myPairsA] == myCodesB[myPairsB])
+		myPairsA = myPairsA[myKeep]
+		myPairsB = myPairsB[myKeep]
 	
-	#cycle through all possible matches
-	for i in range(matchDictionary['NumElements']):
-		
-		beanCount = 0
-		findMatchStringColAdded = 0
-		#cycle through every single column match for this match grouping to build the boolean statement 
-		for x in range(matchDictionary[i]['numberColumnCompares']):
-			"""
-			If strLikenessPcnt is set, this means we will be attempting a string comparison using a fuzzy match between 
-			colA and colB (fuzzy match means the strings do not have to be exactly alike). The user sets strLikenessPcnt to
-			be 0 < strLikenessPcnt <= 1, and then a function determines the closest match (determined by strLikenessPcnt)
-			
-			We will use dfA as the anchor, making another temp column there that will house the matching (or closest) string in B
-			we will then simply join on the two, using the new value for 'column A'
-			"""
-			if (matchDictionary[i][x]['strLikenessPcnt']!=''):
-				#Set a new column in A - we will use this column to match for A, then destroy this column when we are finished with it
-				#also do B; the only reason we need to give one to B is to make a lower-case column that we can use to match and then destroy at the end
-				myTempColA = 'findMatchString' + str(beanCount) + 'A'
-				myTempColB = 'findMatchString' + str(beanCount) + 'B'
-				dfA[myTempColA] = dfA[matchDictionary[i][x]['colA']].str.lower()
-				dfB[myTempColB] = dfB[matchDictionary[i][x]['colB']].str.lower()
-
-				#get the list of potentials from B.  Make SURE you pull back NO NULLS!
-				myPotentialMatchList = dfB.loc[(pd.isnull(dfB[myTempColB]) == False),][myTempColB].values.tolist()
-								
-				#capitalization DOES matter - so make everything lower case
-				beanCount += 1
-				dfA[myTempColA] = dfA[myTempColA].apply(lambda y: GetClosestStringMatch(y,myPotentialMatchList, removeMatched = 1, myCutoff = matchDictionary[i][x]['strLikenessPcnt']))
-				
-				#dfA['findMatchString'] now holds the closest match in B - so simply swap out colA for findMatchString and proceed as normal
-				#(initially I did not do B, but I found that case-sensitive matters so I implemented lower() and now manipulate B as well)
-				matchDictionary[i][x]['colA'] = myTempColA
-				matchDictionary[i][x]['colB'] = myTempColB 
-				findMatchStringColAdded = 1
-			
-				
-			if x ==0:
-				myLeftOn = [matchDictionary[i][x]['colA']]
-				myRightOn = [matchDictionary[i][x]['colB']]
-			else:
-				myLeftOn.append(matchDictionary[i][x]['colA'])
-				myRightOn.append(matchDictionary[i][x]['colB'])
-		
-		#update the merged dataframe	
-		tempMatched = pd.merge(dfA, dfB, how='inner', left_on=myLeftOn, right_on=myRightOn)
-		tempMatched[matchConfidenceCol] = matchDictionary[i]['matchConfidence']
-		
-		#we want to make sure to keep ONLY the non-nulls for this particular match - so eliminate rows where the key fields are NULL
-		#we should only have to do this with one side - so we will choose A - since if its a match BOTH will be NULL
-		for x in range(matchDictionary[i]['numberColumnCompares']): tempMatched = tempMatched.loc[(pd.notnull(tempMatched[matchDictionary[i][x]['colA']])),:]
-			
-		#IF we used a fuzzy string match earlier, remove the added column by basically only restoring the original columns (all columns outside of findMatchString)
-		if (findMatchStringColAdded == 1):
-			findMatchStringColAdded = 0
-			dfA = dfA[dfA_Columns]
-			dfB = dfB[dfB_Columns]
-			tempMatched = tempMatched[originalColumnNames]
-		
-		#if we wish to enforce a unique match between A and B do so 
-		if (enforceUniqueMatch==1):
-			enforcedDF = tempMatched.groupby('origIndexA').head(1).reset_index(drop=True)[['origIndexA', 'origIndexB']]
-			#save the origIndexB that survived the enforced unique match
-			origIndexB = enforcedDF['origIndexB'].values.tolist()
-			
-			#keep ONLY those B indexes that survived
-			tempMatched = tempMatched.loc[(tempMatched['origIndexB'].isin(origIndexB)),:]
-		
-		#if there are at lease some rows matched
-		if(tempMatched.shape[0] > 0):
-			
-			#if nothing has been added to the final merged df
-			if AtLeastSomeMergedRecords == 0:
-				matched = tempMatched.copy()
-			else:
-				matched = matched.append(tempMatched,ignore_index = True) #the ignore index is important otherwise it will re-use the index which may not be desirable
-				
-			AtLeastSomeMergedRecords = 1
-			#remove the items just matched from the feeder dataframes; do this by getting a list of FCC IDs for the A and B dataframes, then only keeping the 
-			#rows that do NOT exist in the matched data
-			#first just get the list of items to be removed
-			origIndexA = matched.loc[(matched[matchConfidenceCol] == matchDictionary[i]['matchConfidence']),]['origIndexA'].values.tolist()
-			origIndexB = matched.loc[(matched[matchConfidenceCol] == matchDictionary[i]['matchConfidence']),]['origIndexB'].values.tolist()
-	
-			#if there is anything to remove do so
-			if (len(origIndexA) > 0):
-				#if the original B index is used, remove	
-				dfA = dfA.loc[(dfA['origIndexA'].isin(origIndexA) == False),:]
-				"""
-				B is handled a bit differently.  In some instances where the master (dfA) to challenger list is 1:many, and in these cases we wish to remove the master column
-				(which was already matched) and NOT the corresponding value of dfB (as the same value in B can match multiple values in A, but A must only be matched once).
-				if it is indicated that this is the case, do NOT eliminate used B indexes
-				so if matchChallengerToMultipleMasters is set to 1, the below will NOT run and thus all values in B can be used multiple times (this is defaulted to 0)				
-				"""
-				if(matchChallengerToMultipleMasters == 0): dfB = dfB.loc[(dfB['origIndexB'].isin(origIndexB) == False),:]
+	for myArrayA, myArrayB, myGivenTolerance in zip(myTolerancesA, myTolerancesB, myTolerances):
+		myValuesA, myNotNullA, myTolerance = ToleranceValues(myArrayA, myGivenTolerance)
+		myValuesB, myNotNullB = ToleranceValues(myArrayB, myGivenTolerance)[:2]
+		myKeep = WithinTolerance(myValuesA[myPairsA], myNotNullA[myPairsA], myValuesB[myPairsB], myNotNullB[myPairsB], myTolerance)
+		myPairsA = myPairsA[myKeep]
+		myPairsB = myPairsB[myKeep]
 	
+	if (scoringStats is not None):
+		scoringStats['fuzzyLookups'] += len(myDistinctA)
+		scoringStats['fuzzyComparisons'] += len(myPairsA)
 	
-	if (AtLeastSomeMergedRecords == 0):
-		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Warning: No matches found!")
-		
-		return pd.DataFrame()
+	#2. and 3. score every fuzzy column on the candidate pairs
+	myComposite = np.zeros(len(myPairsA))
+	myKeep = np.ones(len(myPairsA), dtype=bool)
+	for myValuesA, myValuesB, myCutoff, myScorer, myWeight in myFuzzy:
+		myScores = ScoreStringPairs(myValuesA[myPairsA], myValuesB[myPairsB], scorer = myScorer)
+		myKeep &= (myScores >= myCutoff)
+		myComposite += myWeight * myScores
+	myComposite /= float(sum([y[4] for y in myFuzzy]))
+	myKeep &= (myComposite >= tierDictionary['compositeCutoff'])
+	myPairsA = myPairsA[myKeep]
+	myPairsB = myPairsB[myKeep]
+	myComposite = myComposite[myKeep]
+	
+	#4. best first for each row of A (ties go to the earlier row of B)
+	myOrder = np.lexsort((myPairsB, -myComposite, myPairsA))
+	myPairsA = myPairsA[myOrder]
+	myPairsB = myPairsB[myOrder]
+	myComposite = myComposite[myOrder]
+	myRowsWithPairs, myStarts, myCounts = np.unique(myPairsA, return_index = True, return_counts = True)
+	
+	if (enforceUniqueMatch != 1): return rowsA[myPairsA], rowsB[myPairsB]
+	
+	myMatchedA = []
+	myMatchedB = []
+	if (matchChallengerToMultipleMasters == 1):
+		#B can be used any number of times, so each row of A takes its best row of B
+		myMatchedA = myRowsWithPairs
+		myMatchedB = myPairsB[myStarts]
+	elif (assignment == 'optimal'):
+		#the solver works on whole numbers, just like GetOptimalStringAssignment
+		myEdgeIDs = [myPairsB[y:y + min(z, assignmentDepth)].tolist() for y, z in zip(myStarts, myCounts)]
+		myEdgeCosts = [[int(round((1 - myScore) * 1000000)) for myScore in myComposite[y:y + min(z, assignmentDepth)]] for y, z in zip(myStarts, myCounts)]
+		myAssigned = SolveSparseAssignment(myEdgeIDs, myEdgeCosts, np.ones(len(rowsB), dtype=np.int64), unmatchedCost = 1000000)
+		for myRow, myAssignedB in zip(myRowsWithPairs, myAssigned):
+			if (myAssignedB >= 0):
+				myMatchedA.append(myRow)
+				myMatchedB.append(myAssignedB)
 	else:
-		#if there are some elements left in either A or B, lump them on the bottom. leave their matchConfidence NULL
-		#also check to see if it was indicated that we wish to lump them or not with saveUnusedFromDataframeA/B 
-		if((dfA.shape[0] > 0) & (saveUnusedFromDataframeA == 1)): matched = matched.append(dfA,ignore_index = True)
-		if((dfB.shape[0] > 0) & (saveUnusedFromDataframeB == 1)): matched = matched.append(dfB,ignore_index = True)
-		
-		return matched
+		myTaken = np.zeros(len(rowsB), dtype=bool)
+		for myRow, y, z in zip(myRowsWithPairs, myStarts, myCounts):
+			for myCandidate in myPairsB[y:y + z]:
+				if not (myTaken[myCandidate]):
+					myTaken[myCandidate] = True
+					myMatchedA.append(myRow)
+					myMatchedB.append(myCandidate)
+					break
+	
+	return rowsA[np.array(myMatchedA, dtype=np.int64)], rowsB[np.array(myMatchedB, dtype=np.int64)]
+
+def ScoreStringPairs(stringsA, stringsB, scorer = ''):
+	"""
+	Scores stringsA[i] against stringsB[i] for every i (two numpy arrays of the same length) and returns a numpy array of the scores (see 'ScoreStrings'); a pair 
+	with a NULL scores 0.  The pairs are grouped by the string of A so each distinct string of A is scored against all of its distinct partners in one call.
+	"""
+	retVal = np.zeros(len(stringsA))
+	myValid = np.flatnonzero(pd.notnull(stringsA) & pd.notnull(stringsB))
+	if (len(myValid) == 0): return retVal
+	
+	#the distinct (A, B) string pairs, grouped by the string of A
+	myCodesA, myUniqueA = pd.factorize(stringsA[myValid])
+	myCodesB, myUniqueB = pd.factorize(stringsB[myValid])
+	myPairCodes, myInverse = np.unique(myCodesA.astype(np.int64) * len(myUniqueB) + myCodesB, return_inverse = True)
+	myPairA = myPairCodes // len(myUniqueB)
+	myPairB = myPairCodes % len(myUniqueB)
+	
+	myPairScores = np.zeros(len(myPairCodes))
+	myBounds = np.concatenate([[0], np.cumsum(np.bincount(myPairA, minlength = len(myUniqueA)))])
+	for y in range(len(myUniqueA)):
+		if (myBounds[y + 1] > myBounds[y]): myPairScores[myBounds[y]:myBounds[y + 1]] = ScoreStrings(myUniqueA[y], [myUniqueB[z] for z in myPairB[myBounds[y]:myBounds[y + 1]]], scorer)
+	
+	retVal[myValid] = myPairScores[myInverse]
+	return retVal
 
 def createMatchDictionary(CountOfCompairisonsList, confidenceOffset = 0):
 	"""
@@ -193,32 +1743,54 @@ def createMatchDictionary(CountOfCompairisonsList, confidenceOffset = 0):
 	{
 		'NumElements': 3, 
 		0: {
-			0: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
-			1: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
-			2: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
-			3: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
-			4: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
+			0: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
+			1: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
+			2: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
+			3: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
+			4: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
 			'numberColumnCompares': 5, 
+			'compositeCutoff': '', 
 			'matchConfidence': 1
 		}, 
 		1: {
 	
-			0: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
-			2: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
-			1: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}
+			0: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
+			2: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
+			1: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}
 			'numberColumnCompares': 3, 
+			'compositeCutoff': '', 
 			'matchConfidence': 2
 		}, 
 		2: {
-			0: {'strLikenessPcnt': '', 'colB': '', 'colA': ''}, 
+			0: {'strLikenessPcnt': '', 'scorer': '', 'normalizer': '', 'tolerance': '', 'colB': '', 'colA': ''}, 
 			'numberColumnCompares': 1, 
+			'compositeCutoff': '', 
 			'matchConfidence': 3
 		}
 	}
 	
+	'scorer' picks the similarity measure used when 'strLikenessPcnt' is set; leave it as the empty string to use difflib (the original behavior), or set it to one 
+	of the scorers in 'ScoreStrings' below ('levenshtein', 'jarowinkler', 'tokenset', 'tokensort' or 'ngramjaccard').  The cutoff in 'strLikenessPcnt' is applied to 
+	whichever score is used, so it may need to be re-tuned if the scorer is changed.
+	
+	'normalizer' is how the strings are cleaned up before a fuzzy match; leave it as the empty string to lower-case them (the original behavior), or set it to a function 
+	that takes and returns a pd.Series (see 'NormalizationCache').  Each column is only normalized once per findMatches call, however many tiers use it.
+	
+	'tolerance' is for numeric and date columns that do not have to be exactly equal: set it and the column matches if abs(colA - colB) <= tolerance, for example 
+	.01 for an amount or pd.Timedelta(days = 2) for a date (a plain number is taken as days for a date column).  Tiers with tolerance columns are run as sorted joins 
+	(see 'JoinWithinTolerance') so they stay O(n log n) rather than a cross join and a filter, and the closest row of B is preferred.  If a column has a tolerance, 
+	its 'strLikenessPcnt' is ignored.
+	
+	'compositeCutoff' (per tier) changes how a tier with more than one fuzzy column is matched.  Left as the empty string, each fuzzy column is resolved on its own 
+	(the closest value of B for each value of A, which is then used up) and the tier is an exact join on those values - so every column has to pick the same row 
+	of B.  Set it (0 < compositeCutoff <= 1) and the candidate pairs are generated once and scored on all of the fuzzy columns together; a pair is kept if the 
+	weighted average of its column scores is at least compositeCutoff (and each column still scores at least its own 'strLikenessPcnt' - set that to 0 to only use 
+	the average).  Each column can be given a 'weight' (the default is 1), which must be a positive number - anything else raises a ValueError.  See 
+	'CompositeFuzzyJoin'.
+	
 	######Note######
 	You do not have to use this method to create the dictionary for the match confidence assessment, but if you do not 
-	you must create your own dictionary to pass and the structure MUST be the same, including the three values saved as the empty string! 
+	you must create your own dictionary to pass and the structure MUST be the same, including the three values saved as the empty string! ('scorer', 'normalizer', 'tolerance', 'weight' and 'compositeCutoff' may be left out.)
 	"""
 	numOfElements = len(CountOfCompairisonsList)
 	myDictionary = {}
@@ -227,15 +1799,19 @@ def createMatchDictionary(CountOfCompairisonsList, confidenceOffset = 0):
 		myDictionary[i] = {}
 		myDictionary[i]['matchConfidence'] = i + confidenceOffset + 1
 		myDictionary[i]['numberColumnCompares'] = CountOfCompairisonsList[i]
+		myDictionary[i]['compositeCutoff'] = ""
 		for x in range(CountOfCompairisonsList[i]):
 			myDictionary[i][x] = {}
 			myDictionary[i][x]['colA'] = ""
 			myDictionary[i][x]['colB'] = ""
 			myDictionary[i][x]['strLikenessPcnt'] = ""
+			myDictionary[i][x]['scorer'] = ""
+			myDictionary[i][x]['normalizer'] = ""
+			myDictionary[i][x]['tolerance'] = ""
 
 	return myDictionary
 
-def GetClosestStringMatch(myStr,closestList,removeMatched = 0, myCutoff = .6):
+def GetClosestStringMatch(myStr,closestList,removeMatched = 0, myCutoff = .6, candidateIndex = None, scorer = '', scoringStats = None):
 	"""
 	This function accepts a string, a list that contains potential closes matches to that string, and a cutoff (the cutoff determines how close the string must be;
 	.99 is VERY close, .01 is almost not the same string).
@@ -244,45 +1820,872 @@ def GetClosestStringMatch(myStr,closestList,removeMatched = 0, myCutoff = .6):
 	
 	CRITICAL: Do NOT pass through a portion of a dataframe to this function - carve out a list from the dataframe instead! This function removes
 	elements that are successfully matched IF removeMatched == 1
+	
+	If 'candidateIndex' (a CandidateIndex built over closestList) is passed, only the candidates the index returns are scored, and a successful match is 
+	removed from the index (NOT from closestList) if removeMatched == 1.
+	
+	'scorer' picks the similarity measure (see 'ScoreStrings'); the default ('' or 'difflib') is difflib's SequenceMatcher ratio.
+	
+	If 'scoringStats' (a dictionary with the keys 'fuzzyLookups' and 'fuzzyComparisons') is passed, it is updated with the number of strings looked up (1) and the
+	number of candidates that were scored for it.
 	"""
-	myReturnedList = difflib.get_close_matches(myStr,closestList,n=1,cutoff=myCutoff)
+	if (candidateIndex is not None):
+		myPossibilities = candidateIndex.GetCandidates(myStr)
+	else:
+		myPossibilities = closestList
+	
+	if (scoringStats is not None):
+		scoringStats['fuzzyLookups'] += 1
+		scoringStats['fuzzyComparisons'] += len(myPossibilities)
+		
+	myReturnedList = RankCloseMatches(myStr,myPossibilities,myCutoff,n=1,scorer=scorer)
 	if (len(myReturnedList) == 0):
 		return np.nan
 	else:
-		retVal = myReturnedList[0]
-		if (removeMatched == 1): closestList.remove(retVal)
+		retVal = myReturnedList[0][1]
+		if (removeMatched == 1):
+			if (candidateIndex is not None): candidateIndex.Remove(retVal)
+			else: closestList.remove(retVal)
 		return retVal
+
+@DateFunc.Profiled('MatchConfidence.GetTopCandidates')
+def GetTopCandidates(stringsA, stringsB, k = 5, myCutoff = .6, scorer = '', normalizer = '', blockingKey = None, maxCandidates = 100, workers = 1):
+	"""
+	The batch version of GetClosestStringMatch for when more than the single best string is needed (a review screen, for example): for every element of stringsA 
+	it finds the (up to) k elements of stringsB that score the highest (and at least myCutoff) against it.  Nothing is used up - every element of A is scored 
+	against all of B.
+	
+	'stringsA' and 'stringsB' are anything that can be turned into a pd.Series (lists, numpy arrays, Series); NULLs are fine and never match.  They are normalized 
+	the same way as a fuzzy findMatches column: 'normalizer' is '' (lower-case them) or a function that takes and returns a pd.Series.  'scorer', 'blockingKey', 
+	'maxCandidates' and 'workers' are the same as in findMatches; if blockingKey is set, only the candidates the CandidateIndex returns are scored.
+	
+	Returns a dictionary holding the matches in a compressed sparse row (CSR) layout, all as numpy arrays:
+	- 'offsets': len(stringsA) + 1 elements; the matches for element i of A are at positions offsets[i]:offsets[i + 1] of the other two arrays
+	- 'indexB': the position (0, 1, 2...) in stringsB of each match
+	- 'scores': the score of each match
+	The matches for each element of A are best first; if a string is in stringsB more than once, each position is its own match (in position order).
+	
+	To get a flat dataframe (one row per match) out of it:
+	pd.DataFrame({'indexA': np.repeat(np.arange(len(stringsA)), np.diff(retVal['offsets'])), 'indexB': retVal['indexB'], 'score': retVal['scores']})
+	"""
+	
+	#object Series, since an empty (or all NULL) list would otherwise come out as float64, which has no .str
+	if (normalizer == ''):
+		myNormalizedA = pd.Series(stringsA, dtype=object).str.lower().values
+		myNormalizedB = pd.Series(stringsB, dtype=object).str.lower().values
+	else:
+		myNormalizedA = normalizer(pd.Series(stringsA, dtype=object)).values
+		myNormalizedB = normalizer(pd.Series(stringsB, dtype=object)).values
+	
+	if ((not pd.notnull(myNormalizedA).any()) | (not pd.notnull(myNormalizedB).any())):
+		#nothing can match
+		return {'offsets': np.zeros(len(myNormalizedA) + 1, dtype=np.int64), 'indexB': np.zeros(0, dtype=np.int64), 'scores': np.zeros(0, dtype=np.float64)}
+	
+	#group the positions of B by distinct string - only the distinct strings are scored
+	myJoinTable = BuildJoinTable([myNormalizedB])
+	myUniqueStrings = myJoinTable['uniqueKeys'].tolist()
+	if (blockingKey is not None):
+		myCandidateIndex = CandidateIndex(myUniqueStrings, blockingKey = blockingKey, maxCandidates = maxCandidates)
+		myStringToID = myCandidateIndex.stringToID
+	else:
+		myCandidateIndex = None
+		myStringToID = dict(zip(myUniqueStrings, range(len(myUniqueStrings))))
+	
+	#the same for A, skipping NULLs
+	myDistinctA, myRowToDistinct = pd.factorize(myNormalizedA)[::-1]
+	myDistinctA = myDistinctA.tolist()
+	myRankedStrings, myComparisons = RankStringsAgainstCandidates(myDistinctA, myUniqueStrings, myStringToID, np.arange(len(myUniqueStrings)), myCandidateIndex, myCutoff, k, scorer, workers)
+	
+	#expand each ranked string to the positions of B that hold it, keeping at most k per string of A
+	myRankedIndexB = []
+	myRankedScores = []
+	for myRanked in myRankedStrings:
+		myIndexB = []
+		myScores = []
+		for myID, myScore in myRanked:
+			myRows = myJoinTable['rows'][myJoinTable['offsets'][myID]:myJoinTable['offsets'][myID + 1]][:k - len(myIndexB)]
+			myIndexB.extend(myRows.tolist())
+			myScores.extend([myScore] * len(myRows))
+			if (len(myIndexB) >= k): break
+		myRankedIndexB.append(myIndexB)
+		myRankedScores.append(myScores)
+	
+	#NULLs in A were factorized to -1, which have no matches
+	myIndexB = []
+	myScores = []
+	myCounts = np.zeros(len(myNormalizedA), dtype=np.int64)
+	for y, myDistinct in enumerate(myRowToDistinct):
+		if (myDistinct < 0): continue
+		myIndexB.extend(myRankedIndexB[myDistinct])
+		myScores.extend(myRankedScores[myDistinct])
+		myCounts[y] = len(myRankedIndexB[myDistinct])
+	
+	return {'offsets': np.concatenate([[0], np.cumsum(myCounts)]).astype(np.int64), 'indexB': np.array(myIndexB, dtype=np.int64), 'scores': np.array(myScores, dtype=np.float64)}
+
+def RankCloseMatches(myStr, possibilities, myCutoff = .6, n = 1, scorer = ''):
+	"""
+	Returns up to n (score, string) tuples for the elements of possibilities that score at least myCutoff against myStr, best first; ties in the score go to the 
+	string that sorts last.  With the default scorer this is exactly difflib.get_close_matches (including its quick ratio shortcuts), just with the scores kept.
+	"""
+	if ((scorer == '') | (scorer == 'difflib')):
+		myScored = []
+		s = difflib.SequenceMatcher()
+		s.set_seq2(myStr)
+		for myPossibility in possibilities:
+			s.set_seq1(myPossibility)
+			if ((s.real_quick_ratio() >= myCutoff) and (s.quick_ratio() >= myCutoff) and (s.ratio() >= myCutoff)):
+				myScored.append((s.ratio(), myPossibility))
+	else:
+		myScores = ScoreStrings(myStr, possibilities, scorer)
+		myScored = [(myScores[y], possibilities[y]) for y in np.flatnonzero(myScores >= myCutoff)]
+	
+	return heapq.nlargest(n, myScored)
+
+def ScoreStrings(myStr, candidates, scorer = 'levenshtein'):
+	"""
+	Scores one string against a whole list (or array) of candidate strings in one call and returns a numpy array of scores between 0 (nothing alike) and 1 (the same);
+	no nulls! The scorers are:
+	
+	'difflib' (or '') - difflib's SequenceMatcher ratio; this is what GetClosestStringMatch has always used.
+	'levenshtein' - 1 - (Levenshtein edit distance / length of the longer string).
+	'jarowinkler' - Jaro-Winkler similarity (prefix weight .1, up to 4 characters of common prefix, only applied if the Jaro similarity is above .7); good for short 
+		strings like names.
+	'tokensort' - The Indel ratio (2 * longest common subsequence / total length) of the two strings after their words are sorted, so word order does not matter.
+	'tokenset' - Like 'tokensort', but compares the words the two strings share against the words they do not (the best of the three comparisons is used), so extra 
+		words in one string are not penalized much.  Good for company names and addresses.
+	'ngramjaccard' - The Jaccard similarity of the sets of character trigrams of the two strings (padded with two spaces on each side).
+	
+	If the optional 'rapidfuzz' package is installed, 'levenshtein', 'jarowinkler', 'tokensort', 'tokenset' and 'ngramjaccard' are scored by its compiled code; 
+	otherwise 'levenshtein', 'jarowinkler' and the ratio behind the token scorers are computed with NumPy, scoring every candidate at once (one pass per character of 
+	myStr), and 'ngramjaccard' from the trigrams of every string coded as integers (see NGramJaccards).  The two give the same scores (to within float rounding).  An 
+	unknown scorer falls back to 'difflib'.
+	"""
+	if (len(candidates) == 0): return np.zeros(0)
+	
+	if ((rapidfuzzAvailable) & (scorer in ('levenshtein', 'jarowinkler', 'tokensort', 'tokenset', 'ngramjaccard'))):
+		if (scorer == 'levenshtein'): myScores = rapidfuzzProcess.cdist([myStr], candidates, scorer = rapidfuzzLevenshtein.normalized_similarity)[0]
+		elif (scorer == 'jarowinkler'): myScores = rapidfuzzProcess.cdist([myStr], candidates, scorer = rapidfuzzJaroWinkler.normalized_similarity)[0]
+		elif (scorer == 'tokensort'): myScores = rapidfuzzProcess.cdist([myStr], candidates, scorer = rapidfuzzFuzz.token_sort_ratio)[0] / 100.0
+		elif (scorer == 'tokenset'): myScores = rapidfuzzProcess.cdist([myStr], candidates, scorer = rapidfuzzFuzz.token_set_ratio)[0] / 100.0
+		else: myScores = NGramJaccards(myStr, candidates)
+		return np.asarray(myScores, dtype=np.float64)
+	
+	if (scorer == 'levenshtein'):
+		return LevenshteinRatios(myStr, candidates)
+	elif (scorer == 'jarowinkler'):
+		return JaroWinklerSimilarities(myStr, candidates)
+	elif (scorer == 'tokensort'):
+		return IndelRatios(' '.join(sorted(myStr.split())), [' '.join(sorted(y.split())) for y in candidates])
+	elif (scorer == 'tokenset'):
+		return np.array([TokenSetRatio(myStr, y) for y in candidates], dtype=np.float64)
+	elif (scorer == 'ngramjaccard'):
+		return NGramJaccards(myStr, candidates)
+	else:
+		#'difflib', '' or an unknown scorer
+		myScores = np.zeros(len(candidates))
+		s = difflib.SequenceMatcher()
+		s.set_seq2(myStr)
+		for y, myCandidate in enumerate(candidates):
+			s.set_seq1(myCandidate)
+			myScores[y] = s.ratio()
+		return myScores
+
+def EncodeStrings(myStrings):
+	#Turns a list of strings into a 2D numpy array of character codes (one row per string, padded with 0) plus an array of the string lengths
+	
+	myArray = np.array(list(myStrings))
+	if (myArray.dtype.kind not in ('S', 'U')): myArray = myArray.astype(np.unicode_)
+	myLengths = np.char.str_len(myArray)
+	
+	if (myArray.dtype.kind == 'S'): myCodes = myArray.view(np.uint8).reshape(len(myArray), -1)
+	else: myCodes = myArray.view(np.uint32).reshape(len(myArray), -1)
+	
+	return myCodes.astype(np.int32), myLengths
+
+def LevenshteinRatios(myStr, candidates):
+	"""
+	Returns 1 - (Levenshtein distance / length of the longer string) for myStr against every candidate, computed with NumPy across all candidates at once.
+	
+	This is the usual dynamic program, one row per character of myStr; within a row, cell j is min(t[k] + (j - k)) over k <= j, where t holds the substitution / 
+	deletion costs from the row above, so a whole row is a running minimum instead of a loop over the characters of the candidates.
+	"""
+	myCandidateCodes, myCandidateLengths = EncodeStrings(candidates)
+	myQueryCodes, myQueryLength = EncodeStrings([myStr])
+	myQueryCodes = myQueryCodes[0][:myQueryLength[0]]
+	
+	myColumns = np.arange(myCandidateCodes.shape[1] + 1)
+	myRow = np.tile(myColumns, (len(myCandidateLengths), 1))
+	for y, myChar in enumerate(myQueryCodes):
+		myCosts = np.empty_like(myRow)
+		myCosts[:, 0] = y + 1
+		myCosts[:, 1:] = np.minimum(myRow[:, 1:] + 1, myRow[:, :-1] + (myCandidateCodes != myChar))
+		myRow = np.minimum.accumulate(myCosts - myColumns, axis=1) + myColumns
+	
+	myDistances = myRow[np.arange(len(myCandidateLengths)), myCandidateLengths]
+	myLongest = np.maximum(myCandidateLengths, len(myQueryCodes))
+	
+	return np.where(myLongest > 0, 1.0 - myDistances / np.maximum(myLongest, 1).astype(np.float64), 1.0)
+
+def IndelRatios(myStr, candidates):
+	"""
+	Returns the Indel ratio, 2 * (longest common subsequence) / (total length of both strings), for myStr against every candidate, computed with NumPy across all 
+	candidates at once.  This is the same row by row dynamic program as LevenshteinRatios, using a running maximum.
+	"""
+	myCandidateCodes, myCandidateLengths = EncodeStrings(candidates)
+	myQueryCodes, myQueryLength = EncodeStrings([myStr])
+	myQueryCodes = myQueryCodes[0][:myQueryLength[0]]
+	
+	myRow = np.zeros((len(myCandidateLengths), myCandidateCodes.shape[1] + 1), dtype=np.int32)
+	for myChar in myQueryCodes:
+		myBest = myRow.copy()
+		myBest[:, 1:] = np.where(myCandidateCodes == myChar, myRow[:, :-1] + 1, myRow[:, 1:])
+		myRow = np.maximum.accumulate(myBest, axis=1)
+	
+	myCommon = myRow[np.arange(len(myCandidateLengths)), myCandidateLengths]
+	myTotal = myCandidateLengths + len(myQueryCodes)
+	
+	return np.where(myTotal > 0, 2.0 * myCommon / np.maximum(myTotal, 1).astype(np.float64), 1.0)
+
+def TokenSetRatio(myStrA, myStrB):
+	#The 'tokenset' score (see ScoreStrings) for a single pair of strings
+	
+	myTokensA = set(myStrA.split())
+	myTokensB = set(myStrB.split())
+	if ((len(myTokensA) == 0) | (len(myTokensB) == 0)): return 0.0
+	
+	myShared = ' '.join(sorted(myTokensA & myTokensB))
+	myCombinedA = (myShared + ' ' + ' '.join(sorted(myTokensA - myTokensB))).strip()
+	myCombinedB = (myShared + ' ' + ' '.join(sorted(myTokensB - myTokensA))).strip()
+	
+	return float(max(IndelRatios(myShared, [myCombinedA, myCombinedB]).max(), IndelRatios(myCombinedA, [myCombinedB])[0]))
+
+def JaroWinklerSimilarities(myStr, candidates):
+	"""
+	Returns the Jaro-Winkler similarity (see ScoreStrings) of myStr against every candidate, computed with NumPy across all candidates at once.
+	
+	Each character of myStr (in order) takes the first character of each candidate that is equal, not taken yet and within that candidate's matching window, so 
+	there is one pass per character of myStr - just like LevenshteinRatios.  The matched characters are then lined up by their rank on each side to count the ones 
+	that are out of order.
+	"""
+	myCodes, myLengths = EncodeStrings([myStr] + list(candidates))
+	myQueryLength = myLengths[0]
+	myQueryCodes = myCodes[0][:myQueryLength]
+	myCandidateCodes = myCodes[1:]
+	myCandidateLengths = myLengths[1:]
+	numCandidates = len(myCandidateLengths)
+	myCandidateRows = np.arange(numCandidates)
+	
+	#characters only count as matching if they are no further apart than this (per candidate)
+	myWindows = np.maximum(np.maximum(myCandidateLengths, myQueryLength) // 2 - 1, 0)
+	myColumns = np.arange(myCandidateCodes.shape[1])
+	myInCandidate = myColumns < myCandidateLengths[:, np.newaxis]
+	
+	myMatchedA = np.zeros((numCandidates, myQueryLength), dtype=bool)
+	myMatchedB = np.zeros(myCandidateCodes.shape, dtype=bool)
+	for y, myChar in enumerate(myQueryCodes):
+		myOpen = (myCandidateCodes == myChar) & (~myMatchedB) & myInCandidate & (np.abs(myColumns - y) <= myWindows[:, np.newaxis])
+		myFound = myOpen.any(axis=1)
+		myMatchedB[myCandidateRows[myFound], myOpen[myFound].argmax(axis=1)] = True
+		myMatchedA[:, y] = myFound
+	myMatches = myMatchedA.sum(axis=1)
+	
+	#the k-th matched character of myStr against the k-th matched character of the candidate
+	myRowsA, myPositionsA = np.nonzero(myMatchedA)
+	myRowsB, myPositionsB = np.nonzero(myMatchedB)
+	myOutOfOrder = np.bincount(myRowsA, weights = (myQueryCodes[myPositionsA] != myCandidateCodes[myRowsB, myPositionsB]), minlength = numCandidates).astype(np.int64)
+	
+	myFloatMatches = myMatches.astype(np.float64)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		myJaro = (myFloatMatches / myQueryLength + myFloatMatches / myCandidateLengths + (myMatches - myOutOfOrder // 2) / myFloatMatches) / 3.0
+	
+	#the common prefix, up to 4 characters
+	myPrefixWidth = min(4, myQueryLength, myCandidateCodes.shape[1])
+	mySamePrefix = (myCandidateCodes[:, :myPrefixWidth] == myQueryCodes[:myPrefixWidth]) & myInCandidate[:, :myPrefixWidth]
+	myPrefix = np.cumprod(mySamePrefix, axis=1).sum(axis=1)
 	
+	myScores = np.where(myJaro > .7, myJaro + myPrefix * .1 * (1.0 - myJaro), myJaro)
+	myScores[myMatches == 0] = 0.0
+	myScores[(myCandidateLengths == 0) & (myQueryLength == 0)] = 1.0
+	return myScores
 
-def RemoveDistractingWords(givenSeries, deletedWords = []):
+def PaddedNGramCodes(myStrings, ngramSize = 3):
+	"""
+	Returns the distinct padded n-grams (see GetPaddedNGrams) of every string in myStrings as int64 codes, as a tuple of two numpy arrays: the number of the string 
+	each code belongs to, and the code (sorted by string, then code).  The n-grams are built from the character codes of EncodeStrings, so there is no Python loop over 
+	the strings.
+	"""
+	myCodes, myLengths = EncodeStrings(myStrings)
+	myCodes = myCodes.astype(np.int64)
+	numGrams = myCodes.shape[1] + ngramSize - 1
+	
+	#pad with spaces on both sides; everything past a string's end is a space too, but only the n-grams that start before the end of its padding are kept
+	myPadded = np.full((len(myLengths), myCodes.shape[1] + 2 * (ngramSize - 1)), ord(' '), dtype=np.int64)
+	myPadded[:, ngramSize - 1:ngramSize - 1 + myCodes.shape[1]] = np.where(np.arange(myCodes.shape[1]) < myLengths[:, np.newaxis], myCodes, ord(' '))
+	myBase = max(int(myPadded.max()), ord(' ')) + 1
+	myGrams = np.zeros((len(myLengths), numGrams), dtype=np.int64)
+	for y in range(ngramSize): myGrams = myGrams * myBase + myPadded[:, y:y + numGrams]
+	
+	myKeep = np.arange(numGrams) < (myLengths + ngramSize - 1)[:, np.newaxis]
+	myRows = np.nonzero(myKeep)[0]
+	myGramIDs, myUniqueGrams = pd.factorize(myGrams[myKeep])
+	myPairs = np.unique(myRows.astype(np.int64) * len(myUniqueGrams) + myGramIDs)
+	
+	return myPairs // len(myUniqueGrams), myPairs % len(myUniqueGrams)
+
+def NGramJaccards(myStr, candidates):
+	"""
+	Returns the Jaccard similarity of the padded trigrams of myStr against those of every candidate (the 'ngramjaccard' scorer).  The trigrams of every string are coded 
+	as integers once (see PaddedNGramCodes), so the intersections are counted for all candidates at once; with rapidfuzz, the Indel distance between the sorted codes is 
+	used instead (for sorted, distinct codes it is the size of both sets less twice their intersection).
+	"""
+	myRows, myGrams = PaddedNGramCodes([myStr] + list(candidates))
+	mySizes = np.bincount(myRows, minlength = len(candidates) + 1)
+	
+	if (rapidfuzzAvailable):
+		myBounds = np.concatenate([[0], np.cumsum(mySizes)])
+		myGramLists = [myGrams[myBounds[y]:myBounds[y + 1]].tolist() for y in range(len(mySizes))]
+		myDistances = np.asarray(rapidfuzzProcess.cdist(myGramLists[:1], myGramLists[1:], scorer = rapidfuzzIndel.distance)[0], dtype=np.int64)
+		myShared = (mySizes[0] + mySizes[1:] - myDistances) // 2
+	else:
+		myInQuery = np.in1d(myGrams, myGrams[myRows == 0])
+		myShared = np.bincount(myRows[myInQuery], minlength = len(candidates) + 1)[1:]
+	
+	#every string has at least one (padded) trigram, so the union is never empty
+	return myShared / (mySizes[0] + mySizes[1:] - myShared).astype(np.float64)
+
+def GetPaddedNGrams(myStr, ngramSize = 3):
+	#Returns the character n-grams of a string padded with (ngramSize - 1) spaces on each side
+	
+	myPadded = ' ' * (ngramSize - 1) + myStr + ' ' * (ngramSize - 1)
+	return [myPadded[y:y + ngramSize] for y in range(len(myPadded) - ngramSize + 1)]
+
+@DateFunc.Profiled('MatchConfidence.GetClosestStringMatchesInParallel')
+def GetClosestStringMatchesInParallel(myStrings, closestList, myCutoff = .6, workers = 2, candidateIndex = None, rankDepth = 10, scorer = '', scoringStats = None):
+	"""
+	This is the multi-process version of calling GetClosestStringMatch(y, closestList, removeMatched = 1, ...) on every element y of myStrings, in order; it returns a 
+	list (one element per element of myStrings) holding the closest match, or np.nan if there was none.  The results are exactly the same as the single process loop.
+	
+	It works in two steps:
+	1. myStrings is split into chunks that are scored across a pool of 'workers' processes.  Every process scores against the SAME candidate list (the unused 
+		elements of closestList, or candidateIndex if its passed) without removing anything, and sends back the 'rankDepth' best candidates for each string, 
+		best first (ties are ordered just like difflib.get_close_matches orders them), using 'scorer' (see 'ScoreStrings').
+	2. The results are reconciled in this process, in the original order of myStrings: each string takes the first candidate on its list that has not been used
+		up by an earlier string, which is exactly what the single process loop would have picked.  If every candidate on a full list was used up (or, with 
+		candidateIndex, any of the string's candidates was, since the index then returns the next one in its place), that one string is simply re-scored against 
+		what is left.
+	
+	Like GetClosestStringMatch, matched strings are used up - closestList is left alone, but the counts in candidateIndex ARE updated.  Again, no nulls!
+	
+	'scoringStats' is the same as in GetClosestStringMatch; the comparisons made by every worker (and any re-scoring) are added up.
+	"""
+	
+	if (candidateIndex is not None):
+		myUniqueStrings = candidateIndex.uniqueStrings
+		myStringToID = candidateIndex.stringToID
+		myCounts = candidateIndex.counts
+	else:
+		#collapse the list to distinct strings; duplicates score the same, so this does not change which string is picked
+		myUniqueStrings, myStringToID, myCounts = CollapseCandidateList(closestList)
+	
+	#only the strings that are still available can be scored
+	myAvailableIDs = np.flatnonzero(myCounts > 0)
+	
+	myRankedStrings, myComparisons = RankStringsAgainstCandidates(myStrings, myUniqueStrings, myStringToID, myAvailableIDs, candidateIndex, myCutoff, rankDepth, scorer, workers)
+	
+	if (scoringStats is not None):
+		scoringStats['fuzzyLookups'] += len(myStrings)
+		scoringStats['fuzzyComparisons'] += myComparisons
+	
+	#reconcile, in order
+	retVal = []
+	for myRanked, myStr in zip(myRankedStrings, myStrings):
+		myMatchID = None
+		#if an earlier string used up one of this string's candidates, the index hands the loop the next ranked string in its place - which was never scored here
+		myRescore = ((candidateIndex is not None) and (myCounts[candidateIndex.GetCandidateIDs(myStr, onlyAvailable = False)] == 0).any())
+		if (not myRescore):
+			for myID, myScore in myRanked:
+				if (myCounts[myID] > 0):
+					myMatchID = myID
+					break
+			#everything this string ranked was used up, but there may be more candidates that passed the cutoff
+			myRescore = ((myMatchID is None) & (len(myRanked) == rankDepth))
+		
+		if (myRescore):
+			#re-score against what is left
+			if (candidateIndex is not None):
+				myLeftovers = candidateIndex.GetCandidates(myStr)
+			else:
+				myLeftovers = [myUniqueStrings[y] for y in np.flatnonzero(myCounts > 0)]
+			if (scoringStats is not None): scoringStats['fuzzyComparisons'] += len(myLeftovers)
+			myReturnedList = RankCloseMatches(myStr,myLeftovers,myCutoff,n=1,scorer=scorer)
+			if (len(myReturnedList) > 0): myMatchID = myStringToID[myReturnedList[0][1]]
+		
+		if (myMatchID is None):
+			retVal.append(np.nan)
+		else:
+			myCounts[myMatchID] -= 1
+			retVal.append(myUniqueStrings[myMatchID])
+	
+	return retVal
+
+def CollapseCandidateList(closestList):
+	#Collapses a list of candidate strings to its distinct strings; returns the list of distinct strings, a dictionary of string -> position and a numpy array of how often each one appears
+	
+	myStringToID = {}
+	myUniqueStrings = []
+	myCountList = []
+	for myStr in closestList:
+		if myStr in myStringToID:
+			myCountList[myStringToID[myStr]] += 1
+		else:
+			myStringToID[myStr] = len(myUniqueStrings)
+			myUniqueStrings.append(myStr)
+			myCountList.append(1)
+	
+	return myUniqueStrings, myStringToID, np.array(myCountList, dtype=np.int64)
+
+def RankStringsAgainstCandidates(myStrings, uniqueStrings, stringToID, availableIDs, candidateIndex, myCutoff, rankDepth, scorer, workers = 1):
+	"""
+	Scores every string in myStrings against the candidates (the 'availableIDs' elements of uniqueStrings, or what candidateIndex returns for it) WITHOUT removing 
+	anything; if workers is above 1, myStrings is split into chunks that are scored across a pool of that many processes.
+	
+	Returns a tuple: a list (one element per element of myStrings) of the 'rankDepth' best (candidate ID, score) tuples that pass myCutoff, best first, and the total 
+	number of candidates that were scored.
+	"""
+	
+	if (workers > 1):
+		#a few chunks per worker keeps the processes busy if some chunks are slower than others
+		myChunkSize = len(myStrings) // (workers * 4) + 1
+		myChunks = [myStrings[y:y + myChunkSize] for y in range(0, len(myStrings), myChunkSize)]
+		
+		myPool = multiprocessing.Pool(processes = workers, initializer = InitParallelMatchWorker, initargs = (uniqueStrings, stringToID, availableIDs, candidateIndex, myCutoff, rankDepth, scorer))
+		try:
+			myRankedChunks = myPool.map(RankChunkForParallelMatch, myChunks)
+		finally:
+			myPool.close()
+			myPool.join()
+	else:
+		myMatchState = {}
+		InitParallelMatchWorker(uniqueStrings, stringToID, availableIDs, candidateIndex, myCutoff, rankDepth, scorer, matchState = myMatchState)
+		myRankedChunks = [RankChunkForParallelMatch(myStrings, matchState = myMatchState)]
+	
+	retVal = []
+	for myRankedChunk in myRankedChunks: retVal.extend(myRankedChunk[0])
+	
+	return retVal, sum([y[1] for y in myRankedChunks])
+
+#this holds the shared candidate list for each process in the GetClosestStringMatchesInParallel pool; its set once per process by InitParallelMatchWorker
+parallelMatchState = {}
+
+def InitParallelMatchWorker(uniqueStrings, stringToID, availableIDs, candidateIndex, myCutoff, rankDepth, scorer, matchState = None):
+	#Save the shared candidate list for this worker process (or, if matchState is passed, in that dictionary instead)
+	if (matchState is None): matchState = parallelMatchState
+	matchState['uniqueStrings'] = uniqueStrings
+	matchState['stringToID'] = stringToID
+	matchState['availableIDs'] = availableIDs
+	matchState['candidateIndex'] = candidateIndex
+	matchState['cutoff'] = myCutoff
+	matchState['rankDepth'] = rankDepth
+	matchState['scorer'] = scorer
+
+def RankChunkForParallelMatch(myStrings, matchState = None):
+	"""
+	This runs inside a GetClosestStringMatchesInParallel worker process; for each string in myStrings it finds the IDs of the best 'rankDepth' candidates that pass 
+	the cutoff, best first.  The scoring (and ordering of ties) is the same as RankCloseMatches.  If matchState is passed, its used instead of the state saved by 
+	InitParallelMatchWorker (this is how a single process run uses it).
+	
+	Returns a tuple: the list of ranked (ID, score) tuples (one list per string) and the total number of candidates that were scored.
+	"""
+	if (matchState is None): matchState = parallelMatchState
+	myUniqueStrings = matchState['uniqueStrings']
+	myStringToID = matchState['stringToID']
+	myCandidateIndex = matchState['candidateIndex']
+	myCutoff = matchState['cutoff']
+	
+	retVal = []
+	myComparisons = 0
+	for myStr in myStrings:
+		if (myCandidateIndex is not None):
+			#the candidate set must not depend on what other strings match, so the strings whose candidates were used up during this run are re-scored during 
+			#	reconciliation instead
+			myIDs = myCandidateIndex.GetCandidateIDs(myStr, onlyAvailable = False)
+		else:
+			myIDs = matchState['availableIDs']
+		
+		myComparisons += len(myIDs)
+		myRanked = RankCloseMatches(myStr, [myUniqueStrings[y] for y in myIDs], myCutoff, n = matchState['rankDepth'], scorer = matchState['scorer'])
+		retVal.append([(myStringToID[y[1]], y[0]) for y in myRanked])
+	
+	return (retVal, myComparisons)
+
+@DateFunc.Profiled('MatchConfidence.GetOptimalStringAssignment')
+def GetOptimalStringAssignment(myStrings, closestList, myCutoff = .6, candidateIndex = None, assignmentDepth = 10, scorer = '', workers = 1, scoringStats = None):
+	"""
+	This is the 'optimal' alternative to calling GetClosestStringMatch(y, closestList, removeMatched = 1, ...) on every element y of myStrings; it returns a list 
+	(one element per element of myStrings) holding the matched string from closestList, or np.nan if there was none.
+	
+	The loop is greedy: each string takes its best remaining candidate, so an early string can take the candidate a later string matched much better, and the 
+	result depends on the order of myStrings.  Instead this:
+	1. Scores every distinct string in myStrings against the candidates (across 'workers' processes if its above 1) and keeps the 'assignmentDepth' best that pass 
+		myCutoff - this is the sparse score matrix; nothing that did not make a string's top list can be assigned to it.
+	2. Solves the 1:1 assignment over that sparse matrix that gives the highest total score (see 'SolveSparseAssignment'), where each element of closestList can 
+		be used once (a string that is in closestList 3 times can be assigned 3 times) and strings that cant be matched well are left unmatched.
+	Only the sparse matrix is ever built, so with blocking (candidateIndex) this scales to 100k x 100k; without it, step 1 scores every pair just like the loop does.
+	
+	Like GetClosestStringMatch, matched strings are used up - closestList is left alone, but the counts in candidateIndex ARE updated.  Again, no nulls!
+	'scorer' and 'scoringStats' are the same as in GetClosestStringMatch.
+	"""
+	
+	if (candidateIndex is not None):
+		myUniqueStrings = candidateIndex.uniqueStrings
+		myStringToID = candidateIndex.stringToID
+		myCounts = candidateIndex.counts
+	else:
+		myUniqueStrings, myStringToID, myCounts = CollapseCandidateList(closestList)
+	
+	#each distinct string only needs to be scored once
+	myDistinctToPosition = {}
+	myDistinctStrings = []
+	myRowToDistinct = []
+	for myStr in myStrings:
+		if myStr not in myDistinctToPosition:
+			myDistinctToPosition[myStr] = len(myDistinctStrings)
+			myDistinctStrings.append(myStr)
+		myRowToDistinct.append(myDistinctToPosition[myStr])
+	
+	myRankedStrings, myComparisons = RankStringsAgainstCandidates(myDistinctStrings, myUniqueStrings, myStringToID, np.flatnonzero(myCounts > 0), candidateIndex, myCutoff, assignmentDepth, scorer, workers)
+	
+	if (scoringStats is not None):
+		scoringStats['fuzzyLookups'] += len(myStrings)
+		scoringStats['fuzzyComparisons'] += myComparisons
+	
+	#the solver works on whole numbers so the totals are exact; a cost of 0 is a perfect match and 1000000 is the cost of leaving a string unmatched
+	myEdgeIDs = []
+	myEdgeCosts = []
+	for myRanked in myRankedStrings:
+		myEdgeIDs.append([myID for myID, myScore in myRanked if myCounts[myID] > 0])
+		myEdgeCosts.append([int(round((1 - myScore) * 1000000)) for myID, myScore in myRanked if myCounts[myID] > 0])
+	
+	myAssigned = SolveSparseAssignment([myEdgeIDs[y] for y in myRowToDistinct], [myEdgeCosts[y] for y in myRowToDistinct], myCounts, unmatchedCost = 1000000)
+	
+	retVal = []
+	for myID in myAssigned:
+		if (myID < 0):
+			retVal.append(np.nan)
+		else:
+			myCounts[myID] -= 1
+			retVal.append(myUniqueStrings[myID])
+	
+	return retVal
+
+def SolveSparseAssignment(rowEdgeIDs, rowEdgeCosts, capacities, unmatchedCost):
+	"""
+	Solves a sparse assignment (min cost bipartite matching) problem exactly and returns a list holding, for each row, the column it was assigned to or -1 if it was 
+	left unmatched.
+	
+	'rowEdgeIDs' / 'rowEdgeCosts' hold one list per row: the columns the row can be assigned to and the (whole number, non negative) cost of each; pairs that are 
+	not listed can never be assigned.  'capacities' is how many rows each column can take, and any row can be left unmatched for 'unmatchedCost' - so the result 
+	is the assignment with the lowest total cost, where every row is either assigned or pays unmatchedCost.
+	
+	This is the successive shortest path form of the Hungarian algorithm: the rows are added one at a time, and each one is placed along the cheapest path that 
+	ends at a column with room left (or at leaving some row unmatched), which may move rows that were placed earlier.  The path search is Dijkstra over the listed 
+	pairs only, using potentials (kept per row and column) so the costs it sees are never negative; the memory is the size of the listed pairs, never rows x columns.
+	"""
+	numRows = len(rowEdgeIDs)
+	
+	#the potentials; the columns are kept in a dictionary since only the columns that were listed ever get one
+	rowPotentials = [0] * numRows
+	colPotentials = {}
+	
+	#what each row is assigned to (-1 is unmatched) and what it costs, and the rows assigned to each column
+	rowAssigned = [-1] * numRows
+	rowAssignedCost = [0] * numRows
+	colRows = {}
+	
+	for r in range(numRows):
+		if (len(rowEdgeIDs[r]) == 0): continue
+		
+		#a new row has no way in, so its potential just has to keep the costs of its own pairs (and of leaving it unmatched) from going negative
+		rowPotentials[r] = max([colPotentials.get(myCol, 0) - myCost for myCol, myCost in zip(rowEdgeIDs[r], rowEdgeCosts[r])] + [-unmatchedCost])
+		
+		#Dijkstra from row r; the heap holds (distance, node type, node) where the node type is 0 for a row, 1 for a column and 2 for 'leave this row unmatched'
+		rowDistances = {r: 0}
+		colDistances = {}
+		colParents = {}
+		rowParents = {}
+		settledRows = []
+		settledCols = []
+		myHeap = [(0, 0, r)]
+		while True:
+			myDistance, myType, myNode = heapq.heappop(myHeap)
+			
+			if (myType == 0):
+				if (myDistance > rowDistances[myNode]): continue
+				settledRows.append(myNode)
+				for myCol, myCost in zip(rowEdgeIDs[myNode], rowEdgeCosts[myNode]):
+					if (myCol == rowAssigned[myNode]): continue
+					myNewDistance = myDistance + myCost + rowPotentials[myNode] - colPotentials.get(myCol, 0)
+					if (myNewDistance < colDistances.get(myCol, myNewDistance + 1)):
+						colDistances[myCol] = myNewDistance
+						colParents[myCol] = (myNode, myCost)
+						heapq.heappush(myHeap, (myNewDistance, 1, myCol))
+				#the row can always be dropped instead; the 'unmatched' node of a row has a potential of 0
+				heapq.heappush(myHeap, (myDistance + unmatchedCost + rowPotentials[myNode], 2, myNode))
+			elif (myType == 1):
+				if (myDistance > colDistances[myNode]): continue
+				if (len(colRows.get(myNode, [])) < capacities[myNode]): break
+				settledCols.append(myNode)
+				#the column is full, so the path can carry on by moving one of its rows somewhere else
+				for myRow in colRows[myNode]:
+					myNewDistance = myDistance - rowAssignedCost[myRow] + colPotentials.get(myNode, 0) - rowPotentials[myRow]
+					if (myNewDistance < rowDistances.get(myRow, myNewDistance + 1)):
+						rowDistances[myRow] = myNewDistance
+						rowParents[myRow] = myNode
+						heapq.heappush(myHeap, (myNewDistance, 0, myRow))
+			else:
+				break
+		
+		#keep the potentials valid for the next row; only the nodes settled before the end of the path move
+		for myRow in settledRows: rowPotentials[myRow] += rowDistances[myRow] - myDistance
+		for myCol in settledCols: colPotentials[myCol] = colPotentials.get(myCol, 0) + colDistances[myCol] - myDistance
+		
+		#walk the path back, moving each row on it to its next column (the first row on the path is r, which was not assigned to anything)
+		if (myType == 1):
+			myRow, myCost = colParents[myNode]
+			myCol = myNode
+		else:
+			myRow = myNode
+			myCost = 0
+			myCol = -1
+		while True:
+			myPreviousCol = rowParents.get(myRow, -1)
+			if (myPreviousCol >= 0): colRows[myPreviousCol].remove(myRow)
+			rowAssigned[myRow] = myCol
+			rowAssignedCost[myRow] = myCost
+			if (myCol >= 0): colRows.setdefault(myCol, []).append(myRow)
+			if (myRow == r): break
+			myCol = myPreviousCol
+			myRow, myCost = colParents[myCol]
+	
+	return rowAssigned
+
+class CandidateIndex(object):
+	"""
+	This is an inverted index (blocking index) over a list of strings; its used to cut down the number of strings a fuzzy match has to score.
+	
+	Scoring a string against every element of a list with difflib is O(|list|) SequenceMatcher work per string, which gets out of hand quickly on large lists.  Instead, 
+	each string in the list is broken up into blocking keys (either character n-grams or whitespace separated tokens) and an index from key -> strings is built; when 
+	a string is looked up, only the 'maxCandidates' strings that share the most keys with it are returned as candidates.  Ties in the key count go to the string that 
+	sorts first (not the one that comes first in the list, as they did when the index was first added), so the results are deterministic and do not depend on the 
+	order of the list - which is what lets a MatchIndex built over all of B pick the same candidates as an index built over just the rows a tier has left.
+	
+	The candidates are chosen from the strings that have not been removed (see 'Remove()'), so when a string is used up the next best one takes its place and a lookup 
+	still returns 'maxCandidates' strings if there are that many left that share a key.  GetCandidateIDs(myStr, onlyAvailable = False) instead chooses from every 
+	string that was available when the counts were last set (at creation, or by 'ResetCounts()'), which does not depend on what was matched since.
+	
+	Blocking is a heuristic - a pair of strings that share no keys (or that did not make the 'maxCandidates' cut) will never be scored, even if they would have passed
+	the cutoff.  N-grams are far more forgiving of typos than tokens.
+	
+	Variables:
+	stringList - A list of strings (no nulls!) to index; duplicates are allowed, and each duplicate can be removed once.
+	blockingKey - 'ngram' (default) uses character n-grams of the string padded with (ngramSize - 1) spaces on each side, so the first and last characters get keys 
+		of their own; 'token' uses the whitespace separated words in the string.
+	ngramSize - The length of the n-grams if blockingKey is 'ngram'; default 3.
+	maxCandidates - The maximum number of candidates returned for any lookup; default 100.
+	"""
+	def __init__(self, stringList, blockingKey = 'ngram', ngramSize = 3, maxCandidates = 100):
+		
+		if (blockingKey in ('ngram', 'token')):
+			self.blockingKey = blockingKey
+		else:
+			#'blockingKey' is not a known key type; setting to 'ngram'
+			self.blockingKey = 'ngram'
+		self.ngramSize = ngramSize
+		self.maxCandidates = maxCandidates
+		
+		#keep one copy of each distinct string, plus a count of how many times it can still be matched
+		self.uniqueStrings = []
+		self.stringToID = {}
+		myCounts = []
+		for myStr in stringList:
+			if myStr in self.stringToID:
+				myCounts[self.stringToID[myStr]] += 1
+			else:
+				self.stringToID[myStr] = len(self.uniqueStrings)
+				self.uniqueStrings.append(myStr)
+				myCounts.append(1)
+		self.ResetCounts(np.array(myCounts, dtype=np.int64))
+		self.SetStringRanks()
+		
+		#build the inverted index; key -> array of string IDs
+		myPostings = {}
+		for myID, myStr in enumerate(self.uniqueStrings):
+			for myKey in set(self.GetBlockingKeys(myStr)):
+				myPostings.setdefault(myKey, []).append(myID)
+		self.postings = {}
+		for myKey in myPostings: self.postings[myKey] = np.array(myPostings[myKey], dtype=np.int64)
+	
+	def SetStringRanks(self):
+		#Save the sorted position of every distinct string; this is used to break ties between candidates (by sort order rather than list order - see the class notes)
+		
+		self.stringRanks = np.empty(len(self.uniqueStrings), dtype=np.int64)
+		self.stringRanks[sorted(range(len(self.uniqueStrings)), key=self.uniqueStrings.__getitem__)] = np.arange(len(self.uniqueStrings))
+		
+	def ResetCounts(self, counts):
+		#Set how many copies of each distinct string can be matched (an array aligned with self.uniqueStrings); only strings with a count above 0 can be candidates
+		
+		self.counts = counts
+		self.eligible = counts > 0
+	
+	def WithCounts(self, counts):
+		#Returns a view of this index with its own counts (see ResetCounts); the strings and postings are shared rather than copied, so this is cheap, and removing 
+		#	strings from the view leaves this index alone
+		
+		myView = copy.copy(self)
+		myView.ResetCounts(counts)
+		return myView
+		
+	def GetBlockingKeys(self, myStr):
+		#Break a string up into its blocking keys
+		
+		if (self.blockingKey == 'token'):
+			myKeys = myStr.split()
+			if (len(myKeys) == 0): myKeys = [myStr]
+		else:
+			myKeys = GetPaddedNGrams(myStr, self.ngramSize)
+			if (len(myKeys) == 0): myKeys = [myStr]
+		
+		return myKeys
+	
+	def GetCandidateIDs(self, myStr, onlyAvailable = True):
+		#Return the IDs (positions in self.uniqueStrings) of the candidates for myStr, ranked among the strings not yet removed; if onlyAvailable is False, they are
+		#	ranked among every string available at the last ResetCounts() instead, removed or not
+		
+		myHits = [self.postings[myKey] for myKey in set(self.GetBlockingKeys(myStr)) if myKey in self.postings]
+		if (len(myHits) == 0): return np.array([], dtype=np.int64)
+		
+		myIDs, mySharedKeys = np.unique(np.concatenate(myHits), return_counts=True)
+		if (onlyAvailable): myKeep = self.counts[myIDs] > 0
+		else: myKeep = self.eligible[myIDs]
+		myIDs = myIDs[myKeep]
+		mySharedKeys = mySharedKeys[myKeep]
+		
+		#most shared keys first, ties go to the string that sorts first
+		return myIDs[np.lexsort((self.stringRanks[myIDs], -mySharedKeys))[:self.maxCandidates]]
+	
+	def GetCandidates(self, myStr):
+		#Return the list of (not yet removed) candidate strings for myStr
+		
+		return [self.uniqueStrings[y] for y in self.GetCandidateIDs(myStr)]
+	
+	def Remove(self, myStr):
+		#Use up one copy of myStr, so it will no longer be returned as a candidate once all of its copies are gone
+		
+		self.counts[self.stringToID[myStr]] -= 1
+	
+
+@DateFunc.Profiled('MatchConfidence.RemoveDistractingWords')
+def RemoveDistractingWords(givenSeries, deletedWords = [], workers = 1):
 	"""
 	When pattern matching must be done, there may be common words you wish to eliminate to get rid of some noise.
 	This function removes the most common phrases (that you specify), as well as stray punctuation and whitespace
 	
 	It accepts a pd.Series object AND a list 'deletedWords' (which is your listing of deleted words); it returns the data modified.  A .copy() is used so it does not 
 	modify the original data
+	
+	Each value is cleaned up in a single pass (see 'NormalizeString'): punctuation is turned into spaces, the value is lower-cased and split into words, any run of 
+	words that is in deletedWords is dropped, and what is left is joined back up with single spaces.  The deleted words (which can be phrases) are compiled once and 
+	cached, so calling this over and over with the same list is cheap.  Deleted words are case insensitive and have their punctuation handled the same way as the 
+	values, so 'Inc.' removes 'inc'.  Every occurrence of a deleted word is removed, even when two of them are back to back.  Anything that is not a string 
+	(such as NULL) comes back as NaN.
+	
+	'workers' - If this is above 1, the series is split into that many chunks which are cleaned up across a process pool; this is only worth it for large series.
 	"""
 
 	internalSeries = givenSeries.copy()
 
 	if internalSeries.shape[0] > 0: 
+		myValues = internalSeries.values.tolist()
+		myDeletedWords = tuple(deletedWords)
 		
-		#Do the oddball characters
-		internalSeries = internalSeries.str.replace("[\!\@\#\$\%\^\&\*\(\)\_\-\+\=\[\{\]\}\\\|\;\:\'\"\<\,\>\.\?\/\`\~]+", ' ', case=False)
-
-		#now cycle through the list and get rid of the words to be ignored
-		for i in range(len(deletedWords)):
-			myRegex = r"(^|\s)" + re.escape(deletedWords[i]) + r"(\s|$)"
-			internalSeries = internalSeries.str.replace(myRegex, ' ', case=False)
+		if (workers > 1):
+			myChunkSize = len(myValues) // workers + 1
+			myPool = multiprocessing.Pool(processes = workers)
+			try:
+				myChunks = myPool.map(NormalizeStringChunk, [(myValues[y:y + myChunkSize], myDeletedWords) for y in range(0, len(myValues), myChunkSize)])
+			finally:
+				myPool.close()
+				myPool.join()
+			myValues = [y for myChunk in myChunks for y in myChunk]
+		else:
+			myValues = NormalizeStringChunk((myValues, myDeletedWords))
 		
-		#clean up all whitespaces that have two+ consecutive characters (make it a single space)
-		internalSeries = internalSeries.str.replace("\s+", ' ', case=False)
+		internalSeries = pd.Series(myValues, index = internalSeries.index, name = internalSeries.name, dtype = object)
+
+	return internalSeries
+
+#the punctuation that RemoveDistractingWords turns into spaces
+distractingPunctuation = re.compile("[\!\@\#\$\%\^\&\*\(\)\_\-\+\=\[\{\]\}\\\|\;\:\'\"\<\,\>\.\?\/\`\~]+")
+
+#compiled deleted word lists, keyed by the tuple of deleted words, oldest first; only the last 'distractingWordsCacheSize' lists are kept.  See CompileDistractingWords
+distractingWordsCache = collections.OrderedDict()
+distractingWordsCacheSize = 32
+
+def CompileDistractingWords(deletedWords):
+	"""
+	Compiles a list of deleted words (or phrases) into a word trie: a nested dictionary keyed by word, where the key None marks the end of a deleted phrase.  For 
+	example ['the', 'new york'] becomes {'the': {None: True}, 'new': {'york': {None: True}}}.  The result is cached by the tuple of deleted words (the last 32 
+	lists compiled are kept).
+	"""
+	myKey = tuple(deletedWords)
+	myTrie = distractingWordsCache.get(myKey)
+	if (myTrie is None):
+		myTrie = {}
+		for myPhrase in deletedWords:
+			myWords = distractingPunctuation.sub(' ', myPhrase).lower().split()
+			if (len(myWords) == 0): continue
+			myNode = myTrie
+			for myWord in myWords: myNode = myNode.setdefault(myWord, {})
+			myNode[None] = True
 		
-		#clean up whitespace at the very beginning and end
-		internalSeries = internalSeries.str.replace("^\s+", '', case=False)
-		internalSeries = internalSeries.str.replace("\s+$", '', case=False)
+		#throw out the oldest list once the cache is full, so callers that build their lists on the fly cannot grow it without limit
+		if (len(distractingWordsCache) >= distractingWordsCacheSize): distractingWordsCache.popitem(last = False)
+		distractingWordsCache[myKey] = myTrie
+	
+	return myTrie
+
+def NormalizeString(myStr, wordTrie):
+	#Clean up a single string (see RemoveDistractingWords) using a trie from CompileDistractingWords; anything that is not a string comes back as NaN
+	
+	if not isinstance(myStr, (str, type(u''))): return np.nan
+	
+	myWords = distractingPunctuation.sub(' ', myStr).lower().split()
+	if (len(wordTrie) == 0): return ' '.join(myWords)
+	
+	myKept = []
+	y = 0
+	while (y < len(myWords)):
+		#find the longest deleted phrase that starts at this word
+		myNode = wordTrie
+		myPhraseEnd = None
+		z = y
+		while ((z < len(myWords)) and (myWords[z] in myNode)):
+			myNode = myNode[myWords[z]]
+			z += 1
+			if None in myNode: myPhraseEnd = z
 		
-		#finally set the entire series to lower case
-		internalSeries = internalSeries.str.lower()
+		if (myPhraseEnd is None):
+			myKept.append(myWords[y])
+			y += 1
+		else:
+			y = myPhraseEnd
+	
+	return ' '.join(myKept)
 
-	return internalSeries
+def NormalizeStringChunk(chunkAndDeletedWords):
+	#Clean up a list of strings; takes a (list of strings, tuple of deleted words) tuple so it can be handed to a process pool
+	
+	myStrings, myDeletedWords = chunkAndDeletedWords
+	myTrie = CompileDistractingWords(myDeletedWords)
+	
+	return [NormalizeString(y, myTrie) for y in myStrings]
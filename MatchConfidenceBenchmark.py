@@ -0,0 +1,279 @@
+import os
+import sys
+import datetime
+import platform
+import pandas as pd
+import numpy as np
+
+#tracemalloc (Python 3.4+) gives the true peak of the memory allocated during a single run; without it, the process' peak resident memory is used instead
+try:
+	import tracemalloc
+	tracemallocAvailable = True
+except ImportError:
+	import resource
+	tracemallocAvailable = False
+
+import DateFunctions as DateFunc
+import MatchConfidence as MatchConf
+"""
+This file holds a benchmark suite for MatchConfidence (findMatches, GetClosestStringMatch and RemoveDistractingWords) along with a seeded synthetic data generator,
+so the speed, memory use and match quality can be compared from one version to the next.
+
+The quickest way to run it is from the command line:
+python MatchConfidenceBenchmark.py <resultsFile> [numRows numRows ...]
+for example 'python MatchConfidenceBenchmark.py /data/matchBenchmarks.csv 10000 100000'; if no row counts are given, 10k, 100k and 1M rows are run.
+"""
+
+benchmarkFirstNames = ['james', 'mary', 'robert', 'patricia', 'john', 'jennifer', 'michael', 'linda', 'david', 'elizabeth', 'william', 'barbara', 'richard', 'susan',
+	'joseph', 'jessica', 'thomas', 'sarah', 'charles', 'karen', 'maria', 'carlos', 'wei', 'priya', 'ahmed', 'olga', 'kenji', 'fatima', 'liam', 'noah']
+benchmarkLastNames = ['smith', 'johnson', 'williams', 'brown', 'jones', 'garcia', 'miller', 'davis', 'rodriguez', 'martinez', 'hernandez', 'lopez', 'gonzalez', 'wilson',
+	'anderson', 'thomas', 'taylor', 'moore', 'jackson', 'martin', 'lee', 'perez', 'thompson', 'white', 'harris', 'sanchez', 'clark', 'ramirez', 'lewis', 'robinson',
+	'walker', 'young', 'allen', 'king', 'wright', 'scott', 'torres', 'nguyen', 'hill', 'flores']
+benchmarkCompanySuffixes = ['', '', '', 'inc', 'llc', 'corp', 'co', 'and sons']
+benchmarkStreetNames = ['main', 'oak', 'pine', 'maple', 'cedar', 'elm', 'washington', 'lake', 'hill', 'park', 'walnut', 'sunset', 'lincoln', 'jackson', 'church',
+	'river', 'highland', 'madison', 'spring', 'ridge']
+benchmarkStreetSuffixes = ['st', 'ave', 'rd', 'blvd', 'ln', 'dr', 'ct', 'way']
+benchmarkCities = ['springfield', 'riverside', 'franklin', 'greenville', 'bristol', 'clinton', 'fairview', 'salem', 'madison', 'georgetown', 'arlington', 'ashland',
+	'dover', 'oxford', 'jackson', 'burlington', 'manchester', 'milton', 'newport', 'auburn']
+
+#these are what the generator strips out in the RemoveDistractingWords benchmark
+benchmarkDistractingWords = ['inc', 'llc', 'corp', 'co', 'and sons']
+
+def GenerateSyntheticRecords(numRows, typoRate = .2, duplicateRate = .05, nullRate = .02, matchRate = .8, seed = 0):
+	"""
+	Generates a pair of name and address dataframes (A and B) that look like two feeds of the same people / businesses, for benchmarking findMatches.  The same seed
+	always generates the same data (on any machine or Python version), so results can be compared across versions.
+
+	A has numRows rows; a 'matchRate' fraction of them get a copy in B and the rest of B is filled with unrelated records, so B has numRows rows as well (plus the
+	duplicates).  The copies in B are noisy:
+	- 'typoRate' is the chance that any one string in a copy has a typo (a character dropped, swapped, replaced or added)
+	- 'duplicateRate' is the fraction of the copied rows that show up in B twice (each with its own typos), which is what enforceUniqueMatch has to deal with
+	- 'nullRate' is the chance that any one value (in A or B) is NULL
+
+	Returns a tuple of the two dataframes, with the columns:
+	A: nameA, addressA, cityA, zipA
+	B: nameB, addressB, cityB, zipB, sourceIndexA (the index of the A row the record was copied from, or -1 if its unrelated; use this to score the matches,
+		NOT to match on)
+	Both are indexed 0 to n-1 (B is shuffled, so its order says nothing about A).
+	"""
+
+	#RandomState (rather than the newer Generator) is used so the data is the same on every version of numpy
+	myRandom = np.random.RandomState(seed)
+
+	dfA = GenerateRandomRecords(numRows, myRandom, 'A')
+
+	#pick the A rows that are copied to B, and the ones among those that are copied twice
+	mySourceIndexes = np.flatnonzero(myRandom.random_sample(numRows) < matchRate)
+	myDuplicates = mySourceIndexes[myRandom.random_sample(len(mySourceIndexes)) < duplicateRate]
+	mySourceIndexes = np.concatenate([mySourceIndexes, myDuplicates])
+
+	dfCopies = dfA.iloc[mySourceIndexes].reset_index(drop=True)
+	dfCopies.columns = ['nameB', 'addressB', 'cityB', 'zipB']
+	for myCol in ['nameB', 'addressB', 'cityB']:
+		dfCopies[myCol] = AddTypos(dfCopies[myCol].values, typoRate, myRandom)
+	dfCopies['sourceIndexA'] = mySourceIndexes
+
+	#fill out the rest of B with records that have nothing to do with A
+	dfUnrelated = GenerateRandomRecords(numRows - (len(mySourceIndexes) - len(myDuplicates)), myRandom, 'B')
+	dfUnrelated['sourceIndexA'] = -1
+
+	dfB = pd.concat([dfCopies, dfUnrelated], ignore_index = True)
+	dfB = dfB.iloc[myRandom.permutation(dfB.shape[0])].reset_index(drop=True)
+
+	#the NULLs go in last, so a NULL in A is not simply copied to B
+	for myDataFrame, myColumns in [(dfA, ['nameA', 'addressA', 'cityA', 'zipA']), (dfB, ['nameB', 'addressB', 'cityB', 'zipB'])]:
+		for myCol in myColumns:
+			myDataFrame.loc[myRandom.random_sample(myDataFrame.shape[0]) < nullRate, myCol] = None
+
+	return dfA, dfB
+
+def GenerateRandomRecords(numRows, myRandom, suffix):
+	#Returns a dataframe of numRows random name / address records; the column names end with suffix ('A' or 'B')
+
+	myNames = ConcatenateWords([np.take(benchmarkFirstNames, myRandom.randint(0, len(benchmarkFirstNames), numRows)),
+		np.take(benchmarkLastNames, myRandom.randint(0, len(benchmarkLastNames), numRows)),
+		np.take(benchmarkCompanySuffixes, myRandom.randint(0, len(benchmarkCompanySuffixes), numRows))])
+	myAddresses = ConcatenateWords([myRandom.randint(1, 10000, numRows).astype(str),
+		np.take(benchmarkStreetNames, myRandom.randint(0, len(benchmarkStreetNames), numRows)),
+		np.take(benchmarkStreetSuffixes, myRandom.randint(0, len(benchmarkStreetSuffixes), numRows))])
+	myCities = np.take(benchmarkCities, myRandom.randint(0, len(benchmarkCities), numRows)).astype(object)
+	myZips = np.array(['%05d' % y for y in myRandom.randint(501, 99951, numRows)], dtype=object)
+
+	return pd.DataFrame({'name' + suffix: myNames, 'address' + suffix: myAddresses, 'city' + suffix: myCities, 'zip' + suffix: myZips},
+		columns = ['name' + suffix, 'address' + suffix, 'city' + suffix, 'zip' + suffix])
+
+def ConcatenateWords(wordArrays):
+	#Joins the arrays of words element by element with a space between them, skipping empty words; returns an object array
+
+	return np.array([' '.join([myWord for myWord in myWords if myWord != '']) for myWords in zip(*wordArrays)], dtype=object)
+
+def AddTypos(values, typoRate, myRandom):
+	#Returns a copy of values (an array of strings) where each string has a typoRate chance of one typo: a dropped, swapped, replaced or added character
+
+	retVal = values.copy()
+	myLetters = 'abcdefghijklmnopqrstuvwxyz'
+
+	for y in np.flatnonzero(myRandom.random_sample(len(values)) < typoRate):
+		myStr = retVal[y]
+		if (len(myStr) < 2): continue
+
+		myPosition = myRandom.randint(0, len(myStr) - 1)
+		myTypo = myRandom.randint(0, 4)
+		if (myTypo == 0):
+			myStr = myStr[:myPosition] + myStr[myPosition + 1:]
+		elif (myTypo == 1):
+			myStr = myStr[:myPosition] + myStr[myPosition + 1] + myStr[myPosition] + myStr[myPosition + 2:]
+		elif (myTypo == 2):
+			myStr = myStr[:myPosition] + myLetters[myRandom.randint(0, 26)] + myStr[myPosition + 1:]
+		else:
+			myStr = myStr[:myPosition] + myLetters[myRandom.randint(0, 26)] + myStr[myPosition:]
+		retVal[y] = myStr
+
+	return retVal
+
+def StandardMatchDictionaries():
+	"""
+	Returns the match dictionaries the benchmark runs, keyed by a short name; the names are written to the results file, so do not change what a name does - add a
+	new one instead.
+	- 'exactOnly': name + address + zip, then name + zip
+	- 'exactThenFuzzy': the exact tiers above, then a fuzzy name (.85) + zip tier and a fuzzy name (.8) + fuzzy address (.8) tier
+	"""
+	retVal = {}
+
+	myDictionary = MatchConf.createMatchDictionary([3, 2])
+	SetMatchColumns(myDictionary, 0, [('name', ''), ('address', ''), ('zip', '')])
+	SetMatchColumns(myDictionary, 1, [('name', ''), ('zip', '')])
+	retVal['exactOnly'] = myDictionary
+
+	myDictionary = MatchConf.createMatchDictionary([3, 2, 2, 2])
+	SetMatchColumns(myDictionary, 0, [('name', ''), ('address', ''), ('zip', '')])
+	SetMatchColumns(myDictionary, 1, [('name', ''), ('zip', '')])
+	SetMatchColumns(myDictionary, 2, [('name', .85), ('zip', '')])
+	SetMatchColumns(myDictionary, 3, [('name', .8), ('address', .8)])
+	retVal['exactThenFuzzy'] = myDictionary
+
+	return retVal
+
+def SetMatchColumns(matchDictionary, tier, columns):
+	#Fills in one tier of a match dictionary; columns is a list of (column name without the A/B suffix, strLikenessPcnt) tuples
+
+	for x, (myCol, myLikeness) in enumerate(columns):
+		matchDictionary[tier][x]['colA'] = myCol + 'A'
+		matchDictionary[tier][x]['colB'] = myCol + 'B'
+		matchDictionary[tier][x]['strLikenessPcnt'] = myLikeness
+
+def ScoreMatches(matched, dfB):
+	"""
+	Scores a findMatches result against the truth kept by GenerateSyntheticRecords.  Returns a tuple of (matches, precision, recall): 'precision' is the fraction of
+	the matches that paired a B row with the A row it was copied from, and 'recall' is the fraction of A rows that had a copy in B (with a non NULL name) that were
+	correctly matched.
+	"""
+	if (matched.empty): return 0, np.nan, 0.0
+
+	myMatched = matched.loc[matched['origIndexA'].notnull() & matched['origIndexB'].notnull(), ['origIndexA', 'origIndexB']]
+	myCorrect = (dfB['sourceIndexA'].values[myMatched['origIndexB'].values.astype(np.int64)] == myMatched['origIndexA'].values.astype(np.int64)).sum()
+
+	myPossible = dfB.loc[(dfB['sourceIndexA'] >= 0) & dfB['nameB'].notnull(), 'sourceIndexA'].nunique()
+
+	myMatches = myMatched.shape[0]
+	if (myMatches > 0): myPrecision = float(myCorrect) / myMatches
+	else: myPrecision = np.nan
+	if (myPossible > 0): myRecall = float(myCorrect) / myPossible
+	else: myRecall = np.nan
+
+	return myMatches, myPrecision, myRecall
+
+def MeasureRun(myFunction, *args, **kwargs):
+	"""
+	Runs myFunction(*args, **kwargs) and returns a tuple of (what it returned, the wall clock seconds, the peak memory in MB).
+
+	With tracemalloc (Python 3) the peak memory is the most that was allocated at any point during the run, above what was already allocated.  Without it (Python 2)
+	its the peak resident memory of the whole process so far, which only says something if it went up during the run - so run the biggest benchmark last.
+	"""
+	if (tracemallocAvailable):
+		tracemalloc.start()
+
+	myTimer = DateFunc.TimeIt()
+	retVal = myFunction(*args, **kwargs)
+	myTimer.Stop()
+
+	if (tracemallocAvailable):
+		myPeakMB = tracemalloc.get_traced_memory()[1] / 1048576.0
+		tracemalloc.stop()
+	else:
+		#Linux reports this in KB
+		myPeakMB = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+	return retVal, myTimer.GetTimeDeltaInSeconds(), myPeakMB
+
+def RunBenchmarks(resultsFile, sizes = [10000, 100000, 1000000], label = '', seed = 0, typoRate = .2, duplicateRate = .05, nullRate = .02, matchRate = .8, blockingKey = 'ngram', maxCandidates = 100, workers = 1, numberOfLookups = 1000, printProgressToScreen = True):
+	"""
+	Runs the full benchmark suite for each row count in 'sizes' and appends one row per benchmark to the CSV file 'resultsFile' (the header is written if the file
+	is new), so runs from different versions build up in one file.  Returns the rows that were added as a dataframe.
+
+	The benchmarks for every size are:
+	- 'findMatches/<dictionary name>': findMatches over the generated A and B for each dictionary in StandardMatchDictionaries
+	- 'GetClosestStringMatch': 'numberOfLookups' names from A matched (and used up) against the names in B, with a CandidateIndex when blockingKey is set
+	- 'RemoveDistractingWords': the names in B, with benchmarkDistractingWords removed
+
+	'label' is written to every row to tell runs apart - the version or commit being measured is a good choice.  'seed', 'typoRate', 'duplicateRate', 'nullRate'
+	and 'matchRate' are passed to GenerateSyntheticRecords, and 'blockingKey', 'maxCandidates' and 'workers' to findMatches.
+
+	The columns written are: runTime, label, python, pandas, benchmark, rows, seconds, rowsPerSecond, peakMemoryMB, matches, precision, recall (the last three are only
+	filled in for findMatches).  1M rows with fuzzy tiers takes a long time; pass smaller sizes for a quick check.
+	"""
+	myResults = []
+	myRunTime = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+	for numRows in sizes:
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Generating {} rows".format(numRows))
+		dfA, dfB = GenerateSyntheticRecords(numRows, typoRate = typoRate, duplicateRate = duplicateRate, nullRate = nullRate, matchRate = matchRate, seed = seed)
+		myMatchColumnsB = dfB.drop('sourceIndexA', axis=1)
+
+		myDictionaries = StandardMatchDictionaries()
+		for myName in sorted(myDictionaries.keys()):
+			DateFunc.PrintTimestampedMsg(printProgressToScreen, "Running findMatches/{} over {} rows".format(myName, numRows))
+			matched, mySeconds, myPeakMB = MeasureRun(MatchConf.findMatches, dfA, myMatchColumnsB, myDictionaries[myName], blockingKey = blockingKey, maxCandidates = maxCandidates, workers = workers)
+			myMatches, myPrecision, myRecall = ScoreMatches(matched, dfB)
+			myResults.append({'benchmark': 'findMatches/' + myName, 'rows': numRows, 'seconds': mySeconds, 'peakMemoryMB': myPeakMB, 'matches': myMatches, 'precision': myPrecision, 'recall': myRecall})
+
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Running GetClosestStringMatch over {} rows".format(numRows))
+		myLookups = dfA['nameA'].dropna().str.lower().values[:numberOfLookups].tolist()
+		myCandidates = dfB['nameB'].dropna().str.lower().values.tolist()
+		myResult, mySeconds, myPeakMB = MeasureRun(RunClosestStringMatches, myLookups, myCandidates, blockingKey, maxCandidates)
+		myResults.append({'benchmark': 'GetClosestStringMatch', 'rows': len(myLookups), 'seconds': mySeconds, 'peakMemoryMB': myPeakMB})
+
+		DateFunc.PrintTimestampedMsg(printProgressToScreen, "Running RemoveDistractingWords over {} rows".format(numRows))
+		myResult, mySeconds, myPeakMB = MeasureRun(MatchConf.RemoveDistractingWords, dfB['nameB'], benchmarkDistractingWords, workers = workers)
+		myResults.append({'benchmark': 'RemoveDistractingWords', 'rows': numRows, 'seconds': mySeconds, 'peakMemoryMB': myPeakMB})
+
+	dfResults = pd.DataFrame(myResults, columns = ['benchmark', 'rows', 'seconds', 'peakMemoryMB', 'matches', 'precision', 'recall'])
+	dfResults.insert(0, 'runTime', myRunTime)
+	dfResults.insert(1, 'label', label)
+	dfResults.insert(2, 'python', platform.python_version())
+	dfResults.insert(3, 'pandas', pd.__version__)
+	dfResults.insert(7, 'rowsPerSecond', dfResults['rows'] / dfResults['seconds'])
+
+	dfResults.to_csv(resultsFile, mode = 'a', header = not os.path.isfile(resultsFile), index = False)
+
+	return dfResults
+
+def RunClosestStringMatches(myLookups, myCandidates, blockingKey, maxCandidates):
+	#The body of the GetClosestStringMatch benchmark: match every lookup against the candidates, using each candidate up as its matched
+
+	if (blockingKey is not None):
+		myCandidateIndex = MatchConf.CandidateIndex(myCandidates, blockingKey = blockingKey, maxCandidates = maxCandidates)
+	else:
+		myCandidateIndex = None
+
+	return [MatchConf.GetClosestStringMatch(y, myCandidates, removeMatched = 1, myCutoff = .8, candidateIndex = myCandidateIndex) for y in myLookups]
+
+if __name__ == '__main__':
+	if (len(sys.argv) < 2):
+		print("Usage: python MatchConfidenceBenchmark.py <resultsFile> [numRows numRows ...]")
+		sys.exit(1)
+
+	if (len(sys.argv) > 2):
+		RunBenchmarks(sys.argv[1], sizes = [int(y) for y in sys.argv[2:]])
+	else:
+		RunBenchmarks(sys.argv[1])